@@ -9,7 +9,7 @@ bedienen und bietet eine automatische Dokumentation der API (https://fastapi.tia
 """
 
 from fastapi import APIRouter  # Needed to connect the endpoints
-from .endpoints import users, posts, chats, comments, auth  # Import all endpoint routers
+from .endpoints import users, posts, chats, comments, auth, health  # Import all endpoint routers
 
 api_router = APIRouter()
 
@@ -19,3 +19,4 @@ api_router.include_router(users.router)
 api_router.include_router(posts.router)
 api_router.include_router(chats.router)
 api_router.include_router(comments.router)
+api_router.include_router(health.router)
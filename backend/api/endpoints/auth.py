@@ -7,7 +7,7 @@ Die Endpunkte umfassen die Erstellung eines Benutzers, das Einloggen eines Benut
 """
 
 import os  # For file path operations
-import json  # For parsing the SECRET_KEY from the config.json file and roles.json
+import json  # For parsing the SECRET_KEY from the config.json file
 
 import jwt  # JSON Web Token for user authentication
 from jwt import PyJWTError  # Gets thrown in case the JWT is not valid
@@ -17,8 +17,8 @@ from typing import (
     Optional  # For optional parameters
 )
 
+import time  # For the issue time of the tokens
 from datetime import datetime, timedelta  # For token expiration time
-from passlib.context import CryptContext  # For password hashing and verification
 
 from fastapi import (
     Depends,  # For requiring parameters, e.g. the current user ID
@@ -33,7 +33,14 @@ from fastapi.security import (
 )
 
 from backend.db_service.models import SignupData, User  # Models for data transfer
-from backend.db_service import database as db  # Allows the manipulation and reading of the database
+from backend.db_service import async_database as adb  # Non-blocking manipulation and reading of the database
+from backend.api.password_hashing import (
+    PasswordHasher,  # For hashing and verifying passwords outside of the event loop
+    PasswordHasherBusy,  # Raised if too many passwords are being hashed
+    DEFAULT_WORKERS,  # Default size of the hashing thread pool
+    DEFAULT_QUEUE_LIMIT  # Default maximum number of pending hash calculations
+)
+from backend.api.token_cache import TokenCache  # For skipping the signature check of known tokens
 
 # API router for the authentication endpoints
 router = APIRouter(
@@ -41,10 +48,6 @@ router = APIRouter(
     tags=["auth"]  # Tags for the API documentation
 )
 
-# Security for user authentication: Password hashing using the bcrypt algorithm.
-# The deprecated parameter is set to "auto" to automatically update the hashing algorithm.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Security for user authentication: Authorization header with Bearer token using OAuth2
 # The token URL is used for the login endpoint.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login/")
@@ -60,6 +63,23 @@ with open(CONFIG_PATH, 'r') as f:
 
 ALGORITHM = "HS256"  # Algorithm used for encoding the token
 
+# Security for user authentication: Password hashing using the bcrypt algorithm in a bounded thread pool.
+# The size of the pool and the maximum number of pending calculations can be set in config.json.
+password_hasher = PasswordHasher(
+    workers=config.get("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS),
+    queue_limit=config.get("PASSWORD_HASH_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT)
+)
+
+# Tokens whose signature has already been verified, until they expire or are revoked
+token_cache = TokenCache()
+
+# Returned if the password hasher is overloaded. The client may try again after Retry-After seconds.
+busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many passwords are being checked at the moment, please try again later",
+    headers={"Retry-After": "1"},
+)
+
 # Time after which the token expires (in minutes)
 # TODO: Change to a lower value for production. (1440 minutes = 24 hours)
 # TODO: Maybe a refresh system for the token is needed.
@@ -67,27 +87,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 1440
 
 
 # ------------------------- Utility Functions -------------------------
-def is_privileged(current_user_id: int) -> bool:
-    """
-    Checks if the current user is an admin or moderator.
-
-    Args:
-        current_user_id: The ID of the current user (integer).
-
-    Returns:
-        True if the user is an admin or moderator. Otherwise, False.
-
-    TODO: This function should be removed and replaced with get_role_permissions().
-    """
-
-    current_user_role = db.get_public_user_by_id(current_user_id).role
-
-    return current_user_role in ["admin", "moderator"]
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Verifies a password using bcrypt.
+    Verifies a password using bcrypt. The calculation runs in the thread pool of the password hasher.
 
     Args:
         plain_password: The plain password (string).
@@ -97,12 +99,12 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         True if the hashed form of the plain password matches the hashed password. Otherwise, False.
     """
 
-    return pwd_context.verify(plain_password, hashed_password)
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
-def hash_password(password: str) -> str:
+async def hash_password(password: str) -> str:
     """
-    Hashes a password using bcrypt.
+    Hashes a password using bcrypt. The calculation runs in the thread pool of the password hasher.
 
     Args:
         password: The password (string).
@@ -111,7 +113,7 @@ def hash_password(password: str) -> str:
         The hashed password (string).
     """
 
-    return pwd_context.hash(password)
+    return await password_hasher.hash(password)
 
 
 def create_access_token(user_id: int) -> str:
@@ -126,16 +128,17 @@ def create_access_token(user_id: int) -> str:
         The encoded JWT token (string).
     """
 
-    # Create payload with user ID and expiration time
+    # Create payload with user ID, issue time and expiration time.
+    # The issue time is not rounded to seconds, so a token created right after revoke_user_tokens() stays valid.
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    payload = {"sub": user_id, "exp": expire}
+    payload = {"sub": user_id, "iat": time.time(), "exp": expire}
 
     # Encode the token using the secret key and algorithm
     encoded_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_token
 
 
-def authenticate_user(email: str, password: str) -> Optional[User]:
+async def authenticate_user(email: str, password: str) -> Optional[User]:
     """
     Authenticates a user using the email and password.
 
@@ -144,52 +147,81 @@ def authenticate_user(email: str, password: str) -> Optional[User]:
         password: The password of the user (string).
 
     Returns:
-        The user object (dictionary) or False if the user does not exist or the password is incorrect.
+        The user object or None if the user does not exist or the password is incorrect.
+
+    Raises:
+        PasswordHasherBusy: If too many passwords are being verified at the moment.
     """
 
-    user = db.get_public_user_by_email(email)
+    user = await adb.get_user_by_email(email)
 
-    if user or verify_password(password, user["password"]):
+    if user and await verify_password(password, user.password):
         return user
 
     return None  # User does not exist or password is incorrect
 
 
-async def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> int:
+def decode_access_token(token: str) -> Optional[int]:
     """
-    Returns the ID of the current user using the Bearer token from the Authorization header.
+    Returns the user ID of a valid access token. The signature of a token is only verified the first time it is seen,
+    after that the token is found in the token cache until it expires or is revoked.
 
     Args:
-        token: The Bearer token from the Authorization header.
+        token: The encoded JWT token (string).
 
     Returns:
-        The user ID (integer).
+        The user ID (integer) or None if the token is not valid, expired or revoked.
     """
 
-    # Exception for invalid credentials
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    user_id = token_cache.get(token)
+
+    if user_id is not None:
+        return user_id
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
+    except PyJWTError:  # Token is not valid
+        return None
+
+    if not payload.get("sub"):  # Token is not valid
+        return None
 
-        if not user_id:  # Token is not valid
-            raise credentials_exception
+    if not token_cache.put(token, payload):  # Token has been revoked
+        return None
 
-        return user_id
+    return payload["sub"]
 
-    except PyJWTError:  # Token is not valid
-        raise credentials_exception
 
+def revoke_access_token(token: str):
+    """
+    Revokes a single access token, e.g. on logout.
 
-async def get_optional_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> Optional[int]:
+    Args:
+        token: The encoded JWT token (string).
+    """
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except PyJWTError:  # Token is not valid anyway
+        return
+
+    token_cache.revoke_token(token, payload["exp"])
+
+
+def revoke_user_tokens(user_id: int):
+    """
+    Revokes all access tokens issued to a user until now, e.g. when the user is banned.
+
+    Args:
+        user_id: The ID of the user (integer).
+    """
+
+    token_cache.revoke_user(user_id, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+async def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> int:
     """
     Returns the ID of the current user using the Bearer token from the Authorization header.
-    If the token is not valid, None is returned instead of raising an exception.
 
     Args:
         token: The Bearer token from the Authorization header.
@@ -198,48 +230,45 @@ async def get_optional_current_user_id(token: Annotated[str, Depends(oauth2_sche
         The user ID (integer).
     """
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-
-        if not user_id:  # Token is not valid
-            return None
+    user_id = decode_access_token(token)
 
-        return user_id
+    if not user_id:  # Token is not valid
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    except PyJWTError:  # Token is not valid
-        return None
+    return user_id
 
 
-async def get_current_user(current_user_id: Annotated[int, Depends(get_current_user_id)]) -> Optional[User]:
+async def get_optional_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> Optional[int]:
     """
-    Returns the current user.
+    Returns the ID of the current user using the Bearer token from the Authorization header.
+    If the token is not valid, None is returned instead of raising an exception.
 
     Args:
-        current_user_id: The ID of the current user (integer).
+        token: The Bearer token from the Authorization header.
 
     Returns:
-        The user object (PublicUser).
+        The user ID (integer).
     """
 
-    return db.get_user_by_id(current_user_id)
+    return decode_access_token(token)
 
 
-def get_role_permissions(user_role):
-    """
-    Returns the permissions of each role.
+async def get_current_user(current_user_id: Annotated[int, Depends(get_current_user_id)]) -> Optional[User]:
     """
-    roles_path = os.path.join(CURRENT_DIR, '../../roles.json')
+    Returns the current user.
+
+    Args:
+        current_user_id: The ID of the current user (integer).
 
-    with open(roles_path) as f:
-        roles = json.load(f)
+    Returns:
+        The user object (PublicUser).
+    """
 
-    role_permissions = roles[user_role]
-    
-    if not role_permissions:  # If the role does not exist
-        return []  # Return an empty list
-    
-    return role_permissions 
+    return await adb.get_user_by_id(current_user_id)
 
 
 # ------------------------- Post Requests -------------------------
@@ -257,11 +286,15 @@ async def create_user(user: SignupData):
 
     Raises:
         HTTPException 422: If the data is not valid.
+        HTTPException 503: If too many passwords are being hashed at the moment.
     """
 
-    hashed_password = hash_password(user.password)
+    try:
+        hashed_password = await hash_password(user.password)
+    except PasswordHasherBusy:
+        raise busy_exception
 
-    created_user_id = db.create_user(user.username, user.email, hashed_password)
+    created_user_id = await adb.create_user(user.username, user.email, hashed_password)
 
     return {"created_user_id": created_user_id}
 
@@ -277,10 +310,17 @@ async def login(login_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
 
     Returns:
         A dictionary containing the access token and token type.
+
+    Raises:
+        HTTPException 401: If the email or password is incorrect.
+        HTTPException 503: If too many passwords are being verified at the moment.
     """
 
     # OAuth2 does not allow custom fields, so we need to use the username field for the email.
-    user = authenticate_user(login_data.username, login_data.password)
+    try:
+        user = await authenticate_user(login_data.username, login_data.password)
+    except PasswordHasherBusy:  # Reject instead of letting the requests pile up
+        raise busy_exception
 
     if not user:  # There is no user with this email or the password is incorrect
         raise HTTPException(
@@ -293,3 +333,18 @@ async def login(login_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
 
     return {"access_token": access_token, "token_type": "bearer"}
 
+
+@router.post("/logout/")
+async def logout(token: Annotated[str, Depends(oauth2_scheme)]):
+    """
+    Logs out a user by revoking the access token from the Authorization header.
+
+    Args:
+        token: The Bearer token from the Authorization header.
+
+    Returns:
+        An empty dictionary.
+    """
+
+    revoke_access_token(token)
+    return {}  # Indicates that the user was logged out
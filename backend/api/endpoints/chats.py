@@ -16,7 +16,7 @@ from fastapi import (
 )
 
 from backend.api.endpoints.auth import get_current_user_id  # For user authentication
-from backend.db_service import database as db  # Allows the manipulation and reading of the database
+from backend.db_service import async_database as adb  # Non-blocking manipulation and reading of the database
 
 # API router for the chat endpoints
 router = APIRouter(
@@ -37,13 +37,13 @@ async def get_chat_by_id(chat_id: int):
     Returns:
         A chat object (dictionary).
     """
-    chat = db.get_chat_by_id(chat_id)
+    chat = await adb.get_chat_by_id(chat_id)
     
     # Check if chat exists
     if chat is None:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    return {"chat": db.get_chat_by_id(chat_id)}
+    return {"chat": await adb.get_chat_by_id(chat_id)}
 
 
 @router.get("/id/{chat_id}/messages/")
@@ -58,7 +58,7 @@ async def get_messages_of_chat(chat_id: int):
         A list of message objects (dictionaries).
     """
 
-    return {"messages": db.get_messages_of_chat(chat_id)}
+    return {"messages": await adb.get_messages_of_chat(chat_id)}
 
 
 # ------------------------- Post-Requests -------------------------
@@ -79,14 +79,14 @@ async def create_chat(
     """
 
     # Check if chat already exists
-    if db.check_chat_exists(current_user_id, partner_id):
+    if await adb.check_chat_exists(current_user_id, partner_id):
         raise HTTPException(status_code=400, detail="Chat already exists")
 
     # Check if both users exist
-    if not db.check_user_exists(current_user_id) or not db.check_user_exists(partner_id):
+    if not await adb.check_user_exists(current_user_id) or not await adb.check_user_exists(partner_id):
         raise HTTPException(status_code=404, detail="User does not exist")
 
-    db.create_chat(current_user_id, partner_id)
+    await adb.create_chat(current_user_id, partner_id)
     return {"current_user_id": current_user_id, "partner_id": partner_id}
 
 
@@ -104,7 +104,7 @@ async def create_chat_message(chat_id: int, user_id: Annotated[int, Body()], mes
         A dictionary containing the chat ID, user ID and message content.
     """
 
-    db.create_chat_msg(chat_id, user_id, message)
+    await adb.create_chat_msg(chat_id, user_id, message)
     return {"chat_id": chat_id, "user_id": user_id, "message": message}
 
 # ------------------------- Put-Requests -------------------------
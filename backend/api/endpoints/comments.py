@@ -16,11 +16,11 @@ from fastapi import (
 )
 
 from backend.api.endpoints.auth import (
-    get_current_user_id,  # For retrieving the logged-in user id
-    is_privileged  # For checking if user is admin or moderator
+    get_current_user_id  # For retrieving the logged-in user id
 )
+from backend.api.permissions import has_permission, get_role_of_user  # For checking the permissions of the current user
 
-from backend.db_service import database as db  # Allows the manipulation and reading of the database
+from backend.db_service import async_database as adb  # Non-blocking manipulation and reading of the database
 
 # API router for the comment endpoints
 router = APIRouter(
@@ -51,12 +51,14 @@ async def update_comment(comment_id: int, new_content: Annotated[str, Body()],
         The new content of the comment (string).
     """
 
-    author_id = db.get_comment_by_id(comment_id).author_id
+    author_id = (await adb.get_comment_by_id(comment_id)).author_id
 
-    if current_user_id != author_id and not is_privileged(current_user_id):
+    # Admins and moderators may edit the content of other users as before, they are the roles with canDeleteContent.
+    # canEditContent is false for every role in roles.json and is not used until its meaning is decided.
+    if current_user_id != author_id and not has_permission(await get_role_of_user(current_user_id), "canDeleteContent"):
         raise HTTPException(status_code=403, detail="You are not allowed to edit this comment")
 
-    db.update_comment_content(comment_id, new_content)
+    await adb.update_comment_content(comment_id, new_content)
     return {"content": new_content}
 
 
@@ -74,10 +76,10 @@ async def delete_comment_by_id(comment_id: int, current_user_id: Annotated[int,
         An empty dictionary.
     """
 
-    author_id = db.get_comment_by_id(comment_id).author_id
+    author_id = (await adb.get_comment_by_id(comment_id)).author_id
 
-    if current_user_id != author_id and not is_privileged(current_user_id):
+    if current_user_id != author_id and not has_permission(await get_role_of_user(current_user_id), "canDeleteContent"):
         raise HTTPException(status_code=403, detail="You are not allowed to delete this comment")
 
-    db.delete_comment(comment_id)
+    await adb.delete_comment(comment_id)
     return {}  # Indicates that the comment was successfully deleted
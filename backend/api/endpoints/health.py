@@ -0,0 +1,58 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul enthält die Health-Endpunkte der API. Sie zeigen den Zustand der Hintergrundarbeiten des Servers, z.B. wie
+viele Posts noch auf ihre Tags warten, oder ob die Sprachverarbeitung geladen ist (Readiness-Probe).
+"""
+
+from fastapi import APIRouter, HTTPException  # For distributing endpoints into separate files and error handling
+
+from backend.db_service import async_database as adb  # Non-blocking manipulation and reading of the database
+from backend.db_service import tag_queue  # Queue and worker of the tag extraction
+from backend.db_service import nlp_resources  # State of the warmup of the language processing
+from backend.db_service import tag_management as tm  # Hit rate and timings of the tiers of the tag extraction
+
+# API router for the health endpoints
+router = APIRouter(
+    prefix="/health",
+    tags=["health"]  # Tags for the API documentation
+)
+
+
+# ------------------------- Get Requests -------------------------
+@router.get("/ready")
+async def get_ready():
+    """
+    Readiness probe: reports ready only after the language processing was warmed up (see nlp_resources.warmup). The
+    path has no trailing slash, so probes get no redirect.
+
+    Returns:
+        The state of the warmup (dictionary with status, error and seconds).
+
+    Raises:
+        HTTPException: If the warmup is not finished or failed (503).
+    """
+
+    if not nlp_resources.is_ready():
+        raise HTTPException(status_code=503, detail=dict(nlp_resources.readiness))
+
+    return dict(nlp_resources.readiness)
+
+
+@router.get("/tag_queue/")
+async def get_tag_queue():
+    """
+    Returns the depth of the tag extraction queue, the timings of the latest jobs and the hit rate of the fast tier.
+
+    Returns:
+        The number of waiting, running and failed jobs of the queue (shared by all workers), the counters and timings
+        of the tag worker of this process and the hit rate and timings per tier of the tag extraction of this process
+        (dictionary).
+    """
+
+    return {
+        "queue": await adb.run(tag_queue.get_queue_stats),
+        "worker": tag_queue.tag_worker.stats(),
+        "tiers": tm.tagger_stats.stats(),
+    }
@@ -22,13 +22,12 @@ from typing import (
 
 from backend.api.endpoints.auth import (
     get_current_user_id,  # For retrieving the logged-in user id
-    get_optional_current_user_id,  # For retrieving the logged-in user id if available
-    is_privileged  # For checking if user is admin or moderator
+    get_optional_current_user_id  # For retrieving the logged-in user id if available
 )
+from backend.api.permissions import has_permission, get_role_of_user  # For checking the permissions of the current user
 
-from backend.db_service.models import SortType, Post, Comment  # For the return objects
-from backend.db_service import database as db  # Allows the manipulation and reading of the database
-from backend.db_service import tag_management as tm  # Tag management
+from backend.db_service.models import SortType, Post, Comment, PostPage  # For the return objects
+from backend.db_service import async_database as adb  # Non-blocking manipulation and reading of the database
 
 # API router for the post endpoints
 router = APIRouter(
@@ -44,7 +43,8 @@ async def get_posts(
     search: str = Query(None),
     amount: int = Query(10),
     offset: int = Query(0),
-    sort: SortType = Query(SortType.RECOMMENDED)
+    sort: SortType = Query(SortType.RECOMMENDED),
+    cursor: str = Query(None, description="next_cursor of the previous page")
 ):
     """
     Returns posts according to the search query, amount, offset and sorting type.
@@ -52,15 +52,43 @@ async def get_posts(
     Args:
         search: The search query (string).
         amount: The amount of posts to return (integer).
-        offset: The offset for the posts to return (integer).
+        offset: The offset for the posts to return (integer). Ignored if a cursor is given.
         sort: The sorting type (SortType).
+        cursor: The cursor of the previous page (string). Optional, the first page is requested without it.
         current_user_id: The ID of the current user (integer). Optional.
 
     Returns:
-        A list of post objects (dictionaries).
+        A list of post objects (dictionaries) and the cursor for the next page (None if there are no more posts).
     """
 
-    return {"posts": db.get_posts(search, amount, offset, sort, current_user_id)}
+    try:
+        posts, next_cursor = await adb.get_posts(search, amount, offset, sort, current_user_id, cursor)
+    except ValueError as e:  # Invalid cursor
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"posts": posts, "next_cursor": next_cursor}
+
+
+@router.get("/search/")
+async def search_posts(
+    search: str = Query(..., description="Words, \"phrases\" and prefixes* to search for"),
+    amount: int = Query(10),
+    offset: int = Query(0)
+):
+    """
+    Searches the title and content of all posts. The results are ranked by relevance (BM25).
+
+    Args:
+        search: The search query (string). Supports phrases in double quotes and prefixes ending with *.
+        amount: The amount of results to return (integer).
+        offset: The offset for the results to return (integer).
+
+    Returns:
+        A list of search results (dictionaries): the post, its title with the matches highlighted in <mark> tags and a
+        snippet of the content around the matches.
+    """
+
+    return {"results": await adb.search_posts(search, amount, offset)}
 
 
 @router.get("/id/{post_id}/")
@@ -75,7 +103,7 @@ async def get_post_by_id(post_id: int) -> dict[str, Post]:
         A post object (dictionary).
     """
 
-    post = db.get_post_by_id(post_id)
+    post = await adb.get_post_by_id(post_id)
 
     if not post:  # Post not found
         raise HTTPException(status_code=404, detail="Post not found")
@@ -83,6 +111,38 @@ async def get_post_by_id(post_id: int) -> dict[str, Post]:
     return {"post": post}
 
 
+@router.get("/id/{post_id}/full/")
+async def get_post_page(
+    post_id: int,
+    current_user_id: Annotated[int, Depends(get_optional_current_user_id)],
+    comment_amount: int = Query(50, ge=1, le=200),
+    comments_cursor: str = Query(None, description="next_comments_cursor of the previous page")
+) -> PostPage:
+    """
+    Returns everything needed to display a post page in one request: the post, its tags and score, the vote of the
+    current user, a page of comments and the public information of the authors (each author only once).
+
+    Args:
+        post_id: The ID of the post (integer).
+        current_user_id: The ID of the current user (integer). Optional.
+        comment_amount: The amount of comments to return (integer).
+        comments_cursor: The cursor of the previous page of comments (string). Optional.
+
+    Returns:
+        The post page (dictionary).
+    """
+
+    try:
+        post_page = await adb.get_post_page(post_id, current_user_id, comment_amount, comments_cursor)
+    except ValueError as e:  # Invalid cursor
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not post_page:  # Post not found
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    return post_page
+
+
 @router.get("/id/{post_id}/tags/")
 async def get_tags_of_post(post_id: int):
     """
@@ -95,7 +155,7 @@ async def get_tags_of_post(post_id: int):
         A list of tags (strings).
     """
 
-    return {"tags": db.get_tags_of_post(post_id)}
+    return {"tags": await adb.get_tags_of_post(post_id)}
 
 
 @router.get("/id/{post_id}/votes/")
@@ -110,7 +170,7 @@ async def get_votes_of_post(post_id: int):
         The voting of the post (voting = upvotes - downvotes) (integer).
     """
 
-    return db.get_votes_of_post(post_id)
+    return await adb.get_votes_of_post(post_id)
 
 
 @router.get("/id/{post_id}/votes/user/")
@@ -126,7 +186,7 @@ async def get_vote_of_user(post_id: int, current_user_id: Annotated[int, Depends
         The vote of the user for the post (integer).
     """
     
-    return db.get_vote_of_user(post_id, current_user_id)
+    return await adb.get_vote_of_user(post_id, current_user_id)
 
 
 @router.get("/id/{post_id}/comments/")
@@ -141,7 +201,7 @@ async def get_comments_of_post(post_id: int):
         A list of comment objects (dictionaries).
     """
 
-    comments = db.get_comments_of_post(post_id)
+    comments = await adb.get_comments_of_post(post_id)
 
     return {"comments": comments}
 
@@ -158,7 +218,7 @@ async def get_comment_by_id(post_id: int, comment_id: int) -> Comment:
     Returns:
         A comment object (dictionary).
     """
-    comment = db.get_comment_by_id(comment_id)
+    comment = await adb.get_comment_by_id(comment_id)
 
     if not comment or comment.post_id != post_id:  # Comment not found or not associated with the post
         raise HTTPException(status_code=404, detail="Comment not found")
@@ -180,19 +240,17 @@ async def create_post(post: Post, current_user_id: Annotated[int, Depends(get_cu
         The ID of the post (integer).
     """
     # Validate if the user is not banned
-    role = db.get_user_by_id(current_user_id).role
-    if role == "banned":
+    if not has_permission(await get_role_of_user(current_user_id), "canCreateContent"):
         raise HTTPException(status_code=403, detail="You are banned and cannot create posts")
     
     # Create the post
-    post_id = db.create_post(current_user_id, post.title, post.content)
+    post_id = await adb.create_post(current_user_id, post.title, post.content)
 
     # Check if post creation was successful
     if not post_id:
         raise HTTPException(status_code=500, detail="Could not create post")
 
-    tags = tm.assign_tags_to_post(post.title, post.content)
-    db.update_tags_of_post(post_id, tags)
+    # The tags are extracted by the background worker of the tag queue (see tag_queue.py)
     return {"post_id": post_id}
 
 
@@ -210,15 +268,14 @@ async def create_comment(post_id: int, comment: Comment, current_user_id: Annota
         The comment object containing the content of the comment.
     """
     # Validate if the user is not banned
-    role = db.get_user_by_id(current_user_id).role
-    if role == "banned":
+    if not has_permission(await get_role_of_user(current_user_id), "canCreateContent"):
         raise HTTPException(status_code=403, detail="You are banned and cannot create comments")
 
     # Raise an error if the post does not exist or the user ID is not valid
-    if not (db.get_post_by_id(post_id) and current_user_id):
+    if not (await adb.get_post_by_id(post_id) and current_user_id):
         raise HTTPException(status_code=404, detail="This post does not exist")
 
-    db.create_comment(post_id, current_user_id, comment.content)
+    await adb.create_comment(post_id, current_user_id, comment.content)
 
     return {"comment": comment}
 
@@ -244,7 +301,7 @@ async def vote_post(
     if not current_user_id:
         raise HTTPException(status_code=401, detail="You need to be logged in to vote")
 
-    db.create_vote_post(current_user_id, post_id, vote)
+    await adb.create_vote_post(current_user_id, post_id, vote)
     return {"vote": vote}
 
 
@@ -267,12 +324,14 @@ async def update_post_content(
         The new content of the post (string).
     """
 
-    author_id = db.get_post_by_id(post_id).author_id
+    author_id = (await adb.get_post_by_id(post_id)).author_id
 
-    if current_user_id != author_id and not is_privileged(current_user_id):
+    # Admins and moderators may edit the content of other users as before, they are the roles with canDeleteContent.
+    # canEditContent is false for every role in roles.json and is not used until its meaning is decided.
+    if current_user_id != author_id and not has_permission(await get_role_of_user(current_user_id), "canDeleteContent"):
         raise HTTPException(status_code=403, detail="You are not allowed to edit this post")
 
-    db.update_post_content(post_id, new_content)
+    await adb.update_post_content(post_id, new_content)
     return {"content": new_content}
 
 
@@ -293,10 +352,10 @@ async def delete_post_with_comments(
         An empty dictionary.
     """
 
-    author_id = db.get_post_by_id(post_id).author_id
+    author_id = (await adb.get_post_by_id(post_id)).author_id
 
-    if current_user_id != author_id and not is_privileged(current_user_id):
+    if current_user_id != author_id and not has_permission(await get_role_of_user(current_user_id), "canDeleteContent"):
         raise HTTPException(status_code=403, detail="You are not allowed to delete this post")
 
-    db.delete_post_with_comments(post_id)
+    await adb.delete_post_with_comments(post_id)
     return {}  # Indicates that the post was successfully deleted
@@ -22,13 +22,17 @@ from fastapi import (
 from backend.api.endpoints.auth import (
     get_current_user_id,  # For retrieving the logged-in user id
     get_current_user,  # For retrieving the logged-in user
-    get_role_permissions  # For checking the permissions of the current user
+    revoke_user_tokens  # For ending the sessions of a banned user
 )
+from backend.api.permissions import has_permission, get_role_of_user  # For checking the permissions of the current user
 
 from backend.db_service.models import User  # Models for data transfer
-from backend.db_service import database as db  # Allows the manipulation and reading of the database
+from backend.db_service import async_database as adb  # Non-blocking manipulation and reading of the database
 
 
+# Maximum number of users which can be requested at once from /users/batch/
+MAX_BATCH_USERS = 500
+
 # API router for the user endpoints
 router = APIRouter(
     prefix="/users",
@@ -92,7 +96,39 @@ async def get_chats_of_user(current_user_id: Annotated[int, Depends(get_current_
         A list of chat objects (dictionaries).
     """
 
-    return {"chats": db.get_chats_of_user(current_user_id)}
+    return {"chats": await adb.get_chats_of_user(current_user_id)}
+
+
+@router.get("/batch/")
+async def get_users_by_ids(
+    ids: str = Query(..., description="Comma-separated list of user IDs"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to include in the response")
+) -> dict[str, dict[int, User]]:
+    """
+    Returns the public information of several users with a single database query.
+
+    Args:
+        ids: Comma-separated user IDs (string), e.g. "1,2,3". At most MAX_BATCH_USERS.
+        fields: Optional parameter specifying which fields to include in the response.
+
+    Returns:
+        A dictionary mapping the user IDs to user objects. Users which do not exist are left out.
+    """
+
+    try:
+        user_ids = [int(user_id) for user_id in ids.split(",") if user_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+
+    if len(user_ids) > MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_USERS} users can be requested at once")
+
+    users = await adb.get_public_users_by_ids(user_ids)
+
+    if fields:  # If fields parameter is provided, filter user data
+        return {"users": {user.user_id: filter_user_fields(user, fields.split(",")) for user in users}}
+
+    return {"users": {user.user_id: user for user in users}}
 
 
 @router.get("/id/{user_id}/")
@@ -104,7 +140,7 @@ async def get_user_by_id(
     If a user with the given user_id exists, its public information is returned.
     """
 
-    user = db.get_public_user_by_id(user_id)
+    user = await adb.get_public_user_by_id(user_id)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -124,7 +160,7 @@ async def get_user_by_username(
     If a user with the given username exists, its public information is returned.
     """
 
-    user = db.get_public_user_by_username(username)
+    user = await adb.get_public_user_by_username(username)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -143,12 +179,12 @@ async def ban_user(user_id: int, current_user_id: Annotated[int, Depends(get_cur
     """
 
     # Verify if the current user can ban this user
-    current_user_role = db.get_user_by_id(current_user_id).role
-    user_role = db.get_user_by_id(user_id).role
-    role_permissions = get_role_permissions(current_user_role)
+    current_user_role = await get_role_of_user(current_user_id)
+    user_role = await get_role_of_user(user_id)
 
-    if role_permissions["canBanUser"] and user_role == "user":
-        db.update_role(user_id, "banned")
+    if has_permission(current_user_role, "canBanUser") and user_role == "user":
+        await adb.update_role(user_id, "banned")
+        revoke_user_tokens(user_id)  # Existing sessions end immediately
         return {"message": "User has been banned."}
     else:
         raise HTTPException(status_code=403, detail="You do not have permission to ban this user.")
@@ -161,12 +197,11 @@ async def promote_user_to_moderator(user_id: int, current_user_id: Annotated[int
     """
 
     # Verify if the current user can promote this user
-    current_user_role = db.get_user_by_id(current_user_id).role
-    user_role = db.get_user_by_id(user_id).role
-    role_permissions = get_role_permissions(current_user_role)
+    current_user_role = await get_role_of_user(current_user_id)
+    user_role = await get_role_of_user(user_id)
 
-    if role_permissions["canPromoteToMod"] and user_role == "user":
-        db.update_role(user_id, "moderator")
+    if has_permission(current_user_role, "canPromoteToMod") and user_role == "user":
+        await adb.update_role(user_id, "moderator")
         return {"message": "User has been promoted to moderator."}
     else:
         raise HTTPException(status_code=403, detail="You do not have permission to promote this user to moderator.")
@@ -179,12 +214,11 @@ async def promote_user_to_admin(user_id: int, current_user_id: Annotated[int, De
     """
 
     # Verify if the current user can promote this user
-    current_user_role = db.get_user_by_id(current_user_id).role
-    user_role = db.get_user_by_id(user_id).role
-    role_permissions = get_role_permissions(current_user_role)
+    current_user_role = await get_role_of_user(current_user_id)
+    user_role = await get_role_of_user(user_id)
 
-    if role_permissions["canPromoteToAdmin"] and (user_role == 'user' or user_role == 'moderator'):
-        db.update_role(user_id, "admin")
+    if has_permission(current_user_role, "canPromoteToAdmin") and (user_role == 'user' or user_role == 'moderator'):
+        await adb.update_role(user_id, "admin")
         return {"message": "User has been promoted to admin."}
     else:
         raise HTTPException(status_code=403, detail="You do not have permission to promote this user to admin.")
@@ -197,12 +231,11 @@ async def demote_moderator_to_user(user_id: int, current_user_id: Annotated[int,
     """
 
     # Verify if the current user can demote this user
-    current_user_role = db.get_user_by_id(current_user_id).role
-    user_role = db.get_user_by_id(user_id).role
-    role_permissions = get_role_permissions(current_user_role)
+    current_user_role = await get_role_of_user(current_user_id)
+    user_role = await get_role_of_user(user_id)
 
-    if role_permissions["canDemoteMod"] and user_role == "moderator":
-        db.update_role(user_id, "user")
+    if has_permission(current_user_role, "canDemoteMod") and user_role == "moderator":
+        await adb.update_role(user_id, "user")
         return {"message": "User has been demoted to user."}
     else:
         raise HTTPException(status_code=403, detail="You do not have permission to demote this user to user.")
@@ -215,12 +248,11 @@ async def demote_admin_to_moderator(user_id: int, current_user_id: Annotated[int
     """
 
     # Verify if the current user can demote this user
-    current_user_role = db.get_user_by_id(current_user_id).role
-    user_role = db.get_user_by_id(user_id).role
-    role_permissions = get_role_permissions(current_user_role)
+    current_user_role = await get_role_of_user(current_user_id)
+    user_role = await get_role_of_user(user_id)
 
-    if role_permissions["canDemoteAdmin"] and user_role == "admin":
-        db.update_role(user_id, "moderator")
+    if has_permission(current_user_role, "canDemoteAdmin") and user_role == "admin":
+        await adb.update_role(user_id, "moderator")
         return {"message": "User has been demoted to moderator."}
     else:
         raise HTTPException(status_code=403, detail="You do not have permission to demote this user to moderator.")
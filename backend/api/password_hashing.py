@@ -0,0 +1,128 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul führt das Hashen und Prüfen von Passwörtern (bcrypt) in einem eigenen, begrenzten Thread-Pool aus. Eine
+bcrypt-Berechnung dauert mehrere hundert Millisekunden. Im Event-Loop würde sie während dieser Zeit alle anderen
+Anfragen blockieren. bcrypt gibt während der Berechnung den GIL frei, daher laufen mehrere Berechnungen in Threads
+tatsächlich parallel. Sind bereits zu viele Berechnungen in Arbeit oder in der Warteschlange, wird die Anfrage sofort
+mit PasswordHasherBusy abgelehnt, statt den Server zu überlasten.
+"""
+
+import asyncio  # For awaiting the hashing threads
+import threading  # For counting the pending calculations
+from concurrent.futures import ThreadPoolExecutor  # Thread pool for the bcrypt calculations
+
+from passlib.context import CryptContext  # For password hashing and verification
+
+# Default number of threads calculating bcrypt hashes at the same time
+DEFAULT_WORKERS = 2
+
+# Default maximum number of calculations running or waiting. Further calls are rejected.
+DEFAULT_QUEUE_LIMIT = 16
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised if the password hasher already has the maximum number of pending calculations.
+    """
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with bcrypt in a bounded thread pool.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_limit: int = DEFAULT_QUEUE_LIMIT):
+        """
+        Args:
+            workers: Number of threads calculating hashes at the same time.
+            queue_limit: Maximum number of calculations running or waiting for a thread.
+        """
+
+        # Password hashing using the bcrypt algorithm.
+        # The deprecated parameter is set to "auto" to automatically update the hashing algorithm.
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+        self.pending = 0  # Calculations running or waiting
+        self.completed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    async def run(self, func, *args):
+        """
+        Runs a calculation in the thread pool, unless too many calculations are pending.
+
+        Args:
+            func: The function to run.
+            *args: Arguments for the function.
+
+        Returns:
+            The return value of the function.
+
+        Raises:
+            PasswordHasherBusy: If queue_limit calculations are already pending.
+        """
+
+        with self._lock:
+            if self.pending >= self.queue_limit:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+
+            self.pending += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        """
+        Hashes a password using bcrypt.
+
+        Args:
+            password: The password (string).
+
+        Returns:
+            The hashed password (string).
+        """
+
+        return await self.run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verifies a password using bcrypt.
+
+        Args:
+            plain_password: The plain password (string).
+            hashed_password: The hashed password (string).
+
+        Returns:
+            True if the hashed form of the plain password matches the hashed password. Otherwise, False.
+        """
+
+        return await self.run(self.context.verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """
+        Returns the configuration and counters of the hasher.
+
+        Returns:
+            A dictionary with workers, queue_limit, pending, completed and rejected.
+        """
+
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
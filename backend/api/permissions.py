@@ -0,0 +1,147 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul stellt die Berechtigungen der Rollen aus roles.json bereit. Die Datei wird einmal eingelesen und in eine
+unveränderliche Tabelle (Rolle -> erlaubte Berechtigungen) übersetzt. Eine Berechtigungsprüfung liest danach nur noch
+aus dem Speicher. Wird roles.json geändert, lädt das Modul die Datei anhand der Änderungszeit (mtime) neu. Die
+Änderungszeit wird höchstens einmal pro RELOAD_CHECK_INTERVAL geprüft.
+
+Verwendung: `has_permission(role, "canBanUser")`
+"""
+
+import os  # For file path operations and the modification time of roles.json
+import json  # For parsing roles.json
+import time  # For limiting how often the modification time is checked
+import logging  # For reporting an invalid roles.json
+import threading  # For loading the file only once when several threads check permissions
+from types import MappingProxyType  # For the read-only permission table
+from typing import Optional  # For optional parameters
+
+from backend.db_service import async_database as adb  # Non-blocking reading of the database
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROLES_PATH = os.path.join(CURRENT_DIR, "../roles.json")
+
+# Minimum time between two checks of the modification time of roles.json (seconds)
+RELOAD_CHECK_INTERVAL = 1.0
+
+# Role of users which are not logged in (or do not exist)
+GUEST_ROLE = "guest"
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionMatrix:
+    """
+    Immutable table of the permissions granted to each role.
+    """
+
+    def __init__(self, roles: dict[str, dict[str, bool]]):
+        """
+        Args:
+            roles: The content of roles.json, mapping each role to its permissions (name -> granted).
+        """
+
+        self.roles = MappingProxyType({
+            role: frozenset(permission for permission, granted in permissions.items() if granted)
+            for role, permissions in roles.items()
+        })
+        self.permissions = frozenset(permission for permissions in roles.values() for permission in permissions)
+
+    def has_permission(self, role: Optional[str], permission: str) -> bool:
+        if permission not in self.permissions:  # Most likely a typo, which would otherwise silently deny
+            raise ValueError(f"Unknown permission: {permission}")
+
+        return permission in self.roles.get(role or GUEST_ROLE, frozenset())
+
+
+_matrix: Optional[PermissionMatrix] = None  # The current permission table
+_mtime: Optional[int] = None  # Modification time of roles.json when it was loaded (nanoseconds)
+_next_check = 0.0  # time.monotonic() after which the modification time is checked again
+_lock = threading.Lock()
+
+
+def load_permissions(path: str) -> PermissionMatrix:
+    """
+    Reads roles.json and compiles it into a permission table.
+
+    Args:
+        path: The path of the roles file.
+
+    Returns:
+        The permission table.
+    """
+
+    with open(path, encoding="utf-8") as f:
+        return PermissionMatrix(json.load(f))
+
+
+def get_permissions() -> PermissionMatrix:
+    """
+    Returns the current permission table. roles.json is loaded on the first call and loaded again if it has been
+    modified since. If the modified file is invalid, the previous table is kept.
+
+    Returns:
+        The permission table.
+    """
+
+    global _matrix, _mtime, _next_check
+
+    if _matrix is not None and time.monotonic() < _next_check:
+        return _matrix
+
+    with _lock:
+        if _matrix is not None and time.monotonic() < _next_check:  # Another thread checked in the meantime
+            return _matrix
+
+        mtime = os.stat(ROLES_PATH).st_mtime_ns
+
+        if mtime != _mtime:
+            try:
+                _matrix = load_permissions(ROLES_PATH)
+            except (OSError, ValueError, AttributeError) as e:
+                if _matrix is None:  # Nothing to fall back to
+                    raise
+                logger.warning("Could not reload %s, keeping the previous permissions: %s", ROLES_PATH, e)
+
+            _mtime = mtime  # An invalid file is only read again once it is modified
+
+        _next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+
+    return _matrix
+
+
+def has_permission(role: Optional[str], permission: str) -> bool:
+    """
+    Checks if a role has a permission.
+
+    Args:
+        role: The role (string), e.g. "moderator". None stands for a guest.
+        permission: The name of the permission in roles.json, e.g. "canBanUser".
+
+    Returns:
+        True if the role has the permission. Otherwise (also for unknown roles), False.
+
+    Raises:
+        ValueError: If the permission does not exist in roles.json.
+    """
+
+    return get_permissions().has_permission(role, permission)
+
+
+async def get_role_of_user(user_id: Optional[int]) -> Optional[str]:
+    """
+    Returns the role of a user. All role lookups for permission checks go through this function.
+
+    Args:
+        user_id: The ID of the user (integer). None for a guest.
+
+    Returns:
+        The role of the user (string), None if the user does not exist.
+    """
+
+    if user_id is None:
+        return GUEST_ROLE
+
+    return await adb.get_role_of_user(user_id)
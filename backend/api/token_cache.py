@@ -0,0 +1,191 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul enthält einen begrenzten Cache für bereits geprüfte Access Tokens (JWT). Das Frontend sendet bei jeder
+Anfrage dasselbe Token mit. Die Signatur muss deshalb nur beim ersten Mal geprüft werden. Danach liefert der Cache die
+Benutzer-ID bis zum Ablauf des Tokens (exp). Als Schlüssel dient ein SHA-256-Hash des Tokens, das Token selbst wird
+nicht gespeichert.
+
+Tokens können gesperrt werden: einzeln (Logout) oder alle vor einem Zeitpunkt ausgestellten Tokens eines Benutzers
+(Sperrung). Die Sperren gelten auch für Tokens, die noch nicht im Cache sind. Sie werden nur im Speicher des Prozesses
+gehalten und gehen bei einem Neustart verloren.
+"""
+
+import time  # For the expiry of the tokens
+import hashlib  # For the digest of the tokens
+import threading  # For protecting the cache against concurrent access
+from collections import OrderedDict  # For the least recently used order
+from typing import Optional  # For optional return values
+
+# Maximum number of verified tokens kept in the cache
+TOKEN_CACHE_SIZE = 10000
+
+
+def token_digest(token: str) -> bytes:
+    """
+    Returns the key of a token in the cache.
+
+    Args:
+        token: The encoded token (string).
+
+    Returns:
+        The SHA-256 digest of the token.
+    """
+
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """
+    Thread-safe LRU cache of verified tokens, mapping the digest of a token to its user ID and expiry time.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.rejected = 0  # Revoked tokens which were presented again
+        self.evictions = 0
+
+        self._tokens = OrderedDict()  # digest -> (user_id, issued_at, expires_at), least recently used first
+        self._revoked_tokens = {}  # digest -> expires_at, for logouts
+        self._revoked_users = {}  # user_id -> time before which all tokens of the user were issued, for bans
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[int]:
+        """
+        Returns the user ID of a cached, unexpired and not revoked token.
+
+        Args:
+            token: The encoded token (string).
+
+        Returns:
+            The user ID, None if the token is not in the cache (it must then be verified and added with put()).
+        """
+
+        digest = token_digest(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._tokens.get(digest)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            user_id, _, expires_at = entry
+
+            if expires_at <= now:
+                del self._tokens[digest]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._tokens.move_to_end(digest)
+            return user_id
+
+    def put(self, token: str, claims: dict) -> bool:
+        """
+        Adds a verified token to the cache, unless it has been revoked.
+
+        Args:
+            token: The encoded token (string).
+            claims: The verified claims of the token (sub, iat, exp).
+
+        Returns:
+            True if the token may be used, False if it has been revoked.
+        """
+
+        digest = token_digest(token)
+        user_id, issued_at, expires_at = claims["sub"], claims.get("iat", 0), claims["exp"]
+
+        with self._lock:
+            if self._is_revoked(digest, user_id, issued_at):
+                self.rejected += 1
+                return False
+
+            self._tokens[digest] = (user_id, issued_at, expires_at)
+            self._tokens.move_to_end(digest)
+
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+                self.evictions += 1
+
+        return True
+
+    def revoke_token(self, token: str, expires_at: float):
+        """
+        Revokes a single token, e.g. on logout.
+
+        Args:
+            token: The encoded token (string).
+            expires_at: The expiry time of the token (Unix time). The revocation is kept until then.
+        """
+
+        digest = token_digest(token)
+
+        with self._lock:
+            self._tokens.pop(digest, None)
+            self._revoked_tokens[digest] = expires_at
+            self._prune(time.time())
+
+    def revoke_user(self, user_id: int, max_token_lifetime: float):
+        """
+        Revokes all tokens of a user issued until now, e.g. when the user is banned.
+
+        Args:
+            user_id: The ID of the user.
+            max_token_lifetime: The lifetime of a token (seconds). After this time, all revoked tokens have expired.
+        """
+
+        now = time.time()
+
+        with self._lock:
+            for digest in [digest for digest, entry in self._tokens.items() if entry[0] == user_id]:
+                del self._tokens[digest]
+
+            self._revoked_users[user_id] = (now, now + max_token_lifetime)
+            self._prune(now)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        Returns:
+            A dictionary with the size, hits, misses, hit rate, expired, rejected, evictions and revocations.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self._tokens),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+                "revoked_tokens": len(self._revoked_tokens),
+                "revoked_users": len(self._revoked_users),
+            }
+
+    def _is_revoked(self, digest: bytes, user_id: int, issued_at: float) -> bool:
+        # Must be called with the lock held
+        if digest in self._revoked_tokens:
+            return True
+
+        revocation = self._revoked_users.get(user_id)
+        return revocation is not None and issued_at <= revocation[0]
+
+    def _prune(self, now: float):
+        # Must be called with the lock held. Revocations of tokens which have expired anyway are no longer needed.
+        for digest in [digest for digest, expires_at in self._revoked_tokens.items() if expires_at <= now]:
+            del self._revoked_tokens[digest]
+
+        for user_id in [user_id for user_id, (_, until) in self._revoked_users.items() if until <= now]:
+            del self._revoked_users[user_id]
@@ -0,0 +1,67 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul stellt die Funktionen aus database.py für die asynchronen Endpunkte bereit. Die Abfragen laufen in einem
+eigenen, begrenzten Thread-Pool, damit eine langsame Abfrage nicht den Event-Loop von FastAPI blockiert und andere
+Anfragen warten müssen.
+
+Verwendung: `await adb.get_post_by_id(post_id)` anstelle von `db.get_post_by_id(post_id)`.
+"""
+
+import asyncio  # For awaiting the database threads
+import functools  # For wrapping the database functions
+import inspect  # For checking which attributes of database.py are functions
+from concurrent.futures import ThreadPoolExecutor  # Thread pool for the database queries
+
+from backend.db_service import database as db  # The synchronous database functions
+
+# Maximum number of threads running database queries. Each thread keeps its own pooled connection, so this also bounds
+# the number of open connections.
+DB_WORKERS = 8
+
+# Thread pool which runs all database queries of the endpoints
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+
+async def run(func, *args, **kwargs):
+    """
+    Runs a synchronous function in the database thread pool and waits for its result without blocking the event loop.
+
+    Args:
+        func: The function to run.
+        *args: Positional arguments for the function.
+        **kwargs: Keyword arguments for the function.
+
+    Returns:
+        The return value of the function.
+    """
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+
+def __getattr__(name):
+    """
+    Returns an awaitable version of the function with the same name in database.py.
+    The wrapper is created on first access and then stored in this module.
+
+    Args:
+        name: The name of the database function.
+
+    Returns:
+        An async function which runs the database function in the database thread pool.
+    """
+
+    func = getattr(db, name, None)
+
+    # Only the functions defined in database.py are wrapped, not imported helpers or constants
+    if not inspect.isfunction(func) or func.__module__ != db.__name__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+
+    globals()[name] = wrapper
+    return wrapper
@@ -0,0 +1,459 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul enthält die zweite Empfehlungsmethode, das kollaborative Filtern. Aus den Bewertungen (posts_votes) wird
+eine dünnbesetzte Matrix Benutzer × Posts gebildet und für jeden Post die Kosinus-Ähnlichkeit zu allen anderen Posts
+berechnet. Pro Post werden die NEIGHBORS ähnlichsten Posts gespeichert. Ein Benutzer bekommt die Nachbarn der Posts
+empfohlen, die er bewertet hat, gewichtet mit seiner Bewertung und der Ähnlichkeit.
+
+Das Modell wird von einem Hintergrundjob nachgeführt. Trigger merken sich die Posts, deren Bewertungen sich geändert
+haben (Tabelle cf_dirty_posts, siehe Migration 0008), und nur deren Nachbarn werden neu berechnet. Die Nachbarn der
+übrigen Posts werden übernommen und erst beim nächsten vollständigen Neuaufbau wieder genau. Das Modell wird als
+NumPy-Arrays neben der Datenbank gespeichert und mit mmap gelesen, so dass sich alle Worker-Prozesse den Speicher teilen
+und ein neues Modell ohne Neustart übernehmen.
+"""
+
+import os  # For the model files
+import json  # For the file which names the current model and for passing the post ids as one parameter
+import time  # For the age of the model and the lock
+import uuid  # For the names of the model directories
+import shutil  # For removing old models
+import logging  # For errors of the background job
+import threading  # For the background job and the loaded model
+from dataclasses import dataclass  # For the model
+from typing import Optional  # For optional parameters
+
+import numpy as np  # For the model arrays
+from scipy.sparse import csr_matrix, diags  # For the sparse vote matrix
+
+from backend.db_service.connection import pool, Database, Transaction, ReadTransaction  # Database access
+
+# Number of most similar posts stored per post
+NEIGHBORS = 50
+
+# Number of posts whose similarities are calculated at once. Bounds the memory of the intermediate products.
+BLOCK_SIZE = 1024
+
+# Seconds between two runs of the background job
+REBUILD_INTERVAL = 60
+
+# The model is rebuilt completely if more than this share of the posts changed since the last build ...
+FULL_REBUILD_SHARE = 0.2
+
+# ... or if the last complete build is older than this number of seconds
+FULL_REBUILD_AGE = 24 * 60 * 60
+
+# Seconds between two checks whether another process saved a newer model
+RELOAD_INTERVAL = 1.0
+
+# A lock file older than this number of seconds was left behind by a crashed build
+LOCK_TIMEOUT = 30 * 60
+
+MODEL_DIR_NAME = "collaborative_filtering"  # Directory of the models, next to the database file
+CURRENT_FILE = "current.json"  # Names the current model in the directory
+LOCK_FILE = "build.lock"  # Exists while a process builds a model
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Model:
+    """
+    The nearest neighbours of every post which has votes.
+    """
+
+    name: str  # Name of the model directory
+    post_ids: np.ndarray  # Sorted ids of the posts with votes
+    neighbors: np.ndarray  # One row per post: ids of the most similar posts, the most similar first, -1 if unused
+    similarities: np.ndarray  # One row per post: cosine similarities of the neighbours
+    built_at: float  # Unix time of the last complete build
+    updated_at: float  # Unix time of the last update
+
+
+# ------------------------- Model Files -------------------------
+
+def get_model_dir() -> str:
+    """
+    Returns the directory of the models, which belongs to the database of the connection pool.
+    """
+
+    return os.path.join(os.path.dirname(os.path.abspath(pool.db_path)), MODEL_DIR_NAME)
+
+
+def get_current_name(model_dir: str) -> Optional[str]:
+    """
+    Returns the name of the current model in a directory, None if no model was saved yet.
+    """
+
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE), encoding="utf-8") as file:
+            return json.load(file)["name"]
+    except FileNotFoundError:
+        return None
+
+
+def load_model(model_dir: str) -> Optional[Model]:
+    """
+    Loads the current model of a directory. The arrays are memory-mapped, so all processes share the pages.
+
+    Args:
+        model_dir: The directory of the models.
+
+    Returns:
+        The model, None if no model was saved yet.
+    """
+
+    name = get_current_name(model_dir)
+
+    if name is None:
+        return None
+
+    path = os.path.join(model_dir, name)
+
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as file:
+        meta = json.load(file)
+
+    return Model(
+        name=name,
+        post_ids=np.load(os.path.join(path, "post_ids.npy"), mmap_mode="r"),
+        neighbors=np.load(os.path.join(path, "neighbors.npy"), mmap_mode="r"),
+        similarities=np.load(os.path.join(path, "similarities.npy"), mmap_mode="r"),
+        built_at=meta["built_at"],
+        updated_at=meta["updated_at"],
+    )
+
+
+def save_model(model_dir: str, post_ids: np.ndarray, neighbors: np.ndarray, similarities: np.ndarray,
+               built_at: float) -> str:
+    """
+    Saves a model into a new directory and then makes it the current model. The file naming the current model is
+    replaced atomically, so readers see either the old or the new model. Older models are removed, the previous one is
+    kept for readers which are still loading it.
+
+    Args:
+        model_dir: The directory of the models.
+        post_ids: The sorted ids of the posts with votes.
+        neighbors: The neighbours of the posts.
+        similarities: The similarities of the neighbours.
+        built_at: The Unix time of the last complete build.
+
+    Returns:
+        The name of the new model.
+    """
+
+    previous_name = get_current_name(model_dir)
+    name = f"model-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(model_dir, name)
+    os.makedirs(path)
+
+    np.save(os.path.join(path, "post_ids.npy"), post_ids)
+    np.save(os.path.join(path, "neighbors.npy"), neighbors)
+    np.save(os.path.join(path, "similarities.npy"), similarities)
+
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as file:
+        json.dump({"built_at": built_at, "updated_at": time.time(), "neighbors": NEIGHBORS}, file)
+
+    current_path = os.path.join(model_dir, CURRENT_FILE)
+    with open(current_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump({"name": name}, file)
+    os.replace(current_path + ".tmp", current_path)
+
+    for entry in os.listdir(model_dir):
+        if entry.startswith("model-") and entry not in (name, previous_name):
+            shutil.rmtree(os.path.join(model_dir, entry), ignore_errors=True)
+
+    return name
+
+
+def acquire_lock(model_dir: str) -> bool:
+    """
+    Creates the lock file of a directory, so only one process builds a model at a time.
+
+    Returns:
+        True if the lock was acquired, False if another process holds it.
+    """
+
+    path = os.path.join(model_dir, LOCK_FILE)
+
+    try:
+        if time.time() - os.path.getmtime(path) > LOCK_TIMEOUT:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def release_lock(model_dir: str):
+    """
+    Removes the lock file of a directory (see acquire_lock).
+    """
+
+    try:
+        os.remove(os.path.join(model_dir, LOCK_FILE))
+    except FileNotFoundError:
+        pass
+
+
+# ------------------------- Training -------------------------
+
+def load_votes(cur) -> np.ndarray:
+    """
+    Reads all votes.
+
+    Args:
+        cur: A cursor of the database.
+
+    Returns:
+        An array with one row (user_id, post_id, vote) per vote.
+    """
+
+    cur.row_factory = None  # Plain tuples, a vote table can have millions of rows
+    cur.execute("SELECT user_id, post_id, vote FROM posts_votes")
+
+    return np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 3)
+
+
+def build_vote_matrix(votes: np.ndarray) -> tuple[csr_matrix, np.ndarray]:
+    """
+    Builds the sparse matrix users × posts with the votes (+1 or -1) and normalizes its columns, so the product of two
+    columns is the cosine similarity of the posts.
+
+    Args:
+        votes: The votes (see load_votes).
+
+    Returns:
+        A tuple of the normalized matrix and the sorted post ids of its columns.
+    """
+
+    user_ids, users = np.unique(votes[:, 0], return_inverse=True)
+    post_ids, posts = np.unique(votes[:, 1], return_inverse=True)
+
+    matrix = csr_matrix((votes[:, 2].astype(np.float64), (users, posts)), shape=(len(user_ids), len(post_ids)))
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+
+    return (matrix @ diags(1.0 / norms)).tocsr(), post_ids
+
+
+def compute_neighbors(matrix: csr_matrix, post_ids: np.ndarray,
+                      columns: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the most similar posts of some posts (item-item cosine similarity). Only posts which share voters have a
+    similarity, so every block multiplies sparse matrices. Only positive similarities are kept.
+
+    Args:
+        matrix: The normalized vote matrix (see build_vote_matrix).
+        post_ids: The post ids of the columns of the matrix.
+        columns: The columns of the posts whose neighbours are calculated.
+
+    Returns:
+        A tuple of the neighbours (post ids, -1 if unused) and their similarities, one row per column.
+    """
+
+    neighbors = np.full((len(columns), NEIGHBORS), -1, dtype=np.int64)
+    similarities = np.zeros((len(columns), NEIGHBORS), dtype=np.float32)
+    transposed = matrix.T.tocsr()  # posts × users
+
+    for start in range(0, len(columns), BLOCK_SIZE):
+        block = columns[start:start + BLOCK_SIZE]
+        products = (transposed[block] @ matrix).tocsr()  # block × posts
+
+        for row, column in enumerate(block):
+            begin, end = products.indptr[row], products.indptr[row + 1]
+            items, values = products.indices[begin:end], products.data[begin:end]
+
+            keep = (values > 0) & (items != column)
+            items, values = items[keep], values[keep]
+
+            if len(items) > NEIGHBORS:
+                top = np.argpartition(-values, NEIGHBORS - 1)[:NEIGHBORS]
+                items, values = items[top], values[top]
+
+            # The most similar first, ties by the newer post
+            order = np.lexsort((-post_ids[items], -values))
+            neighbors[start + row, :len(order)] = post_ids[items[order]]
+            similarities[start + row, :len(order)] = values[order]
+
+    return neighbors, similarities
+
+
+def update_model(full: bool = False) -> Optional[dict]:
+    """
+    Brings the model of the current database up to date. The neighbours of the posts whose votes changed since the last
+    run are recalculated, the other rows are copied from the current model. The model is rebuilt completely if there is
+    none yet, if too many posts changed or if the last complete build is too old.
+
+    Args:
+        full: Rebuild the model completely.
+
+    Returns:
+        A dictionary with the kind of update, the number of votes, posts and recalculated posts and the duration in
+        seconds. None if nothing changed or another process is building the model.
+    """
+
+    model_dir = get_model_dir()
+    os.makedirs(model_dir, exist_ok=True)
+
+    if not acquire_lock(model_dir):
+        return None
+
+    dirty_ids = []
+    try:
+        start = time.perf_counter()
+        current = load_model(model_dir)
+
+        # Only the marks are taken in the write transaction. A vote after this marks its post again for the next run.
+        with Transaction() as cur:
+            cur.execute("SELECT post_id FROM cf_dirty_posts")
+            dirty_ids = [result["post_id"] for result in cur.fetchall()]
+
+            if current is not None and not full and not dirty_ids:
+                return None
+
+            cur.execute("DELETE FROM cf_dirty_posts WHERE post_id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(dirty_ids),))
+
+        # The votes are read from a snapshot without blocking the writers, they include every vote of the taken posts
+        with ReadTransaction() as cur:
+            votes = load_votes(cur)
+
+        matrix, post_ids = build_vote_matrix(votes)
+
+        full = full or current is None or time.time() - current.built_at > FULL_REBUILD_AGE
+        if not full:
+            # Posts which are in the current model and whose votes did not change keep their neighbours
+            reusable = np.isin(post_ids, current.post_ids) & ~np.isin(post_ids, dirty_ids)
+            full = np.count_nonzero(~reusable) > FULL_REBUILD_SHARE * len(post_ids)
+
+        columns = np.arange(len(post_ids)) if full else np.flatnonzero(~reusable)
+        neighbors = np.full((len(post_ids), NEIGHBORS), -1, dtype=np.int64)
+        similarities = np.zeros((len(post_ids), NEIGHBORS), dtype=np.float32)
+
+        neighbors[columns], similarities[columns] = compute_neighbors(matrix, post_ids, columns)
+
+        if not full:
+            rows = np.searchsorted(current.post_ids, post_ids[reusable])
+            neighbors[reusable] = current.neighbors[rows]
+            similarities[reusable] = current.similarities[rows]
+
+        save_model(model_dir, post_ids, neighbors, similarities, time.time() if full else current.built_at)
+        _model_changed.set()  # This process uses the new model right away
+
+        return {
+            "mode": "full" if full else "incremental",
+            "votes": len(votes),
+            "posts": len(post_ids),
+            "recalculated": len(columns),
+            "seconds": time.perf_counter() - start,
+        }
+    except Exception:
+        # The changed posts are recalculated in the next run
+        with Transaction() as cur:
+            cur.executemany("INSERT OR IGNORE INTO cf_dirty_posts (post_id) VALUES (?)",
+                            [(post_id,) for post_id in dirty_ids])
+        raise
+    finally:
+        release_lock(model_dir)
+
+
+def run_rebuild_job(stop: threading.Event, interval: float = REBUILD_INTERVAL):
+    """
+    Updates the model every interval seconds until stop is set. Meant to run in a background thread.
+
+    Args:
+        stop: Event which ends the job.
+        interval: Seconds between two updates.
+    """
+
+    while not stop.is_set():
+        try:
+            update_model()
+        except Exception:
+            logger.exception("Updating the collaborative filtering model failed")
+
+        stop.wait(interval)
+
+
+# ------------------------- Serving -------------------------
+
+_loaded_model = None  # (model directory, model) of the model used for the recommendations
+_checked_at = 0.0  # Monotonic time of the last check for a newer model
+_model_changed = threading.Event()  # Set when this process saved a new model
+_model_lock = threading.Lock()
+
+
+def get_model() -> Optional[Model]:
+    """
+    Returns the current model of the database. Checks at most every RELOAD_INTERVAL seconds whether a newer model was
+    saved, possibly by another process.
+
+    Returns:
+        The model, None if no model was built yet.
+    """
+
+    global _loaded_model, _checked_at
+
+    model_dir = get_model_dir()
+    now = time.monotonic()
+
+    with _model_lock:
+        if (_loaded_model is not None and _loaded_model[0] == model_dir and now - _checked_at < RELOAD_INTERVAL
+                and not _model_changed.is_set()):
+            return _loaded_model[1]
+
+        _checked_at = now
+        _model_changed.clear()
+        model = _loaded_model[1] if _loaded_model is not None and _loaded_model[0] == model_dir else None
+
+        if model is None or model.name != get_current_name(model_dir):
+            model = load_model(model_dir)
+            _loaded_model = (model_dir, model)
+
+        return model
+
+
+def score_posts(user_id: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Scores the posts for a user: every post the user voted on adds the similarities of its neighbours, multiplied by
+    the vote, so the neighbours of downvoted posts lose score. Posts which the user already voted on are scored 0.
+
+    Args:
+        user_id: The id of the user.
+
+    Returns:
+        A tuple of the scored post ids and their scores. Empty if there is no model or the user has no votes in it.
+    """
+
+    empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    model = get_model()
+
+    if model is None or len(model.post_ids) == 0:
+        return empty
+
+    with Database() as cur:
+        cur.row_factory = None
+        cur.execute("SELECT post_id, vote FROM posts_votes WHERE user_id = ?", (user_id,))
+        votes = np.array(cur.fetchall(), dtype=np.int64).reshape(-1, 2)
+
+    rows = np.minimum(np.searchsorted(model.post_ids, votes[:, 0]), len(model.post_ids) - 1)
+    known = model.post_ids[rows] == votes[:, 0]
+
+    if not known.any():
+        return empty
+
+    neighbors = model.neighbors[rows[known]]
+    weights = model.similarities[rows[known]] * votes[known, 1][:, np.newaxis]
+    used = neighbors >= 0
+
+    post_ids, positions = np.unique(neighbors[used], return_inverse=True)
+    scores = np.bincount(positions, weights=weights[used].astype(np.float64), minlength=len(post_ids))
+    scores[np.isin(post_ids, votes[:, 0])] = 0.0
+
+    return post_ids, scores
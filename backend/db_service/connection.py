@@ -0,0 +1,185 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul verwaltet die Verbindungen zur SQLite-Datenbank. Jeder Thread erhält eine eigene, dauerhaft geöffnete
+Verbindung, die beim Öffnen einmalig konfiguriert wird (WAL-Modus, Cache-Grössen, Timeouts). Zudem stellt es
+Kontextmanager für einzelne Abfragen und für Transaktionen über mehrere Anweisungen bereit.
+"""
+
+import os  # For retrieving the database path
+import sqlite3  # SQLite for the database
+import threading  # For thread-local connections
+
+# Path to the database file (forum.db)
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(CURRENT_DIR, "data/forum.db")
+
+# Size of the prepared statement cache of each connection (sqlite3 default: 128)
+STATEMENT_CACHE_SIZE = 512
+
+# Settings which are applied once when a connection is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",  # Readers do not block the writer and vice versa
+    "PRAGMA synchronous = NORMAL",  # Safe in WAL mode, avoids an fsync on every commit
+    "PRAGMA mmap_size = 268435456",  # Memory-map up to 256 MB of the database file
+    "PRAGMA cache_size = -16000",  # Page cache of about 16 MB per connection
+    "PRAGMA busy_timeout = 5000",  # Wait up to 5 seconds for a lock instead of failing immediately
+    "PRAGMA temp_store = MEMORY",  # Temporary tables and indexes are kept in memory
+)
+
+
+class ConnectionPool:
+    """
+    Thread-local pool of SQLite connections.
+
+    Every thread gets its own connection, which is opened on first use and then reused for all following queries of
+    that thread. The number of open connections is therefore bounded by the number of threads accessing the database.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connections_opened = 0  # Counts how many connections have been opened so far
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []  # All open connections, needed to close them again
+
+    def _open(self) -> sqlite3.Connection:
+        """
+        Opens and configures a new connection to the database.
+
+        Returns:
+            The new connection.
+        """
+
+        # isolation_level=None: Transactions are controlled explicitly (see Transaction)
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+
+        with self._lock:
+            self._connections.append(conn)
+            self.connections_opened += 1
+
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current thread. Opens it if necessary.
+
+        Returns:
+            The connection of the current thread.
+        """
+
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.depth = 0
+
+        return conn
+
+    def close_all(self):
+        """
+        Closes all connections of the pool. Threads open a new connection the next time they access the database.
+        """
+
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+        # Forget the connection of the current thread. Other threads notice the closed connection on their next
+        # access, because reset() replaces the thread-local storage.
+        self._local = threading.local()
+
+    def reset(self, db_path: str = None):
+        """
+        Closes all connections and optionally switches to another database file.
+
+        Args:
+            db_path: The path of the new database file. If None, the current file is kept.
+        """
+
+        self.close_all()
+
+        if db_path is not None:
+            self.db_path = db_path
+
+
+# The pool which is used by all database functions
+pool = ConnectionPool(DB_PATH)
+
+
+def in_transaction() -> bool:
+    """
+    Returns whether the current thread is inside a Transaction block, i.e. whether its writes are not committed yet.
+    """
+
+    return getattr(pool._local, "depth", 0) > 0
+
+
+class Database:
+    """
+    Context manager for a cursor on the pooled connection of the current thread.
+
+    Single statements are committed immediately. If the cursor is used inside a Transaction, the statements become part
+    of that transaction instead.
+    """
+
+    def __enter__(self):
+        self.conn = pool.connection()
+        self.cur = self.conn.cursor()
+        return self.cur
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cur.close()
+
+
+class Transaction(Database):
+    """
+    Context manager for a transaction over several statements.
+
+    The transaction is committed when the outermost Transaction block is left and rolled back if an exception occurred.
+    Nested Transaction blocks (e.g. a function which opens a transaction and is called inside another transaction) join
+    the outer transaction.
+    """
+
+    # IMMEDIATE acquires the write lock right away, so a read followed by a write (e.g. checking for an existing vote)
+    # cannot be interleaved with another writer.
+    begin = "BEGIN IMMEDIATE"
+
+    def __enter__(self):
+        cur = super().__enter__()
+
+        # Only the outermost block starts the transaction
+        if pool._local.depth == 0:
+            cur.execute(self.begin)
+        pool._local.depth += 1
+
+        return cur
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pool._local.depth -= 1
+
+        if pool._local.depth == 0:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+
+        super().__exit__(exc_type, exc_val, exc_tb)
+
+
+class ReadTransaction(Transaction):
+    """
+    Context manager for reading with several statements from one consistent snapshot of the database, e.g. a long scan.
+    No write lock is taken, so writers are not blocked while it reads (WAL mode). Must not be used for writes, a write
+    inside it can fail if another connection wrote in the meantime.
+    """
+
+    begin = "BEGIN DEFERRED"
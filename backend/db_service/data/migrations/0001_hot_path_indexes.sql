@@ -0,0 +1,21 @@
+-- Indexes for the foreign keys and sort columns which are used by the most frequent queries.
+
+-- get_comments_of_post
+CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments (post_id);
+
+-- get_messages_of_chat
+CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_id ON chat_messages (chat_id);
+
+-- get_votes_of_post and the vote totals of the feed. The primary key starts with user_id and cannot be used here.
+-- The index also contains the vote, so SUM(vote) is answered from the index alone.
+CREATE INDEX IF NOT EXISTS idx_posts_votes_post_id ON posts_votes (post_id, vote);
+
+-- get_posts_with_tag
+CREATE INDEX IF NOT EXISTS idx_post_tags_tag_id ON post_tags (tag_id);
+
+-- Feed sorted by SortType.NEW
+CREATE INDEX IF NOT EXISTS idx_posts_creation_date ON posts (creation_date);
+
+-- check_chat_exists and get_chats_of_user look up chats by either of the two participants
+CREATE INDEX IF NOT EXISTS idx_chats_user1 ON chats (user1, user2);
+CREATE INDEX IF NOT EXISTS idx_chats_user2 ON chats (user2, user1);
@@ -0,0 +1,14 @@
+-- Tag names must be unique. Existing duplicates are merged into the tag with the smallest id.
+
+-- Point the post associations of duplicate tags to the tag which is kept
+INSERT OR IGNORE INTO post_tags (post_id, tag_id)
+SELECT post_tags.post_id, kept.tag_id
+FROM post_tags
+JOIN tags ON post_tags.tag_id = tags.tag_id
+JOIN (SELECT tag_name, MIN(tag_id) AS tag_id FROM tags GROUP BY tag_name) AS kept ON tags.tag_name = kept.tag_name;
+
+DELETE FROM post_tags WHERE tag_id NOT IN (SELECT MIN(tag_id) FROM tags GROUP BY tag_name);
+DELETE FROM tags WHERE tag_id NOT IN (SELECT MIN(tag_id) FROM tags GROUP BY tag_name);
+
+-- SQLite cannot add a constraint to an existing table, a unique index enforces the same
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tags_tag_name ON tags (tag_name);
@@ -0,0 +1,47 @@
+-- Vote counters of a post, stored on the post itself. They are kept up to date by the triggers on posts_votes, so the
+-- feed and get_votes_of_post read them instead of aggregating all votes.
+ALTER TABLE posts ADD COLUMN score INTEGER NOT NULL DEFAULT 0;  -- upvotes - downvotes
+ALTER TABLE posts ADD COLUMN upvotes INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE posts ADD COLUMN downvotes INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill the counters from the existing votes
+UPDATE posts SET
+    score = (SELECT COALESCE(SUM(vote), 0) FROM posts_votes WHERE posts_votes.post_id = posts.post_id),
+    upvotes = (SELECT COUNT(*) FROM posts_votes WHERE posts_votes.post_id = posts.post_id AND vote > 0),
+    downvotes = (SELECT COUNT(*) FROM posts_votes WHERE posts_votes.post_id = posts.post_id AND vote < 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_insert AFTER INSERT ON posts_votes
+BEGIN
+    UPDATE posts SET
+        score = score + NEW.vote,
+        upvotes = upvotes + (NEW.vote > 0),
+        downvotes = downvotes + (NEW.vote < 0)
+    WHERE post_id = NEW.post_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_delete AFTER DELETE ON posts_votes
+BEGIN
+    UPDATE posts SET
+        score = score - OLD.vote,
+        upvotes = upvotes - (OLD.vote > 0),
+        downvotes = downvotes - (OLD.vote < 0)
+    WHERE post_id = OLD.post_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_update AFTER UPDATE OF vote, post_id ON posts_votes
+BEGIN
+    UPDATE posts SET
+        score = score - OLD.vote,
+        upvotes = upvotes - (OLD.vote > 0),
+        downvotes = downvotes - (OLD.vote < 0)
+    WHERE post_id = OLD.post_id;
+
+    UPDATE posts SET
+        score = score + NEW.vote,
+        upvotes = upvotes + (NEW.vote > 0),
+        downvotes = downvotes + (NEW.vote < 0)
+    WHERE post_id = NEW.post_id;
+END;
+
+-- Feed sorted by SortType.POPULAR (descending) and SortType.CONTROVERSIAL (ascending)
+CREATE INDEX IF NOT EXISTS idx_posts_score ON posts (score);
@@ -0,0 +1,29 @@
+-- Full-text search index over the title and content of the posts. The index does not store a copy of the texts
+-- (external content table), it reads them from posts. Porter stemming lets "posts" match "post".
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+    title,
+    content,
+    content = 'posts',
+    content_rowid = 'post_id',
+    tokenize = 'porter unicode61'
+);
+
+-- Index the existing posts
+INSERT INTO posts_fts (posts_fts) VALUES ('rebuild');
+
+-- Keep the index in sync with the posts. Updates of other columns (e.g. the vote counters) do not touch the index.
+CREATE TRIGGER IF NOT EXISTS trg_posts_fts_insert AFTER INSERT ON posts
+BEGIN
+    INSERT INTO posts_fts (rowid, title, content) VALUES (NEW.post_id, NEW.title, NEW.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_fts_delete AFTER DELETE ON posts
+BEGIN
+    INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', OLD.post_id, OLD.title, OLD.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_fts_update AFTER UPDATE OF title, content ON posts
+BEGIN
+    INSERT INTO posts_fts (posts_fts, rowid, title, content) VALUES ('delete', OLD.post_id, OLD.title, OLD.content);
+    INSERT INTO posts_fts (rowid, title, content) VALUES (NEW.post_id, NEW.title, NEW.content);
+END;
@@ -0,0 +1,60 @@
+-- Document-term index of the posts for the recommendations. The tokens of a post are counted once when the post is
+-- created or edited (see term_index.py), so a recommendation only reads the postings of the user's keywords instead of
+-- tokenizing every post again.
+CREATE TABLE IF NOT EXISTS terms (
+    term_id            INTEGER PRIMARY KEY,
+    term               TEXT    NOT NULL UNIQUE,
+    document_frequency INTEGER NOT NULL DEFAULT 0  -- Number of indexed posts containing the term
+);
+
+-- Postings: how often a term occurs in a post. Clustered by term, so the postings of a term are read in one range.
+CREATE TABLE IF NOT EXISTS post_terms (
+    term_id   INTEGER NOT NULL REFERENCES terms,
+    post_id   INTEGER NOT NULL REFERENCES posts,
+    frequency INTEGER NOT NULL,
+    PRIMARY KEY (term_id, post_id)
+) WITHOUT ROWID;
+
+-- Removing the postings of an edited or deleted post
+CREATE INDEX IF NOT EXISTS idx_post_terms_post_id ON post_terms (post_id);
+
+-- Posts which have been indexed (also those without any terms)
+CREATE TABLE IF NOT EXISTS indexed_posts (
+    post_id INTEGER PRIMARY KEY REFERENCES posts,
+    length  INTEGER NOT NULL  -- Number of tokens
+);
+
+-- Number of indexed posts, for the inverse document frequency
+CREATE TABLE IF NOT EXISTS term_index_stats (
+    id        INTEGER PRIMARY KEY CHECK (id = 1),
+    documents INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO term_index_stats (id, documents) VALUES (1, 0);
+
+-- The document frequencies and the number of documents follow the postings
+CREATE TRIGGER IF NOT EXISTS trg_post_terms_insert AFTER INSERT ON post_terms
+BEGIN
+    UPDATE terms SET document_frequency = document_frequency + 1 WHERE term_id = NEW.term_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_post_terms_delete AFTER DELETE ON post_terms
+BEGIN
+    UPDATE terms SET document_frequency = document_frequency - 1 WHERE term_id = OLD.term_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_indexed_posts_insert AFTER INSERT ON indexed_posts
+BEGIN
+    UPDATE term_index_stats SET documents = documents + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_indexed_posts_delete AFTER DELETE ON indexed_posts
+BEGIN
+    UPDATE term_index_stats SET documents = documents - 1 WHERE id = 1;
+END;
+
+-- A deleted post leaves the index
+CREATE TRIGGER IF NOT EXISTS trg_posts_term_index_delete AFTER DELETE ON posts
+BEGIN
+    DELETE FROM post_terms WHERE post_id = OLD.post_id;
+    DELETE FROM indexed_posts WHERE post_id = OLD.post_id;
+END;
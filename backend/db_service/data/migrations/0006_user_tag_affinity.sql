@@ -0,0 +1,127 @@
+-- Interest profiles for the recommendations: how often a user upvoted or downvoted posts with a tag. The profile is
+-- kept up to date by the triggers below whenever a vote or a tag of a post changes, so a recommendation reads it with
+-- one lookup instead of joining posts, post_tags, posts_votes and tags.
+
+-- Time of the vote and its weight for the time decay (see interest_profiles.py). The weight is 1.0 without decay.
+-- Existing votes count as cast now.
+ALTER TABLE posts_votes ADD COLUMN voted_at REAL;
+ALTER TABLE posts_votes ADD COLUMN weight REAL NOT NULL DEFAULT 1.0;
+UPDATE posts_votes SET voted_at = CAST(strftime('%s', 'now') AS REAL);
+
+-- Settings of the time decay. half_life is NULL without decay. The weight of a vote is
+-- 2 ^ ((voted_at - reference) / half_life), so older votes weigh less than newer ones.
+CREATE TABLE IF NOT EXISTS tag_affinity_settings (
+    id        INTEGER PRIMARY KEY CHECK (id = 1),
+    half_life REAL,  -- Seconds
+    reference REAL NOT NULL  -- Unix time
+);
+INSERT OR IGNORE INTO tag_affinity_settings (id, half_life, reference) VALUES (1, NULL, CAST(strftime('%s', 'now') AS REAL));
+
+CREATE TABLE IF NOT EXISTS user_tag_affinity (
+    user_id         INTEGER NOT NULL REFERENCES users,
+    tag_id          INTEGER NOT NULL REFERENCES tags,
+    upvotes         INTEGER NOT NULL DEFAULT 0,
+    downvotes       INTEGER NOT NULL DEFAULT 0,
+    upvote_weight   REAL    NOT NULL DEFAULT 0,  -- Sum of the weights of the upvotes
+    downvote_weight REAL    NOT NULL DEFAULT 0,  -- Sum of the weights of the downvotes
+    PRIMARY KEY (user_id, tag_id)
+) WITHOUT ROWID;
+
+-- Backfill the profiles from the existing votes
+INSERT INTO user_tag_affinity (user_id, tag_id, upvotes, downvotes, upvote_weight, downvote_weight)
+SELECT posts_votes.user_id, post_tags.tag_id,
+       SUM(posts_votes.vote > 0), SUM(posts_votes.vote < 0),
+       SUM((posts_votes.vote > 0) * posts_votes.weight), SUM((posts_votes.vote < 0) * posts_votes.weight)
+FROM posts_votes
+JOIN post_tags ON post_tags.post_id = posts_votes.post_id
+GROUP BY posts_votes.user_id, post_tags.tag_id;
+
+-- A vote counts for every tag of the post
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_affinity_insert AFTER INSERT ON posts_votes
+BEGIN
+    INSERT INTO user_tag_affinity (user_id, tag_id, upvotes, downvotes, upvote_weight, downvote_weight)
+    SELECT NEW.user_id, tag_id, NEW.vote > 0, NEW.vote < 0, (NEW.vote > 0) * NEW.weight, (NEW.vote < 0) * NEW.weight
+    FROM post_tags
+    WHERE post_id = NEW.post_id
+    ON CONFLICT (user_id, tag_id) DO UPDATE SET
+        upvotes = upvotes + excluded.upvotes,
+        downvotes = downvotes + excluded.downvotes,
+        upvote_weight = upvote_weight + excluded.upvote_weight,
+        downvote_weight = downvote_weight + excluded.downvote_weight;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_affinity_delete AFTER DELETE ON posts_votes
+BEGIN
+    UPDATE user_tag_affinity SET
+        upvotes = upvotes - (OLD.vote > 0),
+        downvotes = downvotes - (OLD.vote < 0),
+        upvote_weight = upvote_weight - (OLD.vote > 0) * OLD.weight,
+        downvote_weight = downvote_weight - (OLD.vote < 0) * OLD.weight
+    WHERE user_id = OLD.user_id AND tag_id IN (SELECT tag_id FROM post_tags WHERE post_id = OLD.post_id);
+
+    DELETE FROM user_tag_affinity WHERE user_id = OLD.user_id AND upvotes = 0 AND downvotes = 0;
+END;
+
+-- A changed vote (e.g. an upvote flipped to a downvote) is removed and added again
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_affinity_update AFTER UPDATE OF user_id, post_id, vote, weight ON posts_votes
+BEGIN
+    UPDATE user_tag_affinity SET
+        upvotes = upvotes - (OLD.vote > 0),
+        downvotes = downvotes - (OLD.vote < 0),
+        upvote_weight = upvote_weight - (OLD.vote > 0) * OLD.weight,
+        downvote_weight = downvote_weight - (OLD.vote < 0) * OLD.weight
+    WHERE user_id = OLD.user_id AND tag_id IN (SELECT tag_id FROM post_tags WHERE post_id = OLD.post_id);
+
+    INSERT INTO user_tag_affinity (user_id, tag_id, upvotes, downvotes, upvote_weight, downvote_weight)
+    SELECT NEW.user_id, tag_id, NEW.vote > 0, NEW.vote < 0, (NEW.vote > 0) * NEW.weight, (NEW.vote < 0) * NEW.weight
+    FROM post_tags
+    WHERE post_id = NEW.post_id
+    ON CONFLICT (user_id, tag_id) DO UPDATE SET
+        upvotes = upvotes + excluded.upvotes,
+        downvotes = downvotes + excluded.downvotes,
+        upvote_weight = upvote_weight + excluded.upvote_weight,
+        downvote_weight = downvote_weight + excluded.downvote_weight;
+
+    DELETE FROM user_tag_affinity WHERE user_id = OLD.user_id AND upvotes = 0 AND downvotes = 0;
+END;
+
+-- A tag added to a post counts for everyone who voted on the post
+CREATE TRIGGER IF NOT EXISTS trg_post_tags_affinity_insert AFTER INSERT ON post_tags
+BEGIN
+    INSERT INTO user_tag_affinity (user_id, tag_id, upvotes, downvotes, upvote_weight, downvote_weight)
+    SELECT user_id, NEW.tag_id, vote > 0, vote < 0, (vote > 0) * weight, (vote < 0) * weight
+    FROM posts_votes
+    WHERE post_id = NEW.post_id
+    ON CONFLICT (user_id, tag_id) DO UPDATE SET
+        upvotes = upvotes + excluded.upvotes,
+        downvotes = downvotes + excluded.downvotes,
+        upvote_weight = upvote_weight + excluded.upvote_weight,
+        downvote_weight = downvote_weight + excluded.downvote_weight;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_post_tags_affinity_delete AFTER DELETE ON post_tags
+BEGIN
+    UPDATE user_tag_affinity SET
+        upvotes = upvotes - (
+            SELECT vote > 0 FROM posts_votes
+            WHERE posts_votes.user_id = user_tag_affinity.user_id AND posts_votes.post_id = OLD.post_id
+        ),
+        downvotes = downvotes - (
+            SELECT vote < 0 FROM posts_votes
+            WHERE posts_votes.user_id = user_tag_affinity.user_id AND posts_votes.post_id = OLD.post_id
+        ),
+        upvote_weight = upvote_weight - (
+            SELECT (vote > 0) * weight FROM posts_votes
+            WHERE posts_votes.user_id = user_tag_affinity.user_id AND posts_votes.post_id = OLD.post_id
+        ),
+        downvote_weight = downvote_weight - (
+            SELECT (vote < 0) * weight FROM posts_votes
+            WHERE posts_votes.user_id = user_tag_affinity.user_id AND posts_votes.post_id = OLD.post_id
+        )
+    WHERE tag_id = OLD.tag_id AND user_id IN (SELECT user_id FROM posts_votes WHERE post_id = OLD.post_id);
+
+    DELETE FROM user_tag_affinity WHERE tag_id = OLD.tag_id AND upvotes = 0 AND downvotes = 0;
+END;
+
+-- Removing the empty profile entries of a tag
+CREATE INDEX IF NOT EXISTS idx_user_tag_affinity_tag_id ON user_tag_affinity (tag_id);
@@ -0,0 +1,4 @@
+-- Candidates of the recommendations: the newest posts with a tag, read in the order of the index and stopped after the
+-- limit. Replaces idx_post_tags_tag_id, whose entries are ordered by rowid instead of post_id.
+CREATE INDEX IF NOT EXISTS idx_post_tags_tag_id_post_id ON post_tags (tag_id, post_id);
+DROP INDEX IF EXISTS idx_post_tags_tag_id;
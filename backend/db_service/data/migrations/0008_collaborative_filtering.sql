@@ -0,0 +1,21 @@
+-- Posts whose votes changed since the collaborative filtering model was built (see collaborative_filtering.py). The
+-- background job only recalculates the neighbours of these posts and then removes them from the table.
+CREATE TABLE IF NOT EXISTS cf_dirty_posts (
+    post_id INTEGER PRIMARY KEY
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_cf_insert AFTER INSERT ON posts_votes
+BEGIN
+    INSERT OR IGNORE INTO cf_dirty_posts (post_id) VALUES (NEW.post_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_cf_delete AFTER DELETE ON posts_votes
+BEGIN
+    INSERT OR IGNORE INTO cf_dirty_posts (post_id) VALUES (OLD.post_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_votes_cf_update AFTER UPDATE OF user_id, post_id, vote ON posts_votes
+BEGIN
+    INSERT OR IGNORE INTO cf_dirty_posts (post_id) VALUES (OLD.post_id);
+    INSERT OR IGNORE INTO cf_dirty_posts (post_id) VALUES (NEW.post_id);
+END;
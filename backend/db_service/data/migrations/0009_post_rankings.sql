@@ -0,0 +1,47 @@
+-- Precomputed scores of the HOT and CONTROVERSIAL feeds (see rankings.py). The feeds read the posts in the order of the
+-- indexes below and stop after the requested page, nothing is aggregated or sorted per request. The scores need a
+-- logarithm and a power, which SQLite does not provide in every build, so they are calculated in Python by a background
+-- job. The job recalculates the posts listed in ranking_dirty_posts, which the triggers fill whenever the vote counters
+-- of a post change (see migration 0003).
+CREATE TABLE IF NOT EXISTS post_rankings (
+    post_id     INTEGER PRIMARY KEY REFERENCES posts,
+    hot         REAL NOT NULL,  -- Net votes (logarithmic) plus the creation time, newer posts rank higher
+    controversy REAL NOT NULL DEFAULT 0  -- High if a post has many votes which are balanced between up and down
+);
+
+CREATE TABLE IF NOT EXISTS ranking_dirty_posts (
+    post_id INTEGER PRIMARY KEY
+);
+
+-- Backfill with the scores of posts without votes, the posts with votes are recalculated by the first run of the job.
+-- Without votes, the hot score is only the time term: seconds since 1970 / 45000 (rankings.HOT_TIME_SCALE).
+INSERT OR IGNORE INTO post_rankings (post_id, hot, controversy)
+SELECT post_id, (COALESCE(julianday(creation_date), julianday('now')) - 2440587.5) * 86400.0 / 45000.0, 0
+FROM posts;
+
+INSERT OR IGNORE INTO ranking_dirty_posts (post_id)
+SELECT post_id FROM posts WHERE upvotes > 0 OR downvotes > 0;
+
+-- A new post has no votes yet, so its scores are known right away and it appears in the feeds immediately
+CREATE TRIGGER IF NOT EXISTS trg_posts_rankings_insert AFTER INSERT ON posts
+BEGIN
+    INSERT OR IGNORE INTO post_rankings (post_id, hot, controversy)
+    VALUES (NEW.post_id, (COALESCE(julianday(NEW.creation_date), julianday('now')) - 2440587.5) * 86400.0 / 45000.0, 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_rankings_delete AFTER DELETE ON posts
+BEGIN
+    DELETE FROM post_rankings WHERE post_id = OLD.post_id;
+    DELETE FROM ranking_dirty_posts WHERE post_id = OLD.post_id;
+END;
+
+-- Fired by the vote counter triggers of migration 0003
+CREATE TRIGGER IF NOT EXISTS trg_posts_rankings_votes AFTER UPDATE OF upvotes, downvotes ON posts
+BEGIN
+    INSERT OR IGNORE INTO ranking_dirty_posts (post_id) VALUES (NEW.post_id);
+END;
+
+-- Feeds sorted by SortType.HOT and SortType.CONTROVERSIAL. The rowid (post_id) is part of every index, so ties are
+-- ordered by the post_id without sorting.
+CREATE INDEX IF NOT EXISTS idx_post_rankings_hot ON post_rankings (hot);
+CREATE INDEX IF NOT EXISTS idx_post_rankings_controversy ON post_rankings (controversy);
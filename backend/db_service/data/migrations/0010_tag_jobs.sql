@@ -0,0 +1,13 @@
+-- Persistent queue of the tag extraction (see tag_queue.py). Creating a post only adds a job, a background worker
+-- extracts the tags of several posts at once and removes their jobs. Jobs survive a restart of the server.
+CREATE TABLE IF NOT EXISTS tag_jobs (
+    job_id      INTEGER PRIMARY KEY,
+    post_id     INTEGER NOT NULL UNIQUE REFERENCES posts,  -- At most one job per post
+    enqueued_at REAL    NOT NULL,  -- Unix time, renewed if the post is enqueued again
+    claimed_at  REAL,  -- Unix time at which a worker took the job, NULL while it waits
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    last_error  TEXT
+);
+
+-- Taking the oldest waiting jobs and releasing the jobs of a crashed worker
+CREATE INDEX IF NOT EXISTS idx_tag_jobs_claimed_at ON tag_jobs (claimed_at, job_id);
@@ -0,0 +1,28 @@
+-- Posts which are not indexed in their current version (see term_index.py). New and edited posts are added by the
+-- triggers, the background job indexes them and then removes them from the table. Tokenizing in the request would make
+-- creating and editing posts depend on the NLTK data.
+CREATE TABLE IF NOT EXISTS term_index_dirty_posts (
+    post_id INTEGER PRIMARY KEY
+);
+
+-- Posts which were never indexed, e.g. if indexing them failed
+INSERT OR IGNORE INTO term_index_dirty_posts (post_id)
+SELECT posts.post_id
+FROM posts
+LEFT JOIN indexed_posts ON indexed_posts.post_id = posts.post_id
+WHERE indexed_posts.post_id IS NULL;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_term_index_dirty_insert AFTER INSERT ON posts
+BEGIN
+    INSERT OR IGNORE INTO term_index_dirty_posts (post_id) VALUES (NEW.post_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_term_index_dirty_update AFTER UPDATE OF title, content ON posts
+BEGIN
+    INSERT OR IGNORE INTO term_index_dirty_posts (post_id) VALUES (NEW.post_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_posts_term_index_dirty_delete AFTER DELETE ON posts
+BEGIN
+    DELETE FROM term_index_dirty_posts WHERE post_id = OLD.post_id;
+END;
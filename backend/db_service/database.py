@@ -6,123 +6,189 @@ Dieses Modul stellt die Datenbank-Services für das Forum bereit. Es ermöglicht
 Löschen von Benutzern, Beiträgen, Kommentaren und Chats. Zudem können Beiträge nach Empfehlungen sortiert werden.
 """
 
-import os  # For retrieving the database path
-import sqlite3  # SQLite for the database
+import re  # For parsing search queries
+import json  # For encoding the cursors of the feed
+import base64  # For encoding the cursors of the feed
+import time  # For the time of the votes
 from typing import Optional  # For optional parameters
-from backend.db_service.models import SortType, User, Post, Comment, Chat  # Models for data transfer
+import numpy as np  # For scoring the recommendations
+from scipy.sparse import csr_matrix  # Sparse TF-IDF matrix of the recommendations
+from backend.db_service.models import SortType, User, Post, Comment, Chat, SearchResult, PostPage  # Models for data transfer
+from backend.db_service.user_cache import user_cache, LOOKUP_FIELDS  # Cache of the user records
+from backend.db_service.recommendation_cache import recommendation_cache, Snapshot  # Cache of the recommendations
+from backend.db_service.connection import (
+    Database,  # Context manager for single statements
+    Transaction,  # Context manager for transactions over several statements
+    in_transaction  # Whether the writes of the current thread are committed yet
+)
+
+from backend.db_service import term_index  # Document-term index of the posts for the recommendations
+from backend.db_service import interest_profiles  # Liked tags of the users for the recommendations
+from backend.db_service import collaborative_filtering  # Similar posts by the votes of the users
 
-import nltk
-from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import TfidfVectorizer
 
-# Download NLTK resources. This only needs to be done once.
-# These are required for the TF-IDF vectorizer to get recommended posts.
-nltk.download('punkt')
-nltk.download('stopwords')
+# Roles that a user can have
+VALID_ROLES = ["admin", "moderator", "user", "banned"]
+
+# Maximum number of candidate posts which are ranked for a recommended feed. The newest posts matching the user's
+# interests are taken.
+RECOMMENDATION_CANDIDATES = 2000
+
+# Only posts created within this number of days are recommended (None: no limit besides RECOMMENDATION_CANDIDATES)
+RECOMMENDATION_MAX_AGE_DAYS = None
 
-# Path to the database file (forum.db)
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(CURRENT_DIR, "data/forum.db")
+# Table, column and direction by which the feed is sorted for each sorting type
+FEED_ORDER = {
+    SortType.RECOMMENDED: ("posts", "score", "DESC"),  # Ranked in Python, the query returns the popular posts
+    SortType.NEW: ("posts", "creation_date", "DESC"),
+    SortType.POPULAR: ("posts", "score", "DESC"),
+    SortType.CONTROVERSIAL: ("post_rankings", "controversy", "DESC"),  # Precomputed by rankings.py
+    SortType.COLLABORATIVE: ("posts", "score", "DESC"),  # Ranked by collaborative_filtering.py
+    SortType.HOT: ("post_rankings", "hot", "DESC"),  # Precomputed by rankings.py
+}
 
+# Sorting types which are ranked in Python and paged through a snapshot of the ranking (see recommendation_cache.py)
+RANKED_SORT_TYPES = (SortType.RECOMMENDED, SortType.COLLABORATIVE)
 
-class Database:
+# Ids of the tags by name, filled with committed tags only (see remember_tag_ids). Tags are never renamed or deleted,
+# so the ids stay valid. Per process, must be cleared when switching to another database file.
+tag_id_cache = {}
+
+
+# ------------------------- Utility Functions -------------------------
+def top_k_indices(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
     """
-    Context manager for the database connection.
+    Returns the indices of the k highest positive scores in descending order. Equal scores keep the order of their
+    indices, like a stable sort. Only the scores which can be among the top k are sorted.
 
-    This class is used to open and close the database connection.
+    Args:
+        scores: The scores (1-dimensional array).
+        k: The number of indices to return. None returns all positive scores.
+
+    Returns:
+        The indices (array).
     """
-    def __enter__(self):
-        self.conn = sqlite3.connect(DB_PATH)
-        self.conn.row_factory = sqlite3.Row
-        self.cur = self.conn.cursor()
-        return self.cur
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.conn.commit()
-        self.conn.close()
+    candidates = np.flatnonzero(scores > 0.0)
 
+    if k is not None and 0 < k < len(candidates):
+        # The k-th highest score. All scores which are at least as high are candidates for the top k (including ties).
+        threshold = -np.partition(-scores[candidates], k - 1)[k - 1]
+        candidates = candidates[scores[candidates] >= threshold]
 
-# Roles that a user can have
-VALID_ROLES = ["admin", "moderator", "user", "banned"]
+    order = candidates[np.lexsort((candidates, -scores[candidates]))]
 
+    return order[:k]
 
-# ------------------------- Utility Functions -------------------------
-def sort_posts_by_recommendation(posts: list[Post], user_id: int) -> list[Post]:
+
+def sort_posts_by_recommendation(posts: list[Post], user_id: int, limit: Optional[int] = None,
+                                 profile: Optional[dict[str, float]] = None) -> list[Post]:
     """
-    Sort posts by recommendation based on the user's liked tags.
+    Sort posts by recommendation based on the user's liked tags (interest_profiles.py). The liked tags are the keywords
+    of a TF-IDF ranking, whose term frequencies are read from the document-term index (term_index.py). The scores of
+    all posts are calculated as one sparse matrix-vector product.
 
     Args:
         posts: The list of posts to filter.
         user_id: The id of the user to recommend posts to.
+        limit: The number of recommended posts needed (e.g. offset + amount of the requested page). None returns all.
+        profile: The interest profile of the user, if it has already been read.
 
     Returns:
         A list of recommended posts.
     """
 
-    sql = """
-        SELECT tags.tag_name, COUNT(*) AS frequency
-        FROM posts
-        JOIN post_tags ON posts.post_id = post_tags.post_id
-        JOIN posts_votes ON posts.post_id = posts_votes.post_id
-        JOIN tags ON post_tags.tag_id = tags.tag_id
-        WHERE posts_votes.user_id = ? AND posts_votes.vote = 1
-        GROUP BY tags.tag_name;
-    """
-
-    with Database() as cur:
-        cur.execute(sql, (user_id,))
-        results = cur.fetchall()
+    # The liked tags and their weights, from the user's interest profile
+    weights = profile if profile is not None else interest_profiles.get_interest_profile(user_id)
 
     # We need to handle the case that a user has not liked any posts yet
     # For now, we return an empty list. In the future, we could return popular posts.
-    if not results:
+    if not weights:
         return []
 
     # Filter posts which the user has already voted on
-    new_posts = [post for post in posts if get_vote_of_user(post.post_id, user_id) not in [-1, 1]]
+    voted_post_ids = get_voted_post_ids(user_id)
+    new_posts = [post for post in posts if post.post_id not in voted_post_ids]
+
+    if not new_posts:
+        return []
 
-    # Retrieve the liked keywords / tags
-    keywords = [keyword for keyword, _ in results]
+    # Read the postings of the liked keywords / tags in these posts from the document-term index instead of tokenizing
+    # the posts. Keywords which do not occur in any post cannot contribute to a score.
+    documents, term_ids, postings = term_index.get_postings(weights, [post.post_id for post in new_posts])
 
-    # Retrieve the weights (normalized frequency) of the keywords
-    weights = [frequency for _, frequency in results]
+    if not postings:
+        return []
 
-    # Retrieve post title + content as texts
-    stop_words = set(stopwords.words('english'))
-    preprocessed_texts = [
-        ' '.join([
-            word.lower()
-            for word in nltk.word_tokenize(post.title + ' - ' + post.content)
-            if word.isalnum() and word.lower() not in stop_words
-        ])
-        for post in new_posts
-    ]
+    # One column per keyword, weighted by the user's interest in it
+    keywords = [(keyword, weight) for keyword, weight in weights.items() if keyword in term_ids]
+    column_term_ids = np.array([term_ids[keyword][0] for keyword, _ in keywords])
+    document_frequencies = np.array([term_ids[keyword][1] for keyword, _ in keywords])
+    keyword_weights = np.array([weight for _, weight in keywords], dtype=float)
 
-    # Create a TF-IDF vectorizer
-    vectorizer = TfidfVectorizer(vocabulary=keywords)
+    # Smoothed inverse document frequency, as calculated by the TfidfVectorizer
+    idf = np.log((1 + documents) / (1 + document_frequencies)) + 1
 
-    # Fit the vectorizer on the preprocessed texts
-    tfidf_matrix = vectorizer.fit_transform(preprocessed_texts)
+    # Map the postings to the columns (keywords) and rows (posts) of the matrix
+    postings = np.array(postings, dtype=np.int64)
+    term_order = np.argsort(column_term_ids)
+    columns = term_order[np.searchsorted(column_term_ids, postings[:, 0], sorter=term_order)]
 
-    # Calculate scores for each text
-    posts_scores = []
-    for i, post in enumerate(new_posts):
-        # Get the TF-IDF scores for the text
-        tfidf_scores = tfidf_matrix[i].toarray()[0]
+    post_ids = np.array([post.post_id for post in new_posts], dtype=np.int64)
+    post_order = np.argsort(post_ids)
+    positions = np.searchsorted(post_ids, postings[:, 1], sorter=post_order)
+    rows = post_order[np.minimum(positions, len(post_ids) - 1)]
 
-        # Compute the weighted score for the text
-        score = sum(tfidf_scores[j]*weights[j] for j in range(len(keywords)))
+    # Postings of posts which are not candidates (e.g. already voted on) are dropped
+    is_candidate = post_ids[rows] == postings[:, 1]
+    rows, columns, frequencies = rows[is_candidate], columns[is_candidate], postings[is_candidate, 2]
 
-        # Append text and score to the result list
-        posts_scores.append((post, score))
+    tfidf_matrix = csr_matrix(
+        (frequencies * idf[columns], (rows, columns)),
+        shape=(len(new_posts), len(keywords))
+    )
 
-    # Sort the results by score
-    posts_scores.sort(key=lambda x: x[1], reverse=True)
+    # Normalize the TF-IDF vectors (L2) like the TfidfVectorizer, and weight them with the liked keywords
+    norms = np.sqrt(np.asarray(tfidf_matrix.multiply(tfidf_matrix).sum(axis=1)).ravel())
+    scores = tfidf_matrix @ keyword_weights
+    scores = np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
 
-    # Extract recommended posts without scores
-    recommended_posts = [post for post, score in posts_scores if score > 0.0]
+    # Only the posts of the requested pages are sorted
+    return [new_posts[i] for i in top_k_indices(scores, limit)]
 
-    return recommended_posts
+
+def build_search_query(search: str, prefix: bool = False) -> Optional[str]:
+    """
+    Convert a search input into an FTS5 query for the full-text index of the posts.
+
+    Text in double quotes is searched as a phrase, words ending with * as prefixes (e.g. "progr*" finds "programming").
+    All other words are searched as they are. Every word and phrase must occur in the post. Special characters of the
+    FTS5 query syntax are quoted, so any user input results in a valid query.
+
+    Args:
+        search: The search input of the user.
+        prefix: If True, every word is searched as a prefix.
+
+    Returns:
+        The FTS5 query, or None if the search input contains no words.
+    """
+
+    terms = []
+
+    # Phrases in double quotes
+    for phrase in re.findall(r'"([^"]*)"', search):
+        words = re.findall(r"\w+", phrase)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+
+    # Single words outside of phrases, optionally with a trailing * for a prefix search
+    for word, star in re.findall(r"(\w+)(\*?)", re.sub(r'"[^"]*"', " ", search)):
+        terms.append(f'"{word}"' + ("*" if star or prefix else ""))
+
+    if not terms:
+        return None
+
+    return " ".join(terms)
 
 
 # ------------------------- Existence Checks -------------------------
@@ -221,7 +287,12 @@ def create_user(username, email, password) -> Optional[int]:
 
     with Database() as cur:
         cur.execute(sql, (username, email, password))
-        return cur.lastrowid
+        user_id = cur.lastrowid
+
+    # A cached user could still be indexed under this username or email
+    user_cache.invalidate(user_id=user_id, username=username, email=email)
+
+    return user_id
 
 
 def create_post(author_id, title, content) -> Optional[int]:
@@ -239,9 +310,34 @@ def create_post(author_id, title, content) -> Optional[int]:
 
     sql = "INSERT INTO posts (author_id, title, content) VALUES (?, ?, ?)"
 
-    with Database() as cur:
+    with Transaction() as cur:
         cur.execute(sql, (author_id, title, content))
-        return cur.lastrowid
+        post_id = cur.lastrowid
+
+        # The tags are extracted in the background (see tag_queue.py). A trigger adds the post to the document-term
+        # index in the background as well (see term_index.py).
+        enqueue_tag_job(post_id)
+
+    return post_id
+
+
+def enqueue_tag_job(post_id):
+    """
+    Add a post to the queue of the tag extraction. If the post is already queued, its job starts over, so the tags are
+    extracted from the current text.
+
+    Args:
+        post_id: The id of the post.
+    """
+
+    sql = """
+        INSERT INTO tag_jobs (post_id, enqueued_at) VALUES (?, ?)
+        ON CONFLICT (post_id) DO UPDATE SET
+            enqueued_at = excluded.enqueued_at, claimed_at = NULL, attempts = 0, last_error = NULL
+    """
+
+    with Database() as cur:
+        cur.execute(sql, (post_id, time.time()))
 
 
 def create_vote_post(user_id, post_id, vote) -> Optional[int]:
@@ -260,51 +356,118 @@ def create_vote_post(user_id, post_id, vote) -> Optional[int]:
     # Check if user already voted on the post
     sql = "SELECT vote FROM posts_votes WHERE user_id = ? AND post_id = ?"
 
-    with Database() as cur:
-        cur.execute(sql, (user_id, post_id))
-        result = cur.fetchone()
+    try:
+        with Transaction() as cur:
+            cur.execute(sql, (user_id, post_id))
+            result = cur.fetchone()
 
-        if result:  # user already voted
-            if result[0] == vote:  # if user wants to vote the same as before, delete vote
-                sql = "DELETE FROM posts_votes WHERE user_id = ? AND post_id = ?"
-                cur.execute(sql, (user_id, post_id))
-                return None
-            else:  # if user wants to change vote, update vote
-                sql = "UPDATE posts_votes SET vote = ? WHERE user_id = ? AND post_id = ?"
-                cur.execute(sql, (vote, user_id, post_id))
-                return None
-
-        # otherwise create new vote
-        sql = "INSERT INTO posts_votes (user_id, post_id, vote) VALUES (?, ?, ?)"
-        cur.execute(sql, (user_id, post_id, vote))
-        return cur.lastrowid
+            # Time and weight of the vote for the interest profile (the triggers update the profile)
+            voted_at = time.time()
+            weight = interest_profiles.vote_weight(cur, voted_at)
 
+            if result:  # user already voted
+                if result[0] == vote:  # if user wants to vote the same as before, delete vote
+                    sql = "DELETE FROM posts_votes WHERE user_id = ? AND post_id = ?"
+                    cur.execute(sql, (user_id, post_id))
+                    return None
+                else:  # if user wants to change vote, update vote
+                    sql = "UPDATE posts_votes SET vote = ?, voted_at = ?, weight = ? WHERE user_id = ? AND post_id = ?"
+                    cur.execute(sql, (vote, voted_at, weight, user_id, post_id))
+                    return None
 
-def create_tag(tag_name) -> Optional[int]:
+            # otherwise create new vote
+            sql = "INSERT INTO posts_votes (user_id, post_id, vote, voted_at, weight) VALUES (?, ?, ?, ?, ?)"
+            cur.execute(sql, (user_id, post_id, vote, voted_at, weight))
+            return cur.lastrowid
+    finally:
+        # The recommendations of the user change with the vote. Invalidated after the commit, so a new calculation
+        # already sees the vote.
+        recommendation_cache.invalidate_user(user_id)
+
+
+def get_tag_ids(cur, tag_names) -> dict[str, int]:
     """
-    Create a new tag in the database.
+    Returns the ids of tags and creates the tags which do not exist yet, with one INSERT and one SELECT for all tags
+    which are not in tag_id_cache. Must be called inside a transaction.
 
     Args:
-        tag_name: The name of the tag.
+        cur: The cursor of the transaction.
+        tag_names: The names of the tags (strings).
 
     Returns:
-        The id of the created tag.
+        A dictionary mapping each tag name to its id.
     """
 
-    # Check if tag already exists
-    sql = "SELECT tag_id FROM tags WHERE tag_name = ?"
+    tag_names = set(tag_names)
+    tag_ids = {tag_name: tag_id_cache[tag_name] for tag_name in tag_names if tag_name in tag_id_cache}
+    missing = [tag_name for tag_name in tag_names if tag_name not in tag_ids]
 
-    with Database() as cur:
-        cur.execute(sql, (tag_name,))
-        result = cur.fetchone()
+    if missing:
+        missing = json.dumps(missing)
 
-        if result:  # tag already exists
-            return result[0]  # return tag_id
+        # "WHERE true" is needed by SQLite to tell the ON CONFLICT clause apart from a join
+        sql = """
+            INSERT INTO tags (tag_name) SELECT value FROM json_each(?) WHERE true
+            ON CONFLICT (tag_name) DO NOTHING
+        """
+        cur.execute(sql, (missing,))
 
-        # otherwise create new tag
-        sql = "INSERT INTO tags (tag_name) VALUES (?)"
-        cur.execute(sql, (tag_name,))
-        return cur.lastrowid
+        cur.execute("SELECT tag_id, tag_name FROM tags WHERE tag_name IN (SELECT value FROM json_each(?))", (missing,))
+        tag_ids.update({result["tag_name"]: result["tag_id"] for result in cur.fetchall()})
+
+    return tag_ids
+
+
+def remember_tag_ids(tag_ids: dict[str, int]):
+    """
+    Adds tag ids to tag_id_cache once they are committed. Inside a transaction nothing is added, because a rollback
+    would free the ids of new tags for other names.
+
+    Args:
+        tag_ids: A dictionary mapping tag names to their ids (see get_tag_ids).
+    """
+
+    if not in_transaction():
+        tag_id_cache.update(tag_ids)
+
+
+def create_tags(tag_names) -> dict[str, int]:
+    """
+    Create several tags in the database in one transaction. Tags which already exist are kept.
+
+    Args:
+        tag_names: The names of the tags.
+
+    Returns:
+        A dictionary mapping each tag name to its id.
+    """
+
+    tag_names = set(tag_names)
+
+    # Known tags need no transaction
+    if all(tag_name in tag_id_cache for tag_name in tag_names):
+        return {tag_name: tag_id_cache[tag_name] for tag_name in tag_names}
+
+    with Transaction() as cur:
+        tag_ids = get_tag_ids(cur, tag_names)
+
+    remember_tag_ids(tag_ids)
+
+    return tag_ids
+
+
+def create_tag(tag_name) -> Optional[int]:
+    """
+    Create a new tag in the database.
+
+    Args:
+        tag_name: The name of the tag.
+
+    Returns:
+        The id of the created tag (or of the existing tag with this name).
+    """
+
+    return create_tags([tag_name])[tag_name]
 
 
 def create_comment(post_id, author_id, content) -> Optional[int]:
@@ -369,27 +532,69 @@ def create_chat(user1, user2) -> Optional[int]:
 # ------------------------- Read Functions -------------------------
 # Returns the specific model from schemas.py
 
-def get_user_by_id(user_id) -> Optional[User]:
+def get_user_by_condition(condition_field, condition_value) -> Optional[User]:
     """
-    Fetch a user by their user_id from the database.
+    Generic function to fetch a complete user record (including the password hash) by a specified condition. Users
+    are looked up in the user cache first and only read from the database if they are not cached.
 
     Args:
-        user_id: The id of the user to fetch.
+        condition_field: The field to search for (user_id, username or email).
+        condition_value: The value to search for.
 
     Returns:
         The user object if the user exists, None otherwise.
     """
 
-    sql = "SELECT * FROM users WHERE user_id = ?"
+    if condition_field not in LOOKUP_FIELDS:  # The field name is part of the SQL statement
+        raise ValueError("Invalid condition field")
+
+    user = user_cache.get(condition_field, condition_value)
+
+    if user:
+        return user
+
+    generation = user_cache.generation  # Before the query, see UserCache
+    sql = f"SELECT * FROM users WHERE {condition_field} = ?"
 
     with Database() as cur:
-        cur.execute(sql, (user_id,))
+        cur.execute(sql, (condition_value,))
         result = cur.fetchone()
 
     if not result:  # user does not exist
         return None
 
-    return User(**result)
+    user = User(**result)
+    user_cache.put(user, generation)
+
+    return user
+
+
+def get_user_by_id(user_id) -> Optional[User]:
+    """
+    Fetch a user by their user_id from the database.
+
+    Args:
+        user_id: The id of the user to fetch.
+
+    Returns:
+        The user object if the user exists, None otherwise.
+    """
+
+    return get_user_by_condition("user_id", user_id)
+
+
+def get_user_by_email(email) -> Optional[User]:
+    """
+    Fetch a user by their email from the database, including the password hash (for the login).
+
+    Args:
+        email: The email of the user to fetch.
+
+    Returns:
+        The user object if the user exists, None otherwise.
+    """
+
+    return get_user_by_condition("email", email)
 
 
 def get_public_user_by_condition(condition_field, condition_value) -> Optional[User]:
@@ -404,16 +609,13 @@ def get_public_user_by_condition(condition_field, condition_value) -> Optional[U
         The user object if the user exists, None otherwise.
     """
 
-    sql = f"SELECT user_id, username, email, registration_date, role FROM users WHERE {condition_field} = ?"
+    user = get_user_by_condition(condition_field, condition_value)
 
-    with Database() as cur:
-        cur.execute(sql, (condition_value,))
-        result = cur.fetchone()
-
-    if not result:  # user does not exist
+    if not user:  # user does not exist
         return None
 
-    return User(**result)
+    user.password = None  # Not public
+    return user
 
 
 def get_public_user_by_id(user_id) -> Optional[User]:
@@ -428,6 +630,67 @@ def get_public_user_by_email(email) -> Optional[User]:
     return get_public_user_by_condition("email", email)
 
 
+def get_role_of_user(user_id) -> Optional[str]:
+    """
+    Fetch the role of a user by their user_id (from the user cache if possible).
+
+    Args:
+        user_id: The id of the user.
+
+    Returns:
+        The role of the user, None if the user does not exist.
+    """
+
+    user = get_user_by_id(user_id)
+
+    return user.role if user else None
+
+
+def get_public_users_by_ids(user_ids) -> list[User]:
+    """
+    Fetch several users by their user_ids. Cached users are taken from the user cache, the others are read from the
+    database with a single query.
+
+    Args:
+        user_ids: The ids of the users to fetch.
+
+    Returns:
+        A list of user objects of the users that exist.
+    """
+
+    user_ids = list(dict.fromkeys(user_ids))  # Remove duplicates, keep the order
+    users = {}
+
+    for user_id in user_ids:
+        user = user_cache.get("user_id", user_id)
+        if user:
+            users[user_id] = user
+
+    missing_ids = [user_id for user_id in user_ids if user_id not in users]
+
+    if missing_ids:
+        generation = user_cache.generation  # Before the query, see UserCache
+        placeholders = ", ".join("?" * len(missing_ids))
+        sql = f"SELECT * FROM users WHERE user_id IN ({placeholders})"
+
+        with Database() as cur:
+            cur.execute(sql, tuple(missing_ids))
+            results = cur.fetchall()
+
+        for result in results:
+            user = User(**result)
+            user_cache.put(user, generation)
+            users[user.user_id] = user
+
+    public_users = []
+    for user_id in user_ids:
+        if user_id in users:
+            users[user_id].password = None  # Not public
+            public_users.append(users[user_id])
+
+    return public_users
+
+
 def get_post_by_id(post_id) -> Optional[Post]:
     """
     Fetch a post by its post_id from the database.
@@ -451,64 +714,421 @@ def get_post_by_id(post_id) -> Optional[Post]:
     return Post(**result)
 
 
-def get_posts(search, amount, offset, sort_type, current_user_id) -> list[Post]:
+def encode_cursor(position: dict) -> str:
+    """
+    Encode the position in a feed as an opaque cursor token.
+
+    Args:
+        position: The position, e.g. the sort key and post_id of the last post on the page.
+
+    Returns:
+        The cursor token (URL-safe string).
+    """
+
+    data = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decode a cursor token created by encode_cursor.
+
+    Args:
+        cursor: The cursor token.
+
+    Returns:
+        The position in the feed.
+
+    Raises:
+        ValueError: If the cursor is not a valid cursor token.
+    """
+
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(data)
+    except ValueError:  # Also covers invalid base64, JSON and UTF-8
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+
+    return position
+
+
+def build_posts_query(search, sort_type, after: Optional[tuple] = None,
+                      post_ids: Optional[list[int]] = None) -> tuple[str, tuple]:
+    """
+    Build the query for the post feed without LIMIT and OFFSET.
+
+    The total votes are read from the vote counters of the posts (see migration 0003) and the hot and controversial
+    scores from the precomputed rankings (see rankings.py), so every feed is read in the order of an index and stops
+    after the requested page. Posts with the same sort key are
+    ordered by their post_id, so the order is total and a page can continue exactly after the last post of the previous
+    page (keyset pagination).
+
+    Args:
+        search: The search term to filter the posts by.
+        sort_type: The sorting type of the posts.
+        after: Optional tuple (sort key, post_id) of the last post of the previous page. Only posts after it are fetched.
+        post_ids: Optional list of post ids. Only these posts are fetched (e.g. the candidates of the recommendations).
+
+    Returns:
+        A tuple of the SQL query and its parameters.
+    """
+
+    table, column, direction = FEED_ORDER[sort_type]
+
+    if table == "posts":
+        source = "posts"
+    else:  # Read in the order of the ranking index, the posts are looked up by their id
+        source = f"{table} JOIN posts ON posts.post_id = {table}.post_id"
+
+    # The sort key is returned as well, the cursor of the next page continues after it
+    sql = f"SELECT posts.*, posts.score AS total_votes, {table}.{column} AS sort_key FROM {source}"
+
+    conditions = []
+    parameters = ()
+
+    if search:  # Search the title and content for the search term using the full-text index
+        query = build_search_query(search, prefix=True)
+
+        if query:
+            conditions.append("posts.post_id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)")
+            parameters += (query,)
+        else:  # The search term contains no words, so no post can match
+            conditions.append("0")
+
+    if post_ids is not None:  # Passed as one JSON array, so the number of ids is not limited by the SQL variables
+        conditions.append("posts.post_id IN (SELECT value FROM json_each(?))")
+        parameters += (json.dumps(post_ids),)
+
+    # SortType.RECOMMENDED uses the sorting by popular. We use this as a default and fall back to it if
+    # no posts can be recommended.
+    if after is not None:  # Continue after the last post of the previous page
+        comparison = "<" if direction == "DESC" else ">"
+        conditions.append(f"({table}.{column}, {table}.post_id) {comparison} (?, ?)")
+        parameters += tuple(after)
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    sql += f" ORDER BY {table}.{column} {direction}, {table}.post_id {direction}"
+
+    return sql, parameters
+
+
+def get_recommendation_candidates(profile: dict[str, float], limit: int,
+                                  max_age_days: Optional[float] = None) -> list[int]:
+    """
+    Get the candidates of the recommendations: the newest posts which have one of the user's liked tags, or contain it
+    in their text. For every tag, at most limit posts are read from the indexes, so the cost depends on the number of
+    liked tags and not on the number of posts.
+
+    Args:
+        profile: The interest profile of the user (tag name -> weight).
+        limit: The maximum number of candidates.
+        max_age_days: Only posts created within this number of days are candidates (None: no limit).
+
+    Returns:
+        A list of post ids, the newest first.
+    """
+
+    if not profile:
+        return []
+
+    tag_names = list(profile)
+    min_post_id = 0
+
+    with Database() as cur:
+        if max_age_days is not None:
+            # Post ids increase with the creation date, so the first post within the time frame bounds the ids
+            sql = "SELECT post_id FROM posts WHERE creation_date >= datetime('now', ?) ORDER BY creation_date LIMIT 1"
+            cur.execute(sql, (f"-{max_age_days} days",))
+            result = cur.fetchone()
+
+            if result is None:
+                return []
+
+            min_post_id = result["post_id"]
+
+        placeholders = ", ".join("?" * len(tag_names))
+        cur.execute(f"SELECT tag_id FROM tags WHERE tag_name IN ({placeholders})", tag_names)
+        tag_ids = [result["tag_id"] for result in cur.fetchall()]
+
+        post_ids = set()
+        sql = "SELECT post_id FROM post_tags WHERE tag_id = ? AND post_id >= ? ORDER BY post_id DESC LIMIT ?"
+        for tag_id in tag_ids:
+            cur.execute(sql, (tag_id, min_post_id, limit))
+            post_ids.update(result["post_id"] for result in cur.fetchall())
+
+    # Posts which contain a liked tag in their text, the only ones which the TF-IDF ranking can score
+    post_ids.update(term_index.get_recent_posts(tag_names, limit, min_post_id))
+
+    return sorted(post_ids, reverse=True)[:limit]
+
+
+def get_recommended_posts(search, user_id, limit: Optional[int] = None) -> list[Post]:
+    """
+    Get the recommended posts for a user in two stages: the candidates are selected by the user's liked tags
+    (get_recommendation_candidates), then only the candidates are loaded and ranked (sort_posts_by_recommendation).
+
+    Args:
+        search: The search term to filter the posts by.
+        user_id: The id of the user to recommend posts to.
+        limit: The number of recommended posts needed. None returns all.
+
+    Returns:
+        A list of recommended posts. Empty if nothing can be recommended.
+    """
+
+    profile = interest_profiles.get_interest_profile(user_id)
+    candidate_ids = get_recommendation_candidates(profile, RECOMMENDATION_CANDIDATES, RECOMMENDATION_MAX_AGE_DAYS)
+
+    if not candidate_ids:
+        return []
+
+    # The candidates in the order of the popular feed, which decides between posts with the same score
+    sql, parameters = build_posts_query(search, SortType.RECOMMENDED, post_ids=candidate_ids)
+
+    with Database() as cur:
+        cur.execute(sql, parameters)
+        posts = [Post(**result) for result in cur.fetchall()]
+
+    return sort_posts_by_recommendation(posts, user_id, limit, profile)
+
+
+def get_collaborative_posts(search, user_id) -> list[int]:
+    """
+    Get the posts recommended to a user by collaborative filtering: the posts most similar to the posts the user voted
+    on, judged by the votes of all users (see collaborative_filtering.py).
+
+    Args:
+        search: The search term to filter the posts by.
+        user_id: The id of the user to recommend posts to.
+
+    Returns:
+        A list of at most RECOMMENDATION_CANDIDATES post ids, the best recommendation first. Empty if nothing can be
+        recommended.
+    """
+
+    post_ids, scores = collaborative_filtering.score_posts(user_id)
+    ranked_ids = post_ids[top_k_indices(scores, RECOMMENDATION_CANDIDATES)].tolist()
+
+    if not ranked_ids:
+        return []
+
+    # The model can contain deleted posts, and the search term filters the recommendations
+    sql, parameters = build_posts_query(search, SortType.COLLABORATIVE, post_ids=ranked_ids)
+
+    with Database() as cur:
+        cur.execute(sql, parameters)
+        found_ids = {result["post_id"] for result in cur.fetchall()}
+
+    return [post_id for post_id in ranked_ids if post_id in found_ids]
+
+
+def get_newest_post_id() -> int:
+    """
+    Get the id of the newest post.
+
+    Returns:
+        The highest post id (0 if there are no posts).
+    """
+
+    with Database() as cur:
+        cur.execute("SELECT MAX(post_id) FROM posts")
+        return cur.fetchone()[0] or 0
+
+
+def get_posts_by_ids(post_ids) -> list[Post]:
+    """
+    Get several posts by their ids.
+
+    Args:
+        post_ids: The ids of the posts.
+
+    Returns:
+        A list of post objects in the order of the ids. Posts which do not exist (anymore) are skipped.
+    """
+
+    sql, parameters = build_posts_query(None, SortType.RECOMMENDED, post_ids=list(post_ids))
+
+    with Database() as cur:
+        cur.execute(sql, parameters)
+        posts = {result["post_id"]: Post(**result) for result in cur.fetchall()}
+
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def get_recommendation_snapshot(search, user_id, snapshot_id: Optional[str] = None,
+                                sort_type: SortType = SortType.RECOMMENDED) -> Snapshot:
+    """
+    Get the ranked recommendations of a user from the recommendation cache. They are calculated if the user has no
+    unexpired snapshot, and refreshed in the background if enough new posts have been created since.
+
+    Args:
+        search: The search term to filter the posts by.
+        user_id: The id of the user to recommend posts to.
+        snapshot_id: The snapshot of the cursor of the previous page, None for the first page.
+        sort_type: SortType.RECOMMENDED (liked tags) or SortType.COLLABORATIVE (votes of similar users).
+
+    Returns:
+        The snapshot with the ranked post ids (empty if nothing can be recommended).
+    """
+
+    feed = f"{int(sort_type)}:{search or ''}"
+
+    def calculate() -> tuple[list[int], int]:
+        newest_post_id = get_newest_post_id()
+
+        if sort_type == SortType.COLLABORATIVE:
+            return get_collaborative_posts(search, user_id), newest_post_id
+
+        return [post.post_id for post in get_recommended_posts(search, user_id)], newest_post_id
+
+    snapshot = recommendation_cache.get(user_id, feed, snapshot_id)
+
+    if snapshot is None:
+        generation = recommendation_cache.generation(user_id)
+        post_ids, newest_post_id = calculate()
+        return recommendation_cache.put(user_id, feed, post_ids, newest_post_id, generation)
+
+    if recommendation_cache.needs_refresh(user_id, feed, get_newest_post_id()):
+        recommendation_cache.refresh_in_background(user_id, feed, calculate)
+
+    return snapshot
+
+
+def get_posts(search, amount, offset, sort_type, current_user_id, cursor=None) -> tuple[list[Post], Optional[str]]:
     """
     Fetch posts from the database.
 
+    The first page is requested without a cursor. Every page returns a cursor for the next page, which continues
+    exactly after the last post of the page. Unlike an offset, the cost of a page does not grow with its position, and
+    posts created in the meantime do not shift the following pages. The recommended feeds are ranked once and then read
+    from a snapshot of the ranking, whose id is part of the cursor (see recommendation_cache.py).
+
     Args:
         search: The search term to filter the posts by.
         amount: The amount of posts to fetch.
-        offset: The offset for the posts to fetch.
+        offset: The offset for the posts to fetch. Ignored if a cursor is given.
         sort_type: The sorting type of the posts.
         current_user_id: The id of the current user.
+        cursor: The cursor of the previous page (next_cursor), None for the first page.
 
     Returns:
-        A list of post objects.
-    """
+        A tuple of the list of post objects and the cursor for the next page (None if there are no more posts).
 
-    sql = """
-        SELECT posts.*, COALESCE(SUM(vote), 0) AS total_votes 
-        FROM posts 
-        LEFT JOIN posts_votes 
-        ON posts.post_id = posts_votes.post_id
+    Raises:
+        ValueError: If the cursor is invalid or belongs to another sorting type.
     """
-    parameters = ()
 
-    if search:  # Search the title and content for the search term
-        sql += " WHERE LOWER(TRIM(title)) LIKE ? OR LOWER(TRIM(content)) LIKE ?"
-        parameters = (f"%{search}%", f"%{search}%")
-
-    if sort_type == SortType.NEW:
-        sql += " GROUP BY posts.post_id ORDER BY creation_date DESC"
-    elif sort_type == SortType.CONTROVERSIAL:
-        sql += " GROUP BY posts.post_id ORDER BY total_votes ASC"
-    else:  # SortType.RECOMMENDED or SortType.POPULAR
-        # This is the sorting by popular. We use this as a default and fall back to it if
-        # no posts can be recommended.
-        sql += " GROUP BY posts.post_id ORDER BY total_votes DESC"
-
-    # Limit the amount of posts and offset the results
-    if sort_type != SortType.RECOMMENDED:
+    after = None
+    snapshot_id = None
+
+    if cursor:
+        position = decode_cursor(cursor)
+
+        if position.get("sort") != int(sort_type):
+            raise ValueError("Cursor belongs to another sorting type")
+
+        try:
+            if sort_type in RANKED_SORT_TYPES:  # The recommendations are ranked in Python and paged by offset
+                offset = int(position["offset"])
+                snapshot_id = position.get("snapshot")
+            else:
+                after = (position["key"], int(position["post_id"]))
+                offset = 0
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    if sort_type in RANKED_SORT_TYPES:
+        page = None
+        next_position = {"sort": int(sort_type), "offset": offset + amount}
+
+        # If the sort type is recommended, return the recommended posts from the user's snapshot
+        if current_user_id is not None:
+            snapshot = get_recommendation_snapshot(search, current_user_id, snapshot_id, sort_type)
+
+            if snapshot.post_ids:
+                page_ids = snapshot.post_ids[offset:offset + amount]
+                page = get_posts_by_ids(page_ids)
+                next_position["snapshot"] = snapshot.snapshot_id
+
+                # Posts deleted since the snapshot was taken are skipped, the following pages still exist
+                if len(page_ids) == amount:
+                    return page, encode_cursor(next_position)
+
+                return page, None
+
+        # If no posts can be recommended, fall back to popular posts
+        if page is None:
+            sql, parameters = build_posts_query(search, SortType.POPULAR)
+
+            with Database() as cur:
+                cur.execute(sql + " LIMIT ? OFFSET ?", parameters + (amount, offset))
+                page = [Post(**result) for result in cur.fetchall()]
+    else:
+        sql, parameters = build_posts_query(search, sort_type, after)
+
+        # Limit the amount of posts and offset the results
         sql += " LIMIT ? OFFSET ?"
         parameters += (amount, offset)
 
-    with Database() as cur:
-        cur.execute(sql, parameters)
-        results = cur.fetchall()
+        with Database() as cur:
+            cur.execute(sql, parameters)
+            results = cur.fetchall()
 
-    posts = [Post(**result) for result in results]
+        page = [Post(**result) for result in results]
 
-    # If the sort type is recommended, return the recommended posts
-    if sort_type == SortType.RECOMMENDED and current_user_id is not None:
-        recommended_posts = sort_posts_by_recommendation(posts, current_user_id)
+        if page:
+            last_post = results[-1]
+            next_position = {"sort": int(sort_type), "key": last_post["sort_key"], "post_id": last_post["post_id"]}
 
-        if recommended_posts:
-            return recommended_posts[offset:offset + amount]
+    # A full page means that there might be more posts
+    next_cursor = encode_cursor(next_position) if len(page) == amount else None
 
-        # If no posts can be recommended, fall back to popular posts
-        return posts[offset:offset + amount]
+    return page, next_cursor
 
-    return posts
+
+def search_posts(search, amount, offset) -> list[SearchResult]:
+    """
+    Search posts with the full-text index, ranked by relevance (BM25).
+
+    Args:
+        search: The search input (see build_search_query for the syntax).
+        amount: The amount of results to fetch.
+        offset: The offset for the results to fetch.
+
+    Returns:
+        A list of search results: the posts with the matching terms highlighted in the title and a snippet of the
+        content. The most relevant post comes first.
+    """
+
+    query = build_search_query(search)
+
+    if not query:  # Nothing to search for
+        return []
+
+    # Matches in the title weigh ten times more than matches in the content.
+    # bm25() returns smaller values for better matches.
+    sql = """
+        SELECT posts.*,
+            highlight(posts_fts, 0, '<mark>', '</mark>') AS title_highlight,
+            snippet(posts_fts, 1, '<mark>', '</mark>', '…', 24) AS snippet,
+            bm25(posts_fts, 10.0, 1.0) AS rank
+        FROM posts_fts
+        JOIN posts ON posts.post_id = posts_fts.rowid
+        WHERE posts_fts MATCH ?
+        ORDER BY rank
+        LIMIT ? OFFSET ?
+    """
+
+    with Database() as cur:
+        cur.execute(sql, (query, amount, offset))
+        results = cur.fetchall()
+
+    return [SearchResult(**result) for result in results]
 
 
 def get_tags_of_post(post_id) -> list[str]:
@@ -555,15 +1175,18 @@ def get_votes_of_post(post_id):
         post_id: The id of the post to fetch the votes for.
 
     Returns:
-        The total votes of the post.
+        The total votes of the post (upvotes - downvotes), None if the post does not exist.
     """
 
-    sql = "SELECT SUM(vote) FROM posts_votes WHERE post_id = ?"
+    sql = "SELECT score FROM posts WHERE post_id = ?"
 
     with Database() as cur:
         cur.execute(sql, (post_id,))
         result = cur.fetchone()
 
+    if not result:  # post does not exist
+        return None
+
     return result[0]
 
 
@@ -591,6 +1214,24 @@ def get_vote_of_user(post_id, user_id):
         return 0  # user has not voted
 
 
+def get_voted_post_ids(user_id) -> set[int]:
+    """
+    Get the ids of all posts which a user has voted on.
+
+    Args:
+        user_id: The id of the user.
+
+    Returns:
+        A set of post ids.
+    """
+
+    sql = "SELECT post_id FROM posts_votes WHERE user_id = ? AND vote IN (-1, 1)"
+
+    with Database() as cur:
+        cur.execute(sql, (user_id,))
+        return {result["post_id"] for result in cur.fetchall()}
+
+
 def get_comment_by_id(comment_id) -> Optional[Comment]:
     """
     Fetch a comment by its comment_id from the database.
@@ -634,6 +1275,81 @@ def get_comments_of_post(post_id) -> list[Comment]:
     return [Comment(**result) for result in results]
 
 
+def get_post_page(post_id, user_id=None, comment_amount=50, comments_cursor=None) -> Optional[PostPage]:
+    """
+    Fetch everything needed to display a post page with a fixed number of queries on a single connection: the post,
+    its tags, the vote of the user, a page of comments and the public information of all authors on the page.
+
+    Args:
+        post_id: The id of the post to fetch.
+        user_id: The id of the current user, None if not logged in.
+        comment_amount: The amount of comments to fetch.
+        comments_cursor: The cursor of the previous page of comments (next_comments_cursor), None for the first page.
+
+    Returns:
+        The post page if the post exists, None otherwise.
+
+    Raises:
+        ValueError: If the comments cursor is invalid.
+    """
+
+    last_comment_id = 0
+
+    if comments_cursor:
+        position = decode_cursor(comments_cursor)
+
+        try:
+            last_comment_id = int(position["comment_id"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    with Database() as cur:
+        cur.execute("SELECT * FROM posts WHERE post_id = ?", (post_id,))
+        post = cur.fetchone()
+
+        if not post:  # post does not exist
+            return None
+
+        sql = "SELECT tags.tag_name FROM tags JOIN post_tags ON tags.tag_id = post_tags.tag_id WHERE post_tags.post_id = ?"
+        cur.execute(sql, (post_id,))
+        tags = [tag["tag_name"] for tag in cur.fetchall()]
+
+        vote = 0  # user has not voted or is not logged in
+        if user_id is not None:
+            cur.execute("SELECT vote FROM posts_votes WHERE post_id = ? AND user_id = ?", (post_id, user_id))
+            result = cur.fetchone()
+            vote = result[0] if result else 0
+
+        # One more comment than requested tells whether there is another page
+        sql = "SELECT * FROM comments WHERE post_id = ? AND comment_id > ? ORDER BY comment_id LIMIT ?"
+        cur.execute(sql, (post_id, last_comment_id, comment_amount + 1))
+        comments = [Comment(**result) for result in cur.fetchall()]
+
+        next_comments_cursor = None
+        if len(comments) > comment_amount:
+            comments = comments[:comment_amount]
+            next_comments_cursor = encode_cursor({"comment_id": comments[-1].comment_id})
+
+        # The authors of the post and the comments, each only once, and the current user in one query
+        author_ids = {post["author_id"]} | {comment.author_id for comment in comments}
+        user_ids = author_ids | ({user_id} if user_id is not None else set())
+
+        placeholders = ", ".join("?" * len(user_ids))
+        sql = f"SELECT user_id, username, registration_date, role FROM users WHERE user_id IN ({placeholders})"
+        cur.execute(sql, tuple(user_ids))
+        users = {result["user_id"]: User(**result) for result in cur.fetchall()}
+
+    return PostPage(
+        post=Post(**post),
+        tags=tags,
+        vote=vote,
+        comments=comments,
+        next_comments_cursor=next_comments_cursor,
+        authors={author_id: users[author_id] for author_id in author_ids if author_id in users},
+        current_user_role=users[user_id].role if user_id in users else None
+    )
+
+
 def get_chat_by_id(chat_id):
     """
     Fetch a chat by its chat_id from the database.
@@ -672,20 +1388,26 @@ def get_chat_message(msg_id):
 
 def get_messages_of_chat(chat_id):
     """
-    Fetch all messages of a chat by its chat_id from the database.
+    Fetch all messages of a chat by its chat_id from the database, including the username of the sender.
 
     Args:
         chat_id: The id of the chat to fetch the messages for.
 
     Returns:
-        A list of message objects of the chat.
+        A list of messages (dictionaries) of the chat in the order they were sent.
     """
 
-    sql = "SELECT * FROM chat_messages WHERE chat_id = ?"
+    sql = """
+        SELECT chat_messages.*, users.username AS sent_by_username
+        FROM chat_messages
+        LEFT JOIN users ON users.user_id = chat_messages.sent_by
+        WHERE chat_messages.chat_id = ?
+        ORDER BY chat_messages.msg_id
+    """
 
     with Database() as cur:
         cur.execute(sql, (chat_id,))
-        return cur.fetchall()
+        return [dict(result) for result in cur.fetchall()]
 
 
 def get_chats_of_user(user_id) -> list[Chat]:
@@ -732,7 +1454,11 @@ def update_username(user_id, new_name) -> bool:
 
     with Database() as cur:
         cur.execute(sql, (new_name, user_id))
-        return cur.rowcount > 0
+        updated = cur.rowcount > 0
+
+    user_cache.invalidate(user_id=user_id, username=new_name)
+
+    return updated
 
 
 def update_role(user_id: int, new_role: str) -> bool:
@@ -755,7 +1481,12 @@ def update_role(user_id: int, new_role: str) -> bool:
 
     with Database() as cur:
         cur.execute(sql, (new_role, user_id))
-        return cur.rowcount > 0
+        updated = cur.rowcount > 0
+
+    # Takes effect immediately, e.g. a banned user can no longer create posts
+    user_cache.invalidate(user_id=user_id)
+
+    return updated
 
 
 def update_post_title(post_id, new_title):
@@ -772,9 +1503,15 @@ def update_post_title(post_id, new_title):
 
     sql = "UPDATE posts SET title = ? WHERE post_id = ?"
 
-    with Database() as cur:
+    with Transaction() as cur:
         cur.execute(sql, (new_title, post_id))
-        return cur.rowcount > 0
+        updated = cur.rowcount > 0
+
+        # The tags are extracted again from the new text in the background (see tag_queue.py)
+        if updated:
+            enqueue_tag_job(post_id)
+
+    return updated
 
 
 def update_post_content(post_id, new_content):
@@ -791,9 +1528,15 @@ def update_post_content(post_id, new_content):
 
     sql = "UPDATE posts SET content = ? WHERE post_id = ?"
 
-    with Database() as cur:
+    with Transaction() as cur:
         cur.execute(sql, (new_content, post_id))
-        return cur.rowcount > 0
+        updated = cur.rowcount > 0
+
+        # The tags are extracted again from the new text in the background (see tag_queue.py)
+        if updated:
+            enqueue_tag_job(post_id)
+
+    return updated
 
 
 def update_tags_of_post(post_id, new_tags: list):
@@ -811,18 +1554,52 @@ def update_tags_of_post(post_id, new_tags: list):
     # Convert list to set to remove duplicates
     unique_tags = set(new_tags)
 
-    with Database() as cur:
+    with Transaction() as cur:
+        tag_ids = get_tag_ids(cur, unique_tags)
+
         # Delete old tags
         sql_delete = "DELETE FROM post_tags WHERE post_id = ?"
         cur.execute(sql_delete, (post_id,))
 
         # Add new unique tags
         sql_insert = "INSERT INTO post_tags (post_id, tag_id) VALUES (?, ?)"
-        for tag in unique_tags:
-            tag_id = create_tag(tag)
-            cur.execute(sql_insert, (post_id, tag_id))
+        cur.executemany(sql_insert, [(post_id, tag_ids[tag]) for tag in unique_tags])
+        updated = cur.rowcount > 0
 
-        return cur.rowcount > 0
+    remember_tag_ids(tag_ids)
+
+    return updated
+
+
+def update_tags_of_posts(tags_of_posts: dict[int, list]) -> int:
+    """
+    Update the tags of several posts in one transaction. Posts which were deleted in the meantime are skipped.
+
+    Args:
+        tags_of_posts: A dictionary mapping the id of each post to its new tags.
+
+    Returns:
+        The number of posts whose tags were updated.
+    """
+
+    post_ids = json.dumps(list(tags_of_posts))
+
+    with Transaction() as cur:
+        tag_ids = get_tag_ids(cur, {tag for tags in tags_of_posts.values() for tag in tags})
+
+        cur.execute("SELECT post_id FROM posts WHERE post_id IN (SELECT value FROM json_each(?))", (post_ids,))
+        existing_ids = [result["post_id"] for result in cur.fetchall()]
+
+        cur.execute("DELETE FROM post_tags WHERE post_id IN (SELECT value FROM json_each(?))", (post_ids,))
+
+        sql_insert = "INSERT INTO post_tags (post_id, tag_id) VALUES (?, ?)"
+        cur.executemany(sql_insert, [
+            (post_id, tag_ids[tag]) for post_id in existing_ids for tag in set(tags_of_posts[post_id])
+        ])
+
+    remember_tag_ids(tag_ids)
+
+    return len(existing_ids)
 
 
 def add_tag_to_post(post_id, tag_name):
@@ -837,12 +1614,16 @@ def add_tag_to_post(post_id, tag_name):
         True if the update was successful, False otherwise.
     """
 
-    tag_id = create_tag(tag_name)
     sql = "INSERT INTO post_tags (post_id, tag_id) VALUES (?, ?)"
 
-    with Database() as cur:
-        cur.execute(sql, (post_id, tag_id))
-        return cur.rowcount > 0
+    with Transaction() as cur:
+        tag_ids = get_tag_ids(cur, [tag_name])
+        cur.execute(sql, (post_id, tag_ids[tag_name]))
+        updated = cur.rowcount > 0
+
+    remember_tag_ids(tag_ids)
+
+    return updated
 
 
 def update_vote_post(user_id, post_id, vote):
@@ -858,11 +1639,18 @@ def update_vote_post(user_id, post_id, vote):
         True if the update was successful, False otherwise.
     """
 
-    sql = "UPDATE posts_votes SET vote = ? WHERE user_id = ? AND post_id = ?"
+    sql = "UPDATE posts_votes SET vote = ?, voted_at = ?, weight = ? WHERE user_id = ? AND post_id = ?"
 
-    with Database() as cur:
-        cur.execute(sql, (vote, user_id, post_id))
-        return cur.rowcount > 0
+    with Transaction() as cur:
+        voted_at = time.time()
+        weight = interest_profiles.vote_weight(cur, voted_at)
+
+        cur.execute(sql, (vote, voted_at, weight, user_id, post_id))
+        updated = cur.rowcount > 0
+
+    recommendation_cache.invalidate_user(user_id)
+
+    return updated
 
 
 def update_comment_content(comment_id, new_content):
@@ -898,7 +1686,7 @@ def delete_post_with_comments(post_id):
         True if the deletion was successful, False otherwise.
     """
 
-    with Database() as cur:
+    with Transaction() as cur:
         # Delete Post
         sql = "DELETE FROM posts WHERE post_id = ?"
         cur.execute(sql, (post_id,))
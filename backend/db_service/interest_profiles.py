@@ -0,0 +1,167 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul liest die Interessenprofile der Benutzer für die Empfehlungen. Ein Profil enthält pro Tag, wie oft der
+Benutzer Posts mit diesem Tag positiv oder negativ bewertet hat (Tabelle user_tag_affinity, siehe Migration 0006). Die
+Tabelle wird von Triggern nachgeführt, sobald eine Bewertung oder ein Tag eines Posts ändert.
+
+Optional verlieren ältere Bewertungen mit einer Halbwertszeit an Gewicht, und negative Bewertungen ziehen mit einem
+Faktor vom Gewicht eines Tags ab. Ohne Konfiguration zählt jede positive Bewertung gleich und negative Bewertungen
+werden ignoriert, wie bisher.
+"""
+
+import time  # For the age of the votes
+from typing import Optional  # For optional parameters
+
+from backend.db_service.connection import Database, Transaction  # Database access
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# The weights of the votes are renormalized at startup before 2 ^ exponent gets too large for a float
+MAX_DECAY_EXPONENT = 512
+
+# Factor by which a downvote reduces the weight of a tag (0.0: downvotes are ignored). Set by configure().
+downvote_penalty = 0.0
+
+
+def get_decay_settings(cur) -> tuple[Optional[float], float]:
+    """
+    Returns the settings of the time decay stored in the database.
+
+    Args:
+        cur: A cursor of the database.
+
+    Returns:
+        A tuple of the half-life in seconds (None without decay) and the reference time (Unix time).
+    """
+
+    cur.execute("SELECT half_life, reference FROM tag_affinity_settings WHERE id = 1")
+    result = cur.fetchone()
+
+    return result["half_life"], result["reference"]
+
+
+def decay_weight(voted_at: float, half_life: Optional[float], reference: float) -> float:
+    """
+    Returns the weight of a vote. Each half-life after the reference time doubles the weight, so a vote which is one
+    half-life older than another one weighs half as much.
+
+    Args:
+        voted_at: The time of the vote (Unix time).
+        half_life: The half-life in seconds, None without decay.
+        reference: The reference time (Unix time).
+
+    Returns:
+        The weight of the vote (1.0 without decay).
+    """
+
+    if half_life is None:
+        return 1.0
+
+    return 2.0 ** ((voted_at - reference) / half_life)
+
+
+def vote_weight(cur, voted_at: float) -> float:
+    """
+    Returns the weight of a new vote. Must be called in the transaction which writes the vote.
+
+    Args:
+        cur: The cursor of the transaction.
+        voted_at: The time of the vote (Unix time).
+
+    Returns:
+        The weight of the vote.
+    """
+
+    half_life, reference = get_decay_settings(cur)
+
+    return decay_weight(voted_at, half_life, reference)
+
+
+def reweight_votes(cur, half_life: Optional[float]):
+    """
+    Recalculates the weights of all votes for a new half-life, starting from the current time. The triggers update the
+    profiles accordingly. Must be called inside a transaction.
+
+    Args:
+        cur: The cursor of the transaction.
+        half_life: The new half-life in seconds, None without decay.
+    """
+
+    now = time.time()
+    cur.execute("UPDATE tag_affinity_settings SET half_life = ?, reference = ? WHERE id = 1", (half_life, now))
+
+    cur.execute("SELECT user_id, post_id, voted_at FROM posts_votes")
+    weights = [
+        (decay_weight(result["voted_at"] or now, half_life, now), result["user_id"], result["post_id"])
+        for result in cur.fetchall()
+    ]
+
+    cur.executemany("UPDATE posts_votes SET weight = ? WHERE user_id = ? AND post_id = ?", weights)
+
+
+def configure(half_life_days: Optional[float] = None, penalty: float = 0.0):
+    """
+    Sets the time decay and the downvote penalty of the profiles. The weights of all votes are recalculated if the
+    half-life changed or the reference time of the decay is too old.
+
+    Args:
+        half_life_days: The half-life of a vote in days. None disables the time decay.
+        penalty: Factor by which a downvote reduces the weight of a tag (0.0: downvotes are ignored).
+    """
+
+    global downvote_penalty
+    downvote_penalty = penalty
+
+    half_life = half_life_days * SECONDS_PER_DAY if half_life_days else None
+
+    with Transaction() as cur:
+        stored_half_life, reference = get_decay_settings(cur)
+
+        expired = half_life is not None and (time.time() - reference) / half_life > MAX_DECAY_EXPONENT
+        if stored_half_life != half_life or expired:
+            reweight_votes(cur, half_life)
+
+
+def get_interest_profile(user_id: int) -> dict[str, float]:
+    """
+    Returns the weight of each tag which a user is interested in.
+
+    Args:
+        user_id: The id of the user.
+
+    Returns:
+        A dictionary mapping tag names to positive weights, ordered by tag name. Without decay and penalty, the weight
+        is the number of upvoted posts with the tag.
+    """
+
+    sql = """
+        SELECT tags.tag_name, user_tag_affinity.upvotes, user_tag_affinity.downvotes,
+               user_tag_affinity.upvote_weight, user_tag_affinity.downvote_weight
+        FROM user_tag_affinity
+        JOIN tags ON tags.tag_id = user_tag_affinity.tag_id
+        WHERE user_tag_affinity.user_id = ?
+        ORDER BY tags.tag_name
+    """
+
+    with Database() as cur:
+        half_life, reference = get_decay_settings(cur)
+        cur.execute(sql, (user_id,))
+        results = cur.fetchall()
+
+    profile = {}
+
+    for result in results:
+        if half_life is None:
+            weight = result["upvotes"] - downvote_penalty * result["downvotes"]
+        else:
+            # The weights are relative to the reference time, the decay up to now applies to all of them
+            upvote_weight = result["upvote_weight"] if result["upvotes"] else 0.0
+            downvote_weight = result["downvote_weight"] if result["downvotes"] else 0.0
+            weight = (upvote_weight - downvote_penalty * downvote_weight) * decay_weight(reference, half_life, time.time())
+
+        if weight > 0:
+            profile[result["tag_name"]] = weight
+
+    return profile
@@ -0,0 +1,127 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul führt die Schema-Migrationen der Datenbank aus. Die Migrationen liegen als nummerierte SQL-Skripte im
+Ordner data/migrations und werden beim Start des Servers der Reihe nach angewendet. Welche Migrationen bereits
+angewendet wurden, wird in der Tabelle schema_version festgehalten.
+"""
+
+import os  # For file path operations
+import re  # For parsing the file names of the migrations
+import sqlite3  # SQLite for the database
+from typing import Optional  # For optional parameters
+
+from backend.db_service.connection import pool  # Connection pool of the database
+
+# Folder containing the migration scripts, e.g. 0001_hot_path_indexes.sql
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(CURRENT_DIR, "data/migrations")
+
+# File names of migrations: four digit version, underscore, name
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version    INTEGER PRIMARY KEY,
+        name       TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def get_migrations() -> list[tuple[int, str, str]]:
+    """
+    Returns all migration scripts ordered by their version.
+
+    Returns:
+        A list of tuples (version, name, path).
+    """
+
+    migrations = []
+
+    for file_name in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+
+        if not match:  # Not a migration script
+            continue
+
+        version, name = int(match.group(1)), match.group(2)
+        migrations.append((version, name, os.path.join(MIGRATIONS_DIR, file_name)))
+
+    migrations.sort()
+
+    # Two scripts with the same version would be applied in an arbitrary order
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration versions in " + MIGRATIONS_DIR)
+
+    return migrations
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Returns the version of the newest migration applied to the database.
+
+    Args:
+        conn: The connection to the database.
+
+    Returns:
+        The schema version (0 if no migration has been applied yet).
+    """
+
+    conn.execute(SCHEMA_VERSION_TABLE)
+    result = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+
+    return result[0] or 0
+
+
+def apply_migrations(conn: Optional[sqlite3.Connection] = None) -> list[int]:
+    """
+    Applies all migrations which have not been applied to the database yet.
+
+    Every migration runs in its own transaction together with its entry in schema_version. If several server processes
+    start at the same time, only one of them applies a migration; the others fail to insert the version and skip it.
+
+    Args:
+        conn: The connection to migrate. Defaults to the pooled connection of the current thread.
+
+    Returns:
+        The versions of the migrations which were applied.
+    """
+
+    if conn is None:
+        conn = pool.connection()
+
+    current_version = get_schema_version(conn)
+    applied = []
+
+    for version, name, path in get_migrations():
+        if version <= current_version:  # Already applied
+            continue
+
+        with open(path, encoding="utf-8") as f:
+            migration_sql = f.read()
+
+        # executescript() does not accept parameters, but version and name are restricted by MIGRATION_FILE_PATTERN
+        script = (
+            "BEGIN IMMEDIATE;\n"
+            f"INSERT INTO schema_version (version, name) VALUES ({version}, '{name}');\n"
+            f"{migration_sql}\n"
+            "COMMIT;"
+        )
+
+        try:
+            conn.executescript(script)
+        except sqlite3.Error:
+            conn.rollback()
+
+            # Another process applied this migration in the meantime
+            if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+                continue
+
+            raise
+
+        applied.append(version)
+
+    return applied
@@ -26,6 +26,8 @@ class SortType(IntEnum):
     NEW = 1
     POPULAR = 2
     CONTROVERSIAL = 3
+    COLLABORATIVE = 4
+    HOT = 5
 
 
 class User(BaseModel):
@@ -141,6 +143,18 @@ class Post(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     creation_date: Optional[str] = None
+    score: Optional[int] = None  # Upvotes - downvotes
+    upvotes: Optional[int] = None
+    downvotes: Optional[int] = None
+
+
+class SearchResult(Post):
+    """
+    Contains a post found by the full-text search, with the matching terms highlighted.
+    """
+    title_highlight: Optional[str] = None  # Title with the matching terms in <mark> tags
+    snippet: Optional[str] = None  # Part of the content around the matching terms
+    rank: Optional[float] = None  # BM25 relevance, smaller is more relevant
 
 
 class Comment(BaseModel):
@@ -154,6 +168,20 @@ class Comment(BaseModel):
     creation_date: Optional[str] = None
 
 
+class PostPage(BaseModel):
+    """
+    Contains everything needed to display a post page: the post, its tags, the vote of the current user, a page of
+    comments and the public information of all authors on the page.
+    """
+    post: Post
+    tags: list[str] = []
+    vote: int = 0  # Vote of the current user (1, -1 or 0 if not voted or not logged in)
+    comments: list[Comment] = []
+    next_comments_cursor: Optional[str] = None  # Cursor for the next page of comments, None if there are no more
+    authors: dict[int, User] = {}  # Authors of the post and the comments by their user_id
+    current_user_role: Optional[str] = None  # Role of the current user, None if not logged in
+
+
 class ChatMessage(BaseModel):
     """
     Contains the title and content of a post.
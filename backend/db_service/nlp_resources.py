@@ -0,0 +1,147 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul verwaltet die Ressourcen der Sprachverarbeitung (NLTK-Daten, spaCy-Modell, YAKE). Sie werden nie zur
+Laufzeit heruntergeladen: Die NLTK-Daten liegen in einem lokalen Ordner (NLTK_DATA_DIR) und das spaCy-Modell ist als
+Paket installiert (requirements.txt). So startet der Server auch ohne Netzwerk. Die Bibliotheken und Modelle werden erst
+beim ersten Gebrauch geladen oder beim Start im Hintergrund vorgewärmt (warmup). Der Endpunkt /health/ready meldet erst
+danach Bereitschaft, ein fehlgeschlagenes Vorwärmen wird periodisch wiederholt (run_warmup_job). Gebraucht werden sie
+nur von den Hintergrundjobs (tag_queue.py, term_index.py) und von retag.py, Anfragen laden sie nie. Fehlen die
+NLTK-Daten, funktioniert der Server weiter, nur neue und bearbeitete Posts kommen erst in den Index der Empfehlungen,
+wenn die Daten ergänzt sind.
+
+Die NLTK-Daten werden einmalig (z.B. beim Deployment) mit Netzwerk in den lokalen Ordner geladen:
+python -m backend.db_service.nlp_resources
+"""
+
+import os  # For the path of the local NLTK data
+import sys  # For the exit code
+import time  # For the duration of the warmup
+import logging  # For errors of the warmup
+import threading  # For loading the resources only once
+
+# Local bundle of the NLTK data. NLTK also searches its default folders (e.g. ~/nltk_data).
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+NLTK_DATA_DIR = os.path.join(CURRENT_DIR, "data", "nltk_data")
+
+# NLTK resources which are needed (name for nltk.download -> path for nltk.data.find)
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "stopwords": "corpora/stopwords",
+}
+
+# Text which is processed once by the warmup, so every model is loaded and used before the first background job
+WARMUP_TEXT = "Warmup of the forum: Students in Basel discuss Python and databases."
+
+# Seconds between two attempts of the warmup after it failed
+WARMUP_RETRY_INTERVAL = 30
+
+logger = logging.getLogger(__name__)
+
+# Reentrant: the first loads of NLTK resources (see term_index.py) call use_local_nltk_data while holding it
+_nltk_lock = threading.RLock()
+_nltk_ready = False
+
+# State of the warmup: "pending", "warming", "ready" or "failed"
+readiness = {"status": "pending", "error": None, "seconds": None}
+
+
+def use_local_nltk_data():
+    """
+    Points NLTK to the local bundle and checks that all resources exist. Must be called before NLTK data is used.
+    Nothing is downloaded.
+
+    Raises:
+        LookupError: If a resource is missing, with the command which adds it to the bundle.
+    """
+
+    global _nltk_ready
+
+    with _nltk_lock:
+        if _nltk_ready:
+            return
+
+        import nltk  # Imported on first use, importing NLTK takes about a second
+
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+        for name, path in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                raise LookupError(f"NLTK resource '{name}' is missing, add it to {NLTK_DATA_DIR} with: "
+                                  f"python -m backend.db_service.nlp_resources") from None
+
+        _nltk_ready = True
+
+
+def warmup() -> bool:
+    """
+    Loads all resources of the language processing and processes WARMUP_TEXT once, so the first jobs of the background
+    workers do not wait for them. Updates readiness.
+
+    Returns:
+        True if the warmup finished successfully.
+    """
+
+    # Imported here, they import this module
+    from backend.db_service import term_index  # Tokenizer of the recommendations (NLTK)
+    from backend.db_service import tag_management  # Tag extraction (YAKE, spaCy)
+
+    readiness.update(status="warming", error=None)
+    start = time.perf_counter()
+
+    try:
+        term_index.tokenize(WARMUP_TEXT)
+        tag_management.extract_tags([("Warmup", WARMUP_TEXT)], fast_path=False)
+        tag_management.tag_matcher.refresh(force=True)  # Builds the automaton of the known tags
+    except Exception as error:
+        logger.exception("Warming up the language processing failed")
+        readiness.update(status="failed", error=repr(error), seconds=time.perf_counter() - start)
+        return False
+
+    readiness.update(status="ready", error=None, seconds=time.perf_counter() - start)
+    return True
+
+
+def run_warmup_job(stop: threading.Event, interval: float = WARMUP_RETRY_INTERVAL):
+    """
+    Runs the warmup and repeats it every interval seconds until it succeeds or stop is set, so a failure (e.g. NLTK
+    data which is added later) does not keep /health/ready at 503. Meant to run in a background thread at startup.
+
+    Args:
+        stop: Event which ends the job.
+        interval: Seconds between two attempts.
+    """
+
+    while not stop.is_set() and not warmup():
+        stop.wait(interval)
+
+
+def is_ready() -> bool:
+    """
+    Returns whether the warmup finished successfully.
+    """
+
+    return readiness["status"] == "ready"
+
+
+def download_nltk_data() -> bool:
+    """
+    Downloads the NLTK resources into the local bundle. Needs network access, the server itself never downloads.
+
+    Returns:
+        True if all resources were downloaded.
+    """
+
+    import nltk  # For downloading the resources
+
+    os.makedirs(NLTK_DATA_DIR, exist_ok=True)
+
+    return all(nltk.download(name, download_dir=NLTK_DATA_DIR) for name in NLTK_RESOURCES)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if download_nltk_data() else 1)
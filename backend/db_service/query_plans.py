@@ -0,0 +1,238 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul prüft die Abfragepläne aller SQL-Abfragen der Module in CHECKED_MODULES. Jede Abfrage wird mit EXPLAIN
+QUERY PLAN auf einer migrierten Kopie der Datenbank ausgewertet. Die Prüfung schlägt fehl, sobald eine Abfrage eine
+Tabelle vollständig durchsucht (Full Table Scan), obwohl sie nicht als bewusster Scan freigegeben ist. Die Feeds müssen
+zudem in der Reihenfolge eines Index gelesen werden, ohne die Posts zu sortieren.
+
+Abfragen in f-Strings werden mit den Werten aus FSTRING_VALUES für ihre Felder geprüft (z.B. einer Liste von
+Platzhaltern). Hat ein Feld keinen Wert, schlägt die Prüfung fehl, statt die Abfrage zu überspringen.
+
+Ausführen: python -m backend.db_service.query_plans
+"""
+
+import ast  # For extracting the SQL strings from the source code of the checked modules
+import itertools  # For rendering f-strings with every combination of field values
+import sqlite3  # SQLite for the database
+import sys  # For the exit code
+
+from backend.db_service import database as db  # The module whose queries are checked
+from backend.db_service import term_index  # The queries of the document-term index are checked as well
+from backend.db_service import interest_profiles  # The queries of the interest profiles are checked as well
+from backend.db_service import collaborative_filtering  # The queries of the collaborative filtering are checked as well
+from backend.db_service import rankings  # The queries of the ranking job are checked as well
+from backend.db_service import tag_queue  # The queries of the tag queue are checked as well
+from backend.db_service import retag  # The queries of the re-tagging command are checked as well
+from backend.db_service.connection import DB_PATH  # Path to the database file (forum.db)
+from backend.db_service.migrations import apply_migrations  # For bringing the copy of the database up to date
+from backend.db_service.models import SortType  # Sorting types of the feed
+from backend.db_service.user_cache import LOOKUP_FIELDS  # Columns by which get_user_by_condition searches
+
+# Modules whose SQL statements are checked
+CHECKED_MODULES = (db, term_index, interest_profiles, collaborative_filtering, rankings, tag_queue, retag)
+
+# Statements which are checked. Fragments like " WHERE ..." which are appended to a query are skipped.
+SQL_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# Representative values of the fields of f-string queries, by the source of the field. The query is checked with each
+# value (each combination if there are several fields).
+FSTRING_VALUES = {
+    "placeholders": ["?, ?"],  # A list of parameters for IN (...)
+    "condition_field": list(LOOKUP_FIELDS),  # Checked against LOOKUP_FIELDS by get_user_by_condition
+}
+
+# Queries which read a whole table on purpose, mapped from the function name to the reason.
+ALLOWED_SCANS = {
+    "reweight_votes": "Recalculates the weights of all votes when the time decay changes",
+    "load_votes": "The collaborative filtering model is built from all votes",
+    "update_model": "Reads the posts whose votes changed since the last update, a small table",
+    "update_rankings": "Takes the next batch of posts whose votes changed, the scan stops after the batch",
+    "update_index": "Takes the next batch of posts to index, the scan stops after the batch",
+    "get_queue_stats": "Counts the jobs of the tag queue, which only holds the posts waiting for their tags",
+}
+
+
+def is_statement(text: str) -> bool:
+    """
+    Returns whether a string is an SQL statement. Compares the first word, so names like "updated_at" are not taken for
+    statements.
+    """
+
+    words = text.split(maxsplit=1)
+
+    return bool(words) and words[0].upper() in SQL_KEYWORDS
+
+
+def render_fstring(function_name: str, node: ast.JoinedStr) -> list[str]:
+    """
+    Renders an f-string query with the values of FSTRING_VALUES for its fields.
+
+    Args:
+        function_name: The function which contains the f-string (for the error message).
+        node: The f-string.
+
+    Returns:
+        The query for each combination of the field values.
+
+    Raises:
+        ValueError: If a field has no values in FSTRING_VALUES.
+    """
+
+    parts = []
+
+    for value in node.values:
+        if isinstance(value, ast.Constant):
+            parts.append([value.value])
+            continue
+
+        field = ast.unparse(value.value)
+        if field not in FSTRING_VALUES:
+            raise ValueError(f"{function_name}: the field {{{field}}} of an f-string query has no values in "
+                             f"FSTRING_VALUES, so its query plan cannot be checked")
+        parts.append(FSTRING_VALUES[field])
+
+    return ["".join(combination).strip() for combination in itertools.product(*parts)]
+
+
+def collect_module_queries(tree: ast.Module) -> list[tuple[str, str]]:
+    """
+    Collects the SQL statements from the functions of a module. F-strings are rendered with FSTRING_VALUES.
+
+    Args:
+        tree: The syntax tree of the module.
+
+    Returns:
+        A list of tuples (function name, SQL statement).
+
+    Raises:
+        ValueError: If a field of an f-string query has no values in FSTRING_VALUES.
+    """
+
+    queries = []
+
+    for function in tree.body:
+        # The feed query is composed at runtime and added by collect_queries
+        if not isinstance(function, ast.FunctionDef) or function.name == "build_posts_query":
+            continue
+
+        # Skip the docstring. The parts of f-strings are checked with the rendered f-string.
+        skipped = {id(function.body[0].value)} if ast.get_docstring(function) else set()
+        for node in ast.walk(function):
+            if isinstance(node, ast.JoinedStr):
+                skipped.update(id(value) for value in node.values)
+
+                # Fragments which start with a field (e.g. "{table} JOIN ...") are not statements
+                first = node.values[0] if node.values else None
+                if isinstance(first, ast.Constant) and is_statement(first.value):
+                    queries.extend((function.name, sql) for sql in render_fstring(function.name, node))
+
+        for node in ast.walk(function):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and id(node) not in skipped:
+                sql = node.value.strip()
+
+                if is_statement(sql):
+                    queries.append((function.name, sql))
+
+    return queries
+
+
+def collect_queries() -> list[tuple[str, str]]:
+    """
+    Collects all SQL statements from the source code of the checked modules and the composed feed queries.
+
+    Returns:
+        A list of tuples (function name, SQL statement).
+    """
+
+    queries = []
+
+    for module in CHECKED_MODULES:
+        with open(module.__file__, encoding="utf-8") as f:
+            queries.extend(collect_module_queries(ast.parse(f.read())))
+
+    # The feed query is composed at runtime: the first page and the following pages (continuing after a cursor)
+    for sort_type in (SortType.NEW, SortType.POPULAR, SortType.CONTROVERSIAL, SortType.HOT):
+        for after in (None, (None, None)):
+            sql, _ = db.build_posts_query(None, sort_type, after)
+            queries.append((f"get_posts ({sort_type.name.lower()})", sql + " LIMIT ? OFFSET ?"))
+
+    # The candidates of the recommendations
+    sql, _ = db.build_posts_query(None, SortType.RECOMMENDED, post_ids=[])
+    queries.append(("get_recommended_posts", sql))
+
+    return queries
+
+
+def find_full_scans(conn: sqlite3.Connection, sql: str, ordered: bool = False) -> list[str]:
+    """
+    Returns the steps of the query plan which read a whole table.
+
+    Args:
+        conn: The connection to the database.
+        sql: The SQL statement.
+        ordered: Whether the rows must be read in the order of an index. Sorting them in a temporary B-tree reads every
+                 row before the first one is returned, so it counts as a full scan.
+
+    Returns:
+        A list of plan steps, e.g. ["SCAN comments"]. Empty if every table is accessed through an index.
+    """
+
+    parameters = (None,) * sql.count("?")
+    plan = conn.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+
+    # Each row is (id, parent, notused, detail). "SCAN posts USING INDEX ..." reads the index in order and is fine,
+    # just like "SCAN posts_fts VIRTUAL TABLE INDEX ..." which is a lookup in the full-text index.
+    return [
+        row[3] for row in plan
+        if row[3].startswith("SCAN ") and not any(part in row[3] for part in ("USING", "CONSTANT ROW", "VIRTUAL TABLE"))
+        or ordered and row[3].startswith("USE TEMP B-TREE FOR")
+    ]
+
+
+def check_query_plans(db_path: str = DB_PATH) -> list[tuple[str, str, list[str]]]:
+    """
+    Checks the query plans of all queries of the checked modules on a migrated in-memory copy of the database.
+
+    Args:
+        db_path: The database to copy. Defaults to forum.db.
+
+    Returns:
+        A list of tuples (function name, SQL statement, full scans) for the queries which are not allowed to scan.
+    """
+
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    with sqlite3.connect(db_path) as source:
+        source.backup(conn)
+
+    apply_migrations(conn)
+
+    failures = []
+    for function_name, sql in collect_queries():
+        scans = find_full_scans(conn, sql, ordered=function_name.startswith("get_posts ("))
+
+        if scans and function_name not in ALLOWED_SCANS:
+            failures.append((function_name, sql, scans))
+
+    conn.close()
+    return failures
+
+
+def main() -> int:
+    failures = check_query_plans()
+
+    for function_name, sql, scans in failures:
+        print(f"{function_name}: {', '.join(scans)}")
+        print("    " + " ".join(sql.split()))
+
+    if failures:
+        print(f"{len(failures)} queries read a whole table.")
+        return 1
+
+    print("All queries use an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul berechnet die Ranglisten der Feeds SortType.HOT und SortType.CONTROVERSIAL vor (Tabelle post_rankings,
+siehe Migration 0009). Ein Hintergrundjob berechnet periodisch die Posts neu, deren Bewertungen sich geändert haben. Die
+Feeds lesen die Posts dann in der Reihenfolge eines Index, ohne pro Anfrage Bewertungen zusammenzuzählen oder zu
+sortieren. Eine neue Bewertung wirkt sich deshalb erst nach dem nächsten Lauf des Jobs auf die Rangliste aus.
+
+HOT: Die Nettobewertung zählt logarithmisch, die Erstellungszeit linear. Die ersten 10 Stimmen zählen so viel wie die
+nächsten 90, und ein Post, der HOT_TIME_SCALE Sekunden später erstellt wurde, braucht zehnmal weniger Stimmen für den
+gleichen Rang. Ältere Posts fallen so mit der Zeit zurück, ohne dass ihre Werte neu berechnet werden müssen.
+
+CONTROVERSIAL: Posts mit vielen Stimmen, die sich zwischen positiv und negativ die Waage halten. Ein Post ohne positive
+oder ohne negative Stimmen ist nicht kontrovers.
+"""
+
+import json  # For passing the post ids as one parameter
+import math  # For the scores
+import logging  # For errors of the background job
+import threading  # For the background job
+
+from backend.db_service.connection import Transaction  # Database access
+
+# Seconds after which a new post needs ten times fewer votes for the same hot score (12.5 hours). Also used by the
+# triggers of migration 0009.
+HOT_TIME_SCALE = 45000
+
+# Seconds between two runs of the background job. Changed votes affect the rankings after at most this time.
+RANKING_INTERVAL = 10
+
+# Number of posts which are recalculated per transaction
+RANKING_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def hot_score(upvotes: int, downvotes: int, created_at: float) -> float:
+    """
+    Returns the hot score of a post.
+
+    Args:
+        upvotes: The number of upvotes.
+        downvotes: The number of downvotes.
+        created_at: The creation time of the post (Unix time).
+
+    Returns:
+        The hot score. Higher is hotter.
+    """
+
+    score = upvotes - downvotes
+    sign = (score > 0) - (score < 0)
+
+    return sign * math.log10(max(abs(score), 1)) + created_at / HOT_TIME_SCALE
+
+
+def controversy_score(upvotes: int, downvotes: int) -> float:
+    """
+    Returns the controversy score of a post: the number of votes to the power of the balance between upvotes and
+    downvotes (1.0 if both are equal).
+
+    Args:
+        upvotes: The number of upvotes.
+        downvotes: The number of downvotes.
+
+    Returns:
+        The controversy score, 0.0 if the post has no upvotes or no downvotes.
+    """
+
+    if upvotes <= 0 or downvotes <= 0:
+        return 0.0
+
+    balance = min(upvotes, downvotes) / max(upvotes, downvotes)
+
+    return float(upvotes + downvotes) ** balance
+
+
+def update_rankings(batch_size: int = RANKING_BATCH_SIZE) -> int:
+    """
+    Recalculates the scores of the posts whose votes changed since the last run.
+
+    Args:
+        batch_size: The number of posts recalculated per transaction.
+
+    Returns:
+        The number of recalculated posts.
+    """
+
+    sql = """
+        SELECT post_id, upvotes, downvotes, (julianday(creation_date) - 2440587.5) * 86400.0 AS created_at
+        FROM posts
+        WHERE post_id IN (SELECT value FROM json_each(?))
+    """
+
+    updated = 0
+
+    while True:
+        with Transaction() as cur:
+            cur.execute("SELECT post_id FROM ranking_dirty_posts LIMIT ?", (batch_size,))
+            post_ids = json.dumps([result["post_id"] for result in cur.fetchall()])
+
+            cur.execute(sql, (post_ids,))
+            scores = [
+                (hot_score(result["upvotes"], result["downvotes"], result["created_at"] or 0.0),
+                 controversy_score(result["upvotes"], result["downvotes"]), result["post_id"])
+                for result in cur.fetchall()
+            ]
+
+            cur.executemany("UPDATE post_rankings SET hot = ?, controversy = ? WHERE post_id = ?", scores)
+            cur.execute("DELETE FROM ranking_dirty_posts WHERE post_id IN (SELECT value FROM json_each(?))",
+                        (post_ids,))
+            count = cur.rowcount
+
+        updated += len(scores)
+
+        if count < batch_size:
+            return updated
+
+
+def run_ranking_job(stop: threading.Event, interval: float = RANKING_INTERVAL):
+    """
+    Updates the rankings every interval seconds until stop is set. Meant to run in a background thread.
+
+    Args:
+        stop: Event which ends the job.
+        interval: Seconds between two updates.
+    """
+
+    while not stop.is_set():
+        try:
+            update_rankings()
+        except Exception:
+            logger.exception("Updating the post rankings failed")
+
+        stop.wait(interval)
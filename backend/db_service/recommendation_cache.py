@@ -0,0 +1,295 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul enthält einen Cache für die Empfehlungen der Benutzer. Die erste Seite des empfohlenen Feeds berechnet die
+ganze Rangliste und speichert die IDs der Posts als Snapshot mit einer ID. Die folgenden Seiten werden aus dem Snapshot
+gelesen, dessen ID im Cursor steht. So kostet jede weitere Seite nur noch das Laden ihrer Posts, und die Reihenfolge
+verschiebt sich beim Weiterblättern nicht.
+
+Ein Snapshot läuft nach RECOMMENDATION_SNAPSHOT_TTL Sekunden ab. Bewertet der Benutzer einen Post, werden seine
+Snapshots sofort verworfen. Sind seit der Berechnung genügend neue Posts erschienen, wird der Snapshot im Hintergrund
+neu berechnet, in einem einzigen Hintergrund-Thread, der seine Datenbankverbindung wiederverwendet. Bis dahin und für
+bereits begonnene Cursor bleibt der bisherige Snapshot gültig. Der Cache gilt pro Prozess.
+"""
+
+import time  # For the expiry of the snapshots
+import uuid  # For the ids of the snapshots
+import threading  # For protecting the cache
+from collections import OrderedDict  # For the least recently used order
+from concurrent.futures import ThreadPoolExecutor  # For the background refresh
+from dataclasses import dataclass  # For the snapshots
+from typing import Callable, Optional  # For type hints
+
+# Seconds after which a snapshot is calculated again
+RECOMMENDATION_SNAPSHOT_TTL = 300
+
+# Number of new posts after which a snapshot is refreshed in the background
+RECOMMENDATION_REFRESH_NEW_POSTS = 20
+
+# Maximum number of feeds (per user, sorting type and search) whose snapshots are kept
+RECOMMENDATION_CACHE_SIZE = 1024
+
+# Number of threads which refresh snapshots in the background. Each thread keeps its own pooled connection, so the
+# refreshes reuse them instead of opening a connection per refresh.
+RECOMMENDATION_REFRESH_WORKERS = 1
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    The ranked recommendations of a user at one point in time.
+    """
+
+    snapshot_id: str
+    post_ids: tuple[int, ...]  # Ranked, the best recommendation first
+    created_at: float  # Unix time
+    newest_post_id: int  # Newest post when the snapshot was calculated
+
+
+class RecommendationCache:
+    """
+    Thread-safe LRU cache of recommendation snapshots per user and feed.
+
+    For every user and feed, the current snapshot and the one it replaced in a background refresh are kept, so cursors
+    of the previous snapshot remain valid. A calculation which started before an invalidation of the user is not stored
+    (see UserCache for the generation check, here it is counted per user).
+
+    The generations come from one increasing counter. A user's generation is forgotten when the user's last snapshot
+    is evicted, or when more than max_size users are tracked. Users without a generation get the highest forgotten
+    one, so a calculation which started before the user's generation was forgotten is not stored either.
+    """
+
+    def __init__(self, max_size: int = RECOMMENDATION_CACHE_SIZE, ttl: float = RECOMMENDATION_SNAPSHOT_TTL,
+                 refresh_new_posts: int = RECOMMENDATION_REFRESH_NEW_POSTS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.refresh_new_posts = refresh_new_posts
+        self._epoch = 0  # Increased by clear()
+        self._last_generation = 0  # Generation of the latest invalidation
+        self._forgotten_generation = 0  # Generation of the users without an entry in _user_generations
+        self._user_generations = OrderedDict()  # user_id -> generation of the user's latest invalidation
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+        self._snapshots = OrderedDict()  # (user_id, feed) -> list of snapshots, the current one first
+        self._refreshing = set()  # Keys which are being refreshed in the background
+        self._refresh_executor = ThreadPoolExecutor(max_workers=RECOMMENDATION_REFRESH_WORKERS,
+                                                    thread_name_prefix="recommendation-refresh")
+        self._lock = threading.Lock()
+
+    def generation(self, user_id: int) -> tuple[int, int]:
+        """
+        Returns the generation of a user's recommendations, which must be passed to put().
+        """
+
+        with self._lock:
+            return self._epoch, self._user_generations.get(user_id, self._forgotten_generation)
+
+    def _forget_user(self, user_id: int):
+        """
+        Forgets the generation of a user. Must be called while holding the lock.
+        """
+
+        generation = self._user_generations.pop(user_id, None)
+
+        if generation is not None:
+            self._forgotten_generation = max(self._forgotten_generation, generation)
+
+    def _evicted(self, user_id: int):
+        """
+        Forgets the generation of a user whose snapshots were evicted, unless the user still has snapshots or one is
+        being refreshed. Must be called while holding the lock.
+        """
+
+        if user_id not in self._user_generations:
+            return
+
+        if any(key[0] == user_id for key in self._snapshots) or any(key[0] == user_id for key in self._refreshing):
+            return
+
+        self._forget_user(user_id)
+
+    def get(self, user_id: int, feed: str, snapshot_id: Optional[str] = None) -> Optional[Snapshot]:
+        """
+        Returns an unexpired snapshot of a user's recommendations.
+
+        Args:
+            user_id: The id of the user.
+            feed: The feed, i.e. the sorting type and the search term (see database.get_recommendation_snapshot).
+            snapshot_id: The snapshot of a cursor. If it is no longer available, the current snapshot is returned.
+
+        Returns:
+            The snapshot, None if there is none (it must then be calculated and added with put()).
+        """
+
+        key = (user_id, feed)
+        now = time.time()
+
+        with self._lock:
+            snapshots = [
+                snapshot for snapshot in self._snapshots.get(key, [])
+                if now - snapshot.created_at < self.ttl
+            ]
+
+            if not snapshots:
+                if self._snapshots.pop(key, None) is not None:
+                    self._evicted(user_id)
+                self.misses += 1
+                return None
+
+            self._snapshots[key] = snapshots
+            self._snapshots.move_to_end(key)
+            self.hits += 1
+
+            for snapshot in snapshots:
+                if snapshot.snapshot_id == snapshot_id:
+                    return snapshot
+
+            return snapshots[0]
+
+    def put(self, user_id: int, feed: str, post_ids: list[int], newest_post_id: int,
+            generation: tuple[int, int]) -> Snapshot:
+        """
+        Stores a new snapshot as the current one of a user and feed.
+
+        Args:
+            user_id: The id of the user.
+            feed: The feed, i.e. the sorting type and the search term (see database.get_recommendation_snapshot).
+            post_ids: The ranked post ids.
+            newest_post_id: The newest post when the calculation started.
+            generation: The generation of the user before the calculation started. If the user's recommendations were
+                        invalidated since, the snapshot is returned but not stored.
+
+        Returns:
+            The new snapshot.
+        """
+
+        snapshot = Snapshot(uuid.uuid4().hex[:16], tuple(post_ids), time.time(), newest_post_id)
+        key = (user_id, feed)
+
+        with self._lock:
+            if generation != (self._epoch, self._user_generations.get(user_id, self._forgotten_generation)):
+                return snapshot
+
+            # The replaced snapshot stays available for cursors which already point to it
+            self._snapshots[key] = [snapshot] + self._snapshots.get(key, [])[:1]
+            self._snapshots.move_to_end(key)
+
+            while len(self._snapshots) > self.max_size:
+                (evicted_user_id, _), _ = self._snapshots.popitem(last=False)
+                self._evicted(evicted_user_id)
+
+        return snapshot
+
+    def needs_refresh(self, user_id: int, feed: str, newest_post_id: int) -> bool:
+        """
+        Returns whether enough new posts have been created since the current snapshot of a user and feed was
+        calculated.
+
+        Args:
+            user_id: The id of the user.
+            feed: The feed, i.e. the sorting type and the search term (see database.get_recommendation_snapshot).
+            newest_post_id: The newest post now.
+
+        Returns:
+            True if the snapshot should be refreshed.
+        """
+
+        with self._lock:
+            snapshots = self._snapshots.get((user_id, feed))
+
+            return bool(snapshots) and newest_post_id - snapshots[0].newest_post_id >= self.refresh_new_posts
+
+    def refresh_in_background(self, user_id: int, feed: str, calculate: Callable[[], tuple[list[int], int]]):
+        """
+        Calculates a new snapshot in the background, unless a refresh of this user and feed is already running. The
+        refreshes run one after the other in the refresh thread, which reuses its database connection.
+
+        Args:
+            user_id: The id of the user.
+            feed: The feed, i.e. the sorting type and the search term (see database.get_recommendation_snapshot).
+            calculate: Function returning the ranked post ids and the newest post id.
+        """
+
+        key = (user_id, feed)
+
+        with self._lock:
+            if key in self._refreshing:
+                return
+
+            self._refreshing.add(key)
+            self.refreshes += 1
+            generation = (self._epoch, self._user_generations.get(user_id, self._forgotten_generation))
+
+        def refresh():
+            try:
+                post_ids, newest_post_id = calculate()
+                self.put(user_id, feed, post_ids, newest_post_id, generation)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_executor.submit(refresh)
+
+    def invalidate_user(self, user_id: int):
+        """
+        Removes all snapshots of a user, e.g. after the user voted.
+
+        Args:
+            user_id: The id of the user.
+        """
+
+        with self._lock:
+            self._last_generation += 1
+            self._user_generations[user_id] = self._last_generation
+            self._user_generations.move_to_end(user_id)
+            self.invalidations += 1
+
+            while len(self._user_generations) > self.max_size:
+                self._forget_user(next(iter(self._user_generations)))
+
+            for key in [key for key in self._snapshots if key[0] == user_id]:
+                del self._snapshots[key]
+
+    def clear(self):
+        """
+        Removes all snapshots, e.g. after the database was replaced.
+        """
+
+        with self._lock:
+            self._epoch += 1
+            self._snapshots.clear()
+
+            # Calculations of the previous epoch are not stored anyway
+            self._user_generations.clear()
+            self._forgotten_generation = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        Returns:
+            A dictionary with the size, hits, misses, hit rate, background refreshes, invalidations and the number of
+            users whose generation is tracked.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self._snapshots),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "invalidations": self.invalidations,
+                "tracked_users": len(self._user_generations),
+            }
+
+
+# The cache used by database.py
+recommendation_cache = RecommendationCache()
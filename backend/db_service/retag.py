@@ -0,0 +1,284 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul extrahiert die Tags bestehender Posts neu, z.B. für ältere Posts ohne Tags oder nach einer Änderung der
+Tag-Extraktion. Die Posts werden in Blöcken nach post_id aus der Datenbank gelesen und auf mehrere Prozesse verteilt,
+die sie mit spaCy im Batch (nlp.pipe) verarbeiten. Die Tags eines Blocks werden in einer Transaktion geschrieben. Nach
+jedem geschriebenen Block wird die letzte post_id in einer Checkpoint-Datei festgehalten, ein abgebrochener Lauf macht
+dort weiter. Neue und bearbeitete Posts verarbeitet die Tag-Warteschlange (tag_queue.py), nicht dieser Befehl.
+
+Ausführen aus dem Hauptverzeichnis:
+python -m backend.db_service.retag [--missing] [--min-id 1] [--max-id 1000] [--workers 4] [--restart]
+"""
+
+import os  # For the checkpoint file and the number of CPU cores
+import sys  # For the exit code
+import json  # For the checkpoint file
+import time  # For the throughput
+import argparse  # For the command line arguments
+import multiprocessing  # For distributing the posts to several processes
+from collections import deque  # For the blocks which are being processed
+
+from backend.db_service import database as db  # For writing the tags
+from backend.db_service import tag_management as tm  # The tag extraction
+from backend.db_service.connection import pool, Database  # Database access
+from backend.db_service.migrations import apply_migrations  # Brings the database schema up to date
+
+# Number of posts per block. A block is processed by one process and written in one transaction.
+RETAG_CHUNK_SIZE = 500
+
+# Name of the checkpoint file, next to the database
+CHECKPOINT_FILE = "retag_checkpoint.json"
+
+# Highest possible post_id, the default upper limit
+MAX_POST_ID = 2 ** 63 - 1
+
+
+def get_checkpoint_path() -> str:
+    """
+    Returns the path of the checkpoint file, next to the current database file.
+    """
+
+    return os.path.join(os.path.dirname(os.path.abspath(pool.db_path)), CHECKPOINT_FILE)
+
+
+def load_checkpoint(path: str, filters: dict) -> dict:
+    """
+    Reads the checkpoint of an interrupted run.
+
+    Args:
+        path: The path of the checkpoint file.
+        filters: The filters of the current run.
+
+    Returns:
+        The checkpoint (dictionary with last_post_id, processed and seconds), a new one if there is no checkpoint file.
+
+    Raises:
+        ValueError: If the checkpoint belongs to a run with other filters.
+    """
+
+    if not os.path.exists(path):
+        return {"filters": filters, "last_post_id": filters["min_id"] - 1, "processed": 0, "seconds": 0.0}
+
+    with open(path, encoding="utf-8") as file:
+        checkpoint = json.load(file)
+
+    if checkpoint["filters"] != filters:
+        raise ValueError(f"The checkpoint {path} belongs to a run with the filters {checkpoint['filters']}. "
+                         f"Use the same filters or start over with --restart.")
+
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """
+    Writes the checkpoint. The file is replaced atomically, so an interruption leaves either the old or the new one.
+    """
+
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file)
+    os.replace(path + ".tmp", path)
+
+
+def count_posts(after_id: int, max_id: int, missing: bool) -> int:
+    """
+    Counts the posts which a run still has to process.
+
+    Args:
+        after_id: Only posts with a higher id are counted.
+        max_id: Only posts with this id or a lower one are counted.
+        missing: Whether only posts without tags are counted.
+
+    Returns:
+        The number of posts.
+    """
+
+    sql = """
+        SELECT COUNT(*) FROM posts
+        WHERE post_id > ? AND post_id <= ?
+          AND (? = 0 OR NOT EXISTS (SELECT 1 FROM post_tags WHERE post_tags.post_id = posts.post_id))
+    """
+
+    with Database() as cur:
+        cur.execute(sql, (after_id, max_id, int(missing)))
+        return cur.fetchone()[0]
+
+
+def read_chunk(after_id: int, max_id: int, missing: bool, limit: int) -> list[tuple[int, str, str]]:
+    """
+    Reads the next block of posts, in the order of their ids.
+
+    Args:
+        after_id: Only posts with a higher id are read.
+        max_id: Only posts with this id or a lower one are read.
+        missing: Whether only posts without tags are read.
+        limit: The maximum number of posts.
+
+    Returns:
+        A list of tuples (post_id, title, content).
+    """
+
+    sql = """
+        SELECT post_id, title, content FROM posts
+        WHERE post_id > ? AND post_id <= ?
+          AND (? = 0 OR NOT EXISTS (SELECT 1 FROM post_tags WHERE post_tags.post_id = posts.post_id))
+        ORDER BY post_id
+        LIMIT ?
+    """
+
+    with Database() as cur:
+        cur.execute(sql, (after_id, max_id, int(missing), limit))
+        return [(result["post_id"], result["title"], result["content"]) for result in cur.fetchall()]
+
+
+def extract_chunk(chunk: list[tuple[int, str, str]], batch_size: int, fast_path: bool) -> dict[int, list[str]]:
+    """
+    Extracts the tags of a block of posts. Runs in a worker process.
+
+    Returns:
+        A dictionary mapping the id of each post to its tags.
+    """
+
+    tags = tm.extract_tags([(title, content) for _, title, content in chunk], batch_size, fast_path)
+
+    return {post_id: post_tags for (post_id, _, _), post_tags in zip(chunk, tags)}
+
+
+def init_worker(db_path: str):
+    """
+    Prepares a worker process: uses the same database (for the fast path) and loads spaCy before the first block.
+    """
+
+    pool.reset(db_path)
+    tm.get_nlp()
+
+
+def retag(missing: bool = False, min_id: int = 1, max_id: int = MAX_POST_ID, workers: int = None,
+          chunk_size: int = RETAG_CHUNK_SIZE, batch_size: int = tm.NLP_BATCH_SIZE, fast_path: bool = False,
+          restart: bool = False, checkpoint_path: str = None) -> int:
+    """
+    Extracts the tags of posts again and replaces their tags. Continues an interrupted run with the same filters from
+    its checkpoint. Prints the progress after every block.
+
+    Args:
+        missing: Whether only posts without tags are processed.
+        min_id: The lowest post_id which is processed.
+        max_id: The highest post_id which is processed.
+        workers: The number of worker processes. Defaults to the number of CPU cores, 1 processes in this process.
+        chunk_size: The number of posts per block.
+        batch_size: The number of texts which spaCy processes at once.
+        fast_path: Whether to take the known tags if enough are found (see tag_management.extract_tags). By default
+            the NLP extracts the tags of every post.
+        restart: Whether to ignore the checkpoint and start from the beginning.
+        checkpoint_path: The path of the checkpoint file. Defaults to CHECKPOINT_FILE next to the database.
+
+    Returns:
+        The number of processed posts (including those of the interrupted runs).
+
+    Raises:
+        ValueError: If the checkpoint belongs to a run with other filters.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    checkpoint_path = checkpoint_path or get_checkpoint_path()
+    filters = {"missing": missing, "min_id": min_id, "max_id": max_id}
+
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    checkpoint = load_checkpoint(checkpoint_path, filters)
+    next_id = checkpoint["last_post_id"]
+    total = checkpoint["processed"] + count_posts(next_id, max_id, missing)
+    start = time.perf_counter() - checkpoint["seconds"]
+    started_with = checkpoint["processed"]
+    run_start = time.perf_counter()
+
+    print(f"Re-tagging {total - checkpoint['processed']} posts with {workers} process(es)"
+          + (f", continuing after post {next_id}" if checkpoint["processed"] else ""))
+
+    executor = None
+    if workers > 1:
+        # Spawn: the workers must not inherit the SQLite connections of this process
+        context = multiprocessing.get_context("spawn")
+        executor = context.Pool(workers, initializer=init_worker, initargs=(pool.db_path,))
+
+    try:
+        pending = deque()  # (last post_id of the block, result) in the order of the blocks
+
+        while True:
+            # Keep every worker busy with up to two blocks. Blocks are read only when needed, so the memory is
+            # bounded regardless of the number of posts.
+            while len(pending) < 2 * workers:
+                chunk = read_chunk(next_id, max_id, missing, chunk_size)
+                if not chunk:
+                    break
+                next_id = chunk[-1][0]
+
+                if executor is None:
+                    pending.append((next_id, extract_chunk(chunk, batch_size, fast_path)))
+                else:
+                    pending.append((next_id, executor.apply_async(extract_chunk, (chunk, batch_size, fast_path))))
+
+            if not pending:
+                break
+
+            last_id, result = pending.popleft()
+            tags_of_posts = result if executor is None else result.get()
+
+            # Edited posts may have been changed while the block was processed, their queued jobs extract the tags
+            # again afterwards
+            db.update_tags_of_posts(tags_of_posts)
+
+            checkpoint.update(
+                last_post_id=last_id,
+                processed=checkpoint["processed"] + len(tags_of_posts),
+                seconds=time.perf_counter() - start,
+            )
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            rate = (checkpoint["processed"] - started_with) / (time.perf_counter() - run_start)
+            remaining = (total - checkpoint["processed"]) / rate if rate else 0.0
+            print(f"{checkpoint['processed']}/{total} posts ({checkpoint['processed'] / max(total, 1):.0%}), "
+                  f"{rate:.1f} posts/s, about {remaining:.0f} s left, last post {last_id}", flush=True)
+    finally:
+        if executor is not None:
+            executor.terminate()
+            executor.join()
+
+    # The run is complete, the next one starts from the beginning
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    print(f"Re-tagged {checkpoint['processed']} posts in {time.perf_counter() - start:.1f} s")
+
+    return checkpoint["processed"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--missing", action="store_true", help="Only posts without tags")
+    parser.add_argument("--min-id", type=int, default=1, help="Lowest post_id which is re-tagged")
+    parser.add_argument("--max-id", type=int, default=MAX_POST_ID, help="Highest post_id which is re-tagged")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (default: CPU cores)")
+    parser.add_argument("--chunk-size", type=int, default=RETAG_CHUNK_SIZE, help="Posts per block and transaction")
+    parser.add_argument("--batch-size", type=int, default=tm.NLP_BATCH_SIZE, help="Texts per spaCy batch")
+    parser.add_argument("--fast-path", action="store_true", help="Take the known tags if enough are found")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning")
+    parser.add_argument("--checkpoint", default=None, help="Path of the checkpoint file")
+    args = parser.parse_args()
+
+    apply_migrations()
+
+    try:
+        retag(args.missing, args.min_id, args.max_id, args.workers, args.chunk_size, args.batch_size, args.fast_path,
+              args.restart, args.checkpoint)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
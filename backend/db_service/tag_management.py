@@ -4,34 +4,92 @@ Luca Flühler, Lucien Ruffet, Sandro Kuster
 
 Dieses Modul enthält Funktionen zur Verwaltung von Tags. Tags sind Schlüsselwörter, die einem Post zugeordnet werden
 können, um diesen zu kategorisieren. Tags können aus dem Titel und dem Inhalt eines Posts extrahiert werden.
+spaCy verarbeitet jeden Text nur einmal, mit einer gekürzten Pipeline. Die Tags bereits verarbeiteter Texte werden nach
+einem Hash von Titel und Inhalt zwischengespeichert.
 """
 
-from backend.db_service.database import create_tag  # Function to create a tag in the database
-import yake  # YAKE keyword extractor
-import spacy  # SpaCy Natural Language Processing library
+import time  # For the timings of the tiers
+import hashlib  # For the keys of the tag cache
+import threading  # For loading the models only once
+from collections import OrderedDict  # For the tag cache (least recently used)
 
-# Load spaCy model
-# Download first: python -m spacy download en_core_web_sm
-nlp = spacy.load("en_core_web_sm")
+from backend.db_service.database import create_tags  # Function to create tags in the database
+from backend.db_service.tag_matcher import TagMatcher, TaggerStats  # Fast tier: matches the known tags
 
-# YAKE keyword extractor
-# Keywords must not be longer than 2 words and the top 10 keywords are extracted
-yake_extractor = yake.KeywordExtractor(lan='en', n=2, top=10)
+# SpaCy model, installed as a package (see requirements.txt), so loading it needs no network
+# Install manually: python -m spacy download en_core_web_sm
+SPACY_MODEL = "en_core_web_sm"
 
+# Components of the model which the tag extraction does not use (dependency parser, sentence splitter). They are not
+# loaded at all. The entities need "ner", the lemmas "tagger", "attribute_ruler" and "lemmatizer".
+SPACY_EXCLUDED_COMPONENTS = ["parser", "senter"]
 
-def extract_entities(text):
+# Number of texts which spaCy processes at once in extract_tags
+NLP_BATCH_SIZE = 32
+
+# Number of texts whose tags are kept by extract_tags (key: content_hash)
+TAG_CACHE_SIZE = 10000
+
+# The known tags found by the fast tier are used if there are at least this many, otherwise the NLP extracts the tags.
+# At most FAST_PATH_MAX_TAGS of them are taken (the most frequent in the text).
+FAST_PATH_MIN_TAGS = 3
+FAST_PATH_MAX_TAGS = 10
+
+# SpaCy and YAKE take a few seconds to import and load. They are loaded on first use or by nlp_resources.warmup.
+_nlp = None
+_yake_extractor = None
+_load_lock = threading.Lock()
+
+_tag_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Automaton of the known tags and the counters of both tiers (see tag_matcher.py)
+tag_matcher = TagMatcher()
+tagger_stats = TaggerStats()
+
+
+def get_nlp():
+    """
+    Returns the spaCy pipeline. It is loaded on the first call.
+    """
+
+    global _nlp
+
+    with _load_lock:
+        if _nlp is None:
+            import spacy  # SpaCy Natural Language Processing library
+            _nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED_COMPONENTS)
+
+        return _nlp
+
+
+def get_yake_extractor():
+    """
+    Returns the YAKE keyword extractor. It is created on the first call.
     """
-    Extracts named entities from a given text using SpaCy.
+
+    global _yake_extractor
+
+    with _load_lock:
+        if _yake_extractor is None:
+            import yake  # YAKE keyword extractor
+
+            # Keywords must not be longer than 2 words and the top 10 keywords are extracted
+            _yake_extractor = yake.KeywordExtractor(lan='en', n=2, top=10)
+
+        return _yake_extractor
+
+
+def extract_entities(doc):
+    """
+    Extracts named entities from a text which was processed by SpaCy.
     Args:
-        text: The text to extract named entities from (string).
+        doc: The processed text (SpaCy Doc).
 
     Returns:
         A list of named entities (strings).
     """
 
-    # Process the text with SpaCy
-    doc = nlp(text)
-
     # Extract named entities without numbers
     entities = [entity.lemma_ for entity in doc.ents]
 
@@ -42,50 +100,60 @@ def closest_noun(word):
     return word  # TODO: Implement this function
 
 
-def lemmatize_words(word_list):
+def lemmatize_words(word_list, doc):
     """
-    Lemmatizes a list of words using SpaCy.
+    Lemmatizes a list of words which occur in a text, using the lemmas SpaCy found in the processed text. The words do
+    not have to be parsed again, and their lemmas depend on the context in the text.
 
     Args:
         word_list: A list of words (strings).
+        doc: The processed text the words come from (SpaCy Doc).
 
     Returns:
         A list of lemmatized words (strings).
     """
 
-    # Join the list of words into a single string
-    text = ' '.join(word_list)
-
-    # Process the text with SpaCy
-    doc = nlp(text)
+    # Lemma of each word of the text (the first occurrence counts)
+    lemmas_of_text = {}
+    for token in doc:
+        lemmas_of_text.setdefault(token.lower_, token.lemma_)
 
-    # Extract lemmas of verbs
-    lemmas = [token.lemma_ for token in doc]
+    # Split the words like SpaCy (e.g. "Python's" -> "Python", "'s"), only the tokenizer runs here
+    tokenizer = get_nlp().tokenizer
+    lemmas = [
+        lemmas_of_text.get(token.lower_, token.text)
+        for word_doc in tokenizer.pipe(word_list)
+        for token in word_doc
+    ]
 
     return lemmas
 
 
-def extract_keywords(text):
+def extract_keywords(text, doc=None):
     """
     Extracts keywords from a given text using the YAKE algorithm.
     Args:
         text: The text to extract keywords from (string).
+        doc: The text processed by SpaCy (SpaCy Doc). Processed here if it is not given.
 
     Returns:
         A list of keywords (strings).
     """
 
+    if doc is None:
+        doc = get_nlp()(text)
+
     # Extract keywords using YAKE algorithm
-    keywords = yake_extractor.extract_keywords(text)
+    keywords = get_yake_extractor().extract_keywords(text)
 
     # Nounify keywords (political -> politics, etc.)
     nounified_keywords = [closest_noun(keyword) for keyword, _ in keywords if closest_noun(keyword) is not None]
 
     # Lemmatize keywords (apples -> apple, etc.)
-    lemmatized_keywords = lemmatize_words(nounified_keywords)
+    lemmatized_keywords = lemmatize_words(nounified_keywords, doc)
 
     # Extract named entities from the text
-    final_keywords = extract_entities(text) + lemmatized_keywords
+    final_keywords = extract_entities(doc) + lemmatized_keywords
 
     return list(set(final_keywords))
 
@@ -106,12 +174,94 @@ def filter_keywords(keywords):
     # Filter out keywords with less than two letters
     filtered_keywords = [keyword for keyword in keywords if len([c for c in keyword if c.isalpha()]) >= 2]
 
-    # Filter out stopwords
-    filtered_keywords = [keyword for keyword in filtered_keywords if not nlp.vocab[keyword].is_stop]
+    # Filter out stopwords. Same as nlp.vocab[keyword].is_stop, but without adding every keyword to the vocabulary.
+    stop_words = get_nlp().Defaults.stop_words
+    filtered_keywords = [keyword for keyword in filtered_keywords if keyword.lower() not in stop_words]
 
     return filtered_keywords
 
 
+def content_hash(post_title, post_content):
+    """
+    Returns the key of a post in the tag cache: a hash of its title and content.
+    """
+
+    return hashlib.sha256(f"{post_title}\0{post_content}".encode()).hexdigest()
+
+
+def clear_tag_cache():
+    """
+    Empties the tag cache, e.g. to measure the extraction itself.
+    """
+
+    with _cache_lock:
+        _tag_cache.clear()
+
+
+def extract_tags(posts, batch_size=NLP_BATCH_SIZE, fast_path=True):
+    """
+    Extracts the tags of several posts, like assign_tags_to_post but without creating the tags. First the known tags
+    are searched in each text (tag_matcher). Only if fewer than FAST_PATH_MIN_TAGS are found, the text goes to the NLP:
+    SpaCy processes each text once (in batches with nlp.pipe), the entities and the lemmas of the keywords come from
+    the same pass. The tags of the latest TAG_CACHE_SIZE texts are kept, so saving a post with an unchanged title and
+    content costs nothing.
+
+    Args:
+        posts: A list of tuples (title, content) (strings).
+        batch_size: The number of texts which spaCy processes at once.
+        fast_path: Whether to try the known tags first. If False, the NLP extracts the tags of every post.
+
+    Returns:
+        A list with the tags (list of strings) of each post, in the order of the posts.
+    """
+
+    keys = [content_hash(post_title, post_content) for post_title, post_content in posts]
+
+    with _cache_lock:
+        tags_of_key = {key: _tag_cache[key] for key in keys if key in _tag_cache}
+        for key in tags_of_key:
+            _tag_cache.move_to_end(key)
+
+    # Texts which are not in the cache, each only once
+    missing = {key: post for key, post in zip(keys, posts) if key not in tags_of_key}
+    texts = {key: post_title + ": " + post_content for key, (post_title, post_content) in missing.items()}
+
+    if fast_path and texts:
+        tag_matcher.refresh()
+        timings = []
+
+        for key, text in texts.items():
+            start = time.perf_counter()
+            tags = tag_matcher.match(text)
+            timings.append(time.perf_counter() - start)
+
+            if len(tags) >= FAST_PATH_MIN_TAGS:
+                tags_of_key[key] = tags[:FAST_PATH_MAX_TAGS]
+
+        tagger_stats.record("fast", timings, sum(key in tags_of_key for key in texts))
+
+    # The NLP tier for the texts which had too few known tags
+    nlp_texts = {key: text for key, text in texts.items() if key not in tags_of_key}
+
+    if nlp_texts:
+        start = time.perf_counter()
+
+        docs = get_nlp().pipe(nlp_texts.values(), batch_size=batch_size)
+        for (key, text), doc in zip(nlp_texts.items(), docs):
+            tags_of_key[key] = filter_keywords(extract_keywords(text, doc))
+
+        seconds = (time.perf_counter() - start) / len(nlp_texts)
+        tagger_stats.record("nlp", [seconds] * len(nlp_texts), len(nlp_texts))
+
+    with _cache_lock:
+        for key in missing:
+            _tag_cache[key] = tags_of_key[key]
+        while len(_tag_cache) > TAG_CACHE_SIZE:
+            _tag_cache.popitem(last=False)
+
+    return [list(tags_of_key[key]) for key in keys]
+
+
 def assign_tags_to_post(post_title, post_content):
     """
     Assigns tags to a post based on its title and content.
@@ -124,13 +274,10 @@ def assign_tags_to_post(post_title, post_content):
     """
 
     # Extract keywords from post
-    text = post_title + ": " + post_content
-    text_keywords = filter_keywords(extract_keywords(text))
-
-    # Create tags from keywords
-    tags = []
-    for keyword in text_keywords:
-        create_tag(keyword)  # Adds tag to database (if it doesn't exist already)
-        tags.append(keyword)
+    text_keywords = extract_tags([(post_title, post_content)])[0]
+
+    # Create tags from keywords (adds the tags which don't exist yet to the database at once)
+    create_tags(text_keywords)
+    tags = list(text_keywords)
 
     return tags
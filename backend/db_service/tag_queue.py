@@ -0,0 +1,281 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul enthält die Warteschlange der Tag-Extraktion. Beim Erstellen eines Posts wird nur ein Auftrag in die
+Tabelle tag_jobs geschrieben (siehe Migration 0010), die Antwort wartet nicht auf die Sprachverarbeitung. Ein Worker im
+Hintergrund nimmt jeweils mehrere Aufträge auf einmal, extrahiert die Tags mit spaCy im Batch (nlp.pipe) und schreibt
+sie zurück. Da die Warteschlange in der Datenbank liegt, gehen Aufträge bei einem Neustart nicht verloren, und mehrere
+Worker-Prozesse teilen sie sich.
+
+Ein Auftrag, den ein Worker genommen, aber nach TAG_CLAIM_TIMEOUT Sekunden nicht abgeschlossen hat, wird wieder
+freigegeben. Schlägt die Extraktion eines Posts TAG_MAX_ATTEMPTS Mal fehl, bleibt der Auftrag mit dem Fehler liegen.
+"""
+
+import json  # For passing the ids as one parameter
+import time  # For the timings of the jobs
+import logging  # For errors of the background worker
+import threading  # For the background worker
+from collections import deque  # For the timings of the latest jobs
+
+from backend.db_service import database as db  # For writing the tags
+from backend.db_service import tag_management as tm  # The tag extraction
+from backend.db_service.connection import Database, Transaction  # Database access
+
+# Number of jobs which are processed at once
+TAG_BATCH_SIZE = 32
+
+# Seconds between two checks for new jobs while the queue is empty
+TAG_POLL_INTERVAL = 1.0
+
+# Seconds after which a job which a worker took but did not finish is released again (e.g. the worker crashed)
+TAG_CLAIM_TIMEOUT = 10 * 60
+
+# A job is given up after this number of failed attempts
+TAG_MAX_ATTEMPTS = 3
+
+# Number of finished jobs whose timings are kept for the statistics
+RECENT_JOBS = 100
+
+logger = logging.getLogger(__name__)
+
+
+def claim_jobs(limit: int) -> list[dict]:
+    """
+    Takes the oldest waiting jobs from the queue, so no other worker processes them.
+
+    Args:
+        limit: The maximum number of jobs.
+
+    Returns:
+        A list of jobs (dictionaries with job_id, post_id, enqueued_at and post, which is a tuple (title, content) or
+        None if the post was deleted).
+    """
+
+    now = time.time()
+
+    with Transaction() as cur:
+        # Jobs of a worker which did not finish them in time are taken again
+        cur.execute("UPDATE tag_jobs SET claimed_at = NULL WHERE claimed_at < ?", (now - TAG_CLAIM_TIMEOUT,))
+
+        sql = """
+            SELECT job_id, post_id, enqueued_at FROM tag_jobs
+            WHERE claimed_at IS NULL AND attempts < ?
+            ORDER BY job_id
+            LIMIT ?
+        """
+        cur.execute(sql, (TAG_MAX_ATTEMPTS, limit))
+        jobs = [dict(result) for result in cur.fetchall()]
+
+        job_ids = json.dumps([job["job_id"] for job in jobs])
+        sql = """
+            UPDATE tag_jobs SET claimed_at = ?, attempts = attempts + 1
+            WHERE job_id IN (SELECT value FROM json_each(?))
+        """
+        cur.execute(sql, (now, job_ids))
+
+        post_ids = json.dumps([job["post_id"] for job in jobs])
+        cur.execute("SELECT post_id, title, content FROM posts WHERE post_id IN (SELECT value FROM json_each(?))",
+                    (post_ids,))
+        posts = {result["post_id"]: (result["title"], result["content"]) for result in cur.fetchall()}
+
+    for job in jobs:
+        job["post"] = posts.get(job["post_id"])
+
+    return jobs
+
+
+def complete_job(job: dict, tags: list[str]):
+    """
+    Writes the tags of a post and removes its job in one transaction. If the post was enqueued again in the meantime,
+    the job stays, so the tags are extracted from the new text.
+
+    Args:
+        job: The job (see claim_jobs).
+        tags: The tags of the post.
+    """
+
+    with Transaction() as cur:
+        if job["post"] is not None:
+            db.update_tags_of_post(job["post_id"], tags)
+
+        cur.execute("DELETE FROM tag_jobs WHERE job_id = ? AND enqueued_at = ?", (job["job_id"], job["enqueued_at"]))
+
+
+def fail_job(job: dict, error: str):
+    """
+    Releases a job after its tags could not be extracted. It is tried again unless it reached TAG_MAX_ATTEMPTS.
+
+    Args:
+        job: The job (see claim_jobs).
+        error: A description of the error.
+    """
+
+    sql = "UPDATE tag_jobs SET claimed_at = NULL, last_error = ? WHERE job_id = ? AND enqueued_at = ?"
+
+    with Database() as cur:
+        cur.execute(sql, (error, job["job_id"], job["enqueued_at"]))
+
+
+def get_queue_stats() -> dict:
+    """
+    Counts the jobs of the queue.
+
+    Returns:
+        A dictionary with the number of waiting, running and failed jobs and the age of the oldest waiting job in
+        seconds (None if no job is waiting).
+    """
+
+    sql = """
+        SELECT claimed_at IS NOT NULL AS running, attempts >= ? AS failed, COUNT(*) AS jobs,
+               MIN(enqueued_at) AS oldest
+        FROM tag_jobs
+        GROUP BY running, failed
+    """
+
+    with Database() as cur:
+        cur.execute(sql, (TAG_MAX_ATTEMPTS,))
+        results = cur.fetchall()
+
+    stats = {"waiting": 0, "running": 0, "failed": 0, "oldest_waiting_seconds": None}
+
+    for result in results:
+        if result["running"]:
+            stats["running"] += result["jobs"]
+        elif result["failed"]:
+            stats["failed"] += result["jobs"]
+        else:
+            stats["waiting"] += result["jobs"]
+            stats["oldest_waiting_seconds"] = time.time() - result["oldest"]
+
+    return stats
+
+
+class TagWorker:
+    """
+    Processes the jobs of the tag queue in batches and keeps the timings of the latest jobs of this process.
+    """
+
+    def __init__(self, batch_size: int = TAG_BATCH_SIZE, poll_interval: float = TAG_POLL_INTERVAL):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+
+        self._recent = deque(maxlen=RECENT_JOBS)  # Timings of the latest finished jobs
+        self._lock = threading.Lock()
+
+    def extract(self, jobs: list[dict]) -> list:
+        """
+        Extracts the tags of the posts of some jobs. If the batch fails, the posts are extracted one by one, so one
+        post which breaks the extraction does not hold back the others.
+
+        Returns:
+            The tags of each job, None for the jobs which failed.
+        """
+
+        try:
+            return tm.extract_tags([job["post"] for job in jobs])
+        except Exception as error:
+            if len(jobs) == 1:
+                logger.exception("Extracting the tags of post %s failed", jobs[0]["post_id"])
+                fail_job(jobs[0], repr(error))
+                return [None]
+
+        return [self.extract([job])[0] for job in jobs]
+
+    def process_batch(self) -> int:
+        """
+        Takes the next jobs from the queue and processes them.
+
+        Returns:
+            The number of jobs taken, 0 if the queue is empty.
+        """
+
+        jobs = claim_jobs(self.batch_size)
+
+        if not jobs:
+            return 0
+
+        start = time.perf_counter()
+        posts = [job for job in jobs if job["post"] is not None]
+        tag_lists = self.extract(posts) if posts else []
+        extract_seconds = (time.perf_counter() - start) / max(len(posts), 1)
+
+        tags_of_job = {job["job_id"]: tags for job, tags in zip(posts, tag_lists)}
+        timings = []
+
+        for job in jobs:
+            tags = tags_of_job.get(job["job_id"], [])
+
+            if tags is None:  # The extraction failed, the job was released
+                continue
+
+            write_start = time.perf_counter()
+            complete_job(job, tags)
+            write_seconds = time.perf_counter() - write_start
+
+            timings.append({
+                "post_id": job["post_id"],
+                "wait_ms": (time.time() - job["enqueued_at"]) * 1000,
+                "extract_ms": extract_seconds * 1000 if job["post"] is not None else 0.0,
+                "write_ms": write_seconds * 1000,
+                "tags": len(tags),
+            })
+
+        with self._lock:
+            self.batches += 1
+            self.processed += len(timings)
+            self.failed += len(jobs) - len(timings)
+            self._recent.extend(timings)
+
+        return len(jobs)
+
+    def run(self, stop: threading.Event):
+        """
+        Processes batches as long as jobs are waiting and checks for new jobs every poll_interval seconds while the
+        queue is empty, until stop is set. Meant to run in a background thread.
+
+        Args:
+            stop: Event which ends the worker.
+        """
+
+        while not stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception:
+                logger.exception("Processing the tag queue failed")
+                processed = 0
+
+            if not processed:
+                stop.wait(self.poll_interval)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters and timings of this process.
+
+        Returns:
+            A dictionary with the number of batches and of processed and failed jobs, the p50 and p99 of the timings
+            (milliseconds) and the timings of the latest jobs. wait_ms is the time from enqueueing to the written tags,
+            extract_ms the share of the job in the extraction of its batch.
+        """
+
+        with self._lock:
+            recent = list(self._recent)
+            stats = {"batches": self.batches, "processed": self.processed, "failed": self.failed}
+
+        for timing in ("wait_ms", "extract_ms", "write_ms"):
+            ordered = sorted(job[timing] for job in recent)
+            stats[timing] = {
+                "p50": ordered[len(ordered) // 2] if ordered else None,
+                "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else None,
+            }
+
+        stats["recent_jobs"] = recent
+
+        return stats
+
+
+# The worker which is started by main.py
+tag_worker = TagWorker()
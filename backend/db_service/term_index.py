@@ -0,0 +1,352 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul pflegt den Dokument-Term-Index der Posts (Tabellen terms, post_terms und indexed_posts, siehe Migration
+0005). Die Tokens eines Posts werden nach dem Erstellen oder Bearbeiten einmal gezählt und gespeichert. Das erledigt ein
+Hintergrundjob für die Posts, die Trigger in die Tabelle term_index_dirty_posts eintragen (Migration 0011), so hängen
+das Erstellen und Bearbeiten nicht von NLTK ab. Schlägt das Indexieren fehl, bleiben die Posts eingetragen und werden
+beim nächsten Durchlauf erneut indexiert. Die Dokumenthäufigkeiten der Terme und die Anzahl der Dokumente werden von
+Triggern in der Datenbank nachgeführt. Die Empfehlungen lesen danach nur noch die Einträge der gesuchten Terme, statt
+alle Posts neu zu tokenisieren.
+
+Die Vorverarbeitung entspricht der bisherigen Vorverarbeitung der Empfehlungen: nltk.word_tokenize, nur alphanumerische
+Wörter, Kleinschreibung, ohne englische Stoppwörter und (wie beim TfidfVectorizer) nur Tokens ab zwei Zeichen.
+"""
+
+import re  # For the token pattern of the TfidfVectorizer
+import json  # For passing lists of post ids to the queries
+import logging  # For errors of the background job
+import threading  # For the background job
+import functools  # For loading the stop words only once
+from collections import Counter  # For counting the terms of a post
+
+from backend.db_service.connection import Database, Transaction  # Database access
+from backend.db_service import nlp_resources  # Local NLTK data, NLTK itself is imported on first use
+
+# Default token pattern of sklearn's TfidfVectorizer: words with at least two characters
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Number of posts tokenized and written per transaction by update_index and index_missing_posts
+INDEX_BATCH_SIZE = 500
+
+# Seconds between two runs of the background job which indexes new and edited posts
+INDEX_INTERVAL = 2
+
+# Maximum number of parameters per IN (...) list
+MAX_IN_PARAMETERS = 500
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_stop_words() -> frozenset[str]:
+    """
+    Returns the English stop words of NLTK. They are loaded on the first call, under the lock of the NLTK data: the
+    lazy corpus loaders of NLTK fail if two threads load them at the same time (e.g. the warmup and the index job).
+
+    Returns:
+        The stop words (lowercase).
+    """
+
+    with nlp_resources._nltk_lock:
+        nlp_resources.use_local_nltk_data()
+        from nltk.corpus import stopwords  # For removing stop words
+
+        return frozenset(stopwords.words("english"))
+
+
+@functools.lru_cache(maxsize=1)
+def get_word_tokenizer():
+    """
+    Returns nltk.word_tokenize. NLTK is imported on the first call, and the tokenizer model is loaded by tokenizing a
+    sample text under the lock of the NLTK data (see get_stop_words).
+    """
+
+    with nlp_resources._nltk_lock:
+        nlp_resources.use_local_nltk_data()
+        from nltk import word_tokenize  # For tokenizing the posts
+
+        word_tokenize(nlp_resources.WARMUP_TEXT)
+
+        return word_tokenize
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits a text into the terms used by the recommendations.
+
+    Args:
+        text: The text (string).
+
+    Returns:
+        The terms of the text in their order of occurrence (lowercase, without stop words).
+    """
+
+    stop_words = get_stop_words()
+    words = [
+        word.lower()
+        for word in get_word_tokenizer()(text)
+        if word.isalnum() and word.lower() not in stop_words
+    ]
+
+    return TOKEN_PATTERN.findall(" ".join(words))
+
+
+def post_text(title: str, content: str) -> str:
+    """
+    Returns the text of a post which is indexed.
+    """
+
+    return title + " - " + content
+
+
+def get_term_ids(cur, terms) -> dict[str, int]:
+    """
+    Returns the ids of terms and creates the terms which do not exist yet. Must be called inside a transaction.
+
+    Args:
+        cur: The cursor of the transaction.
+        terms: The terms (strings).
+
+    Returns:
+        A dictionary mapping each term to its id.
+    """
+
+    terms = list(set(terms))
+    cur.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(term,) for term in terms])
+
+    term_ids = {}
+    for start in range(0, len(terms), MAX_IN_PARAMETERS):
+        chunk = terms[start:start + MAX_IN_PARAMETERS]
+        placeholders = ", ".join("?" * len(chunk))
+        cur.execute(f"SELECT term_id, term FROM terms WHERE term IN ({placeholders})", chunk)
+        term_ids.update({term: term_id for term_id, term in cur.fetchall()})
+
+    return term_ids
+
+
+def write_documents(documents: list[tuple[int, list[str]]], texts: dict[int, str] = None):
+    """
+    Replaces the index entries of several posts in one transaction.
+
+    Args:
+        documents: Tuples (post_id, terms of the post).
+        texts: Optional dictionary mapping each post_id to the text which was tokenized. Posts whose text has changed
+               since (or which were deleted) are skipped, they are indexed again with their current text.
+    """
+
+    with Transaction() as cur:
+        if texts is not None:
+            cur.execute("SELECT post_id, title, content FROM posts WHERE post_id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(list(texts)),))
+            current = {result["post_id"] for result in cur.fetchall()
+                       if post_text(result["title"], result["content"]) == texts[result["post_id"]]}
+            documents = [(post_id, terms) for post_id, terms in documents if post_id in current]
+
+        frequencies = [(post_id, Counter(terms), len(terms)) for post_id, terms in documents]
+        term_ids = get_term_ids(cur, [term for _, counts, _ in frequencies for term in counts])
+
+        for post_id, counts, length in frequencies:
+            # An edited post (or a post indexed concurrently) replaces its old entries
+            cur.execute("DELETE FROM post_terms WHERE post_id = ?", (post_id,))
+            cur.execute("DELETE FROM indexed_posts WHERE post_id = ?", (post_id,))
+
+            cur.executemany(
+                "INSERT INTO post_terms (term_id, post_id, frequency) VALUES (?, ?, ?)",
+                [(term_ids[term], post_id, count) for term, count in counts.items()]
+            )
+            cur.execute("INSERT INTO indexed_posts (post_id, length) VALUES (?, ?)", (post_id, length))
+
+
+def update_index(batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """
+    Indexes the new and edited posts (term_index_dirty_posts). The posts are taken from the table before their texts
+    are read, so a post which is edited meanwhile is added again and indexed by the next run. The texts are tokenized
+    outside of any transaction, so the database is not locked during the tokenization.
+
+    Args:
+        batch_size: The number of posts written per transaction.
+
+    Returns:
+        The number of posts which were indexed.
+    """
+
+    indexed = 0
+
+    while True:
+        with Transaction() as cur:
+            cur.execute("SELECT post_id FROM term_index_dirty_posts LIMIT ?", (batch_size,))
+            post_ids = json.dumps([result["post_id"] for result in cur.fetchall()])
+
+            cur.execute("DELETE FROM term_index_dirty_posts WHERE post_id IN (SELECT value FROM json_each(?))",
+                        (post_ids,))
+            count = cur.rowcount
+
+        if not count:
+            return indexed
+
+        sql = "SELECT post_id, title, content FROM posts WHERE post_id IN (SELECT value FROM json_each(?))"
+
+        try:
+            with Database() as cur:
+                cur.execute(sql, (post_ids,))
+                texts = {result["post_id"]: post_text(result["title"], result["content"]) for result in cur.fetchall()}
+
+            write_documents([(post_id, tokenize(text)) for post_id, text in texts.items()], texts)
+        except Exception:
+            # The posts are indexed by the next run
+            with Transaction() as cur:
+                cur.execute("INSERT OR IGNORE INTO term_index_dirty_posts (post_id) "
+                            "SELECT value FROM json_each(?) WHERE value IN (SELECT post_id FROM posts)", (post_ids,))
+            raise
+
+        indexed += len(texts)
+
+        if count < batch_size:
+            return indexed
+
+
+def run_index_job(stop: threading.Event, interval: float = INDEX_INTERVAL):
+    """
+    Indexes the new and edited posts every interval seconds until stop is set. Meant to run in a background thread.
+    This job is the only user of NLTK in the server, requests never tokenize.
+
+    Args:
+        stop: Event which ends the job.
+        interval: Seconds between two runs.
+    """
+
+    missing = None  # Message of the missing NLTK resource, which is only logged once
+
+    while not stop.is_set():
+        try:
+            update_index()
+            missing = None
+        except LookupError as error:
+            # The posts stay in term_index_dirty_posts until the NLTK data is added
+            if str(error) != missing:
+                logger.error("Updating the document-term index failed: %s", error)
+                missing = str(error)
+        except Exception:
+            logger.exception("Updating the document-term index failed")
+
+        stop.wait(interval)
+
+
+def index_missing_posts(batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """
+    Indexes all posts which are not in the index yet at once, e.g. the synthetic posts of the benchmarks. The server
+    leaves this to run_index_job.
+
+    Args:
+        batch_size: The number of posts written per transaction.
+
+    Returns:
+        The number of posts which were indexed.
+    """
+
+    sql = """
+        SELECT posts.post_id, posts.title, posts.content
+        FROM posts
+        LEFT JOIN indexed_posts ON indexed_posts.post_id = posts.post_id
+        WHERE indexed_posts.post_id IS NULL AND posts.post_id > ?
+        ORDER BY posts.post_id
+        LIMIT ?
+    """
+
+    last_post_id = 0
+    indexed = 0
+
+    while True:
+        with Database() as cur:
+            cur.execute(sql, (last_post_id, batch_size))
+            rows = cur.fetchall()
+
+        if not rows:
+            return indexed
+
+        write_documents([(row["post_id"], tokenize(post_text(row["title"], row["content"]))) for row in rows])
+
+        last_post_id = rows[-1]["post_id"]
+        indexed += len(rows)
+
+
+def get_postings(terms, post_ids=None) -> tuple[int, dict[str, tuple[int, int]], list[tuple[int, int, int]]]:
+    """
+    Reads the postings of some terms from the index.
+
+    Args:
+        terms: The terms (strings).
+        post_ids: Optional list of post ids. Only the postings of these posts are read, e.g. of the candidates of the
+                  recommendations. The document frequencies still count all posts.
+
+    Returns:
+        A tuple of the number of indexed posts, the id and document frequency of each term which occurs in the index
+        and the postings as tuples (term_id, post_id, frequency).
+    """
+
+    terms = list(terms)
+
+    if not terms:
+        return 0, {}, []
+
+    placeholders = ", ".join("?" * len(terms))
+
+    with Database() as cur:
+        cur.execute("SELECT documents FROM term_index_stats WHERE id = 1")
+        documents = cur.fetchone()[0]
+
+        cur.execute(f"SELECT term, term_id, document_frequency FROM terms WHERE term IN ({placeholders})", terms)
+        term_ids = {term: (term_id, frequency) for term, term_id, frequency in cur.fetchall()}
+
+        if not term_ids:
+            return documents, term_ids, []
+
+        placeholders = ", ".join("?" * len(term_ids))
+        sql = f"SELECT term_id, post_id, frequency FROM post_terms WHERE term_id IN ({placeholders})"
+        parameters = [term_id for term_id, _ in term_ids.values()]
+
+        if post_ids is not None:  # Passed as one JSON array, so the number of ids is not limited by the SQL variables
+            sql += " AND post_id IN (SELECT value FROM json_each(?))"
+            parameters.append(json.dumps(list(post_ids)))
+
+        # Plain tuples instead of sqlite3.Row objects, there can be many postings
+        cur.row_factory = None
+        cur.execute(sql, parameters)
+        postings = cur.fetchall()
+
+    return documents, term_ids, postings
+
+
+def get_recent_posts(terms, limit: int, min_post_id: int = 0) -> set[int]:
+    """
+    Returns the newest posts which contain one of the terms.
+
+    Args:
+        terms: The terms (strings).
+        limit: The maximum number of posts per term.
+        min_post_id: Only posts with at least this id are returned.
+
+    Returns:
+        A set of post ids (at most limit per term).
+    """
+
+    terms = list(terms)
+
+    if not terms:
+        return set()
+
+    placeholders = ", ".join("?" * len(terms))
+    post_ids = set()
+
+    with Database() as cur:
+        cur.execute(f"SELECT term_id FROM terms WHERE term IN ({placeholders})", terms)
+        term_ids = [result["term_id"] for result in cur.fetchall()]
+
+        sql = "SELECT post_id FROM post_terms WHERE term_id = ? AND post_id >= ? ORDER BY post_id DESC LIMIT ?"
+        for term_id in term_ids:
+            cur.execute(sql, (term_id, min_post_id, limit))
+            post_ids.update(result["post_id"] for result in cur.fetchall())
+
+    return post_ids
@@ -0,0 +1,158 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul enthält einen begrenzten LRU-Cache für Benutzerdatensätze. Ein Benutzer kann über seine ID, seinen
+Benutzernamen oder seine E-Mail-Adresse gefunden werden. Die Schreibfunktionen in database.py (create_user,
+update_username, update_role) entfernen betroffene Einträge sofort aus dem Cache, eine Sperrung wirkt also ohne
+Verzögerung. Der Cache gilt pro Prozess: Änderungen, die ein anderer Prozess direkt in die Datenbank schreibt, sieht er
+nicht.
+"""
+
+import threading  # For protecting the cache against concurrent access from the database threads
+from collections import OrderedDict  # For the least recently used order
+from typing import Optional  # For optional return values
+
+from backend.db_service.models import User  # The cached user records
+
+# Maximum number of users kept in the cache
+USER_CACHE_SIZE = 4096
+
+# Fields by which a user can be looked up
+LOOKUP_FIELDS = ("user_id", "username", "email")
+
+
+class UserCache:
+    """
+    Thread-safe LRU cache of complete user records (including the password hash), indexed by user_id, username and
+    email.
+
+    A read that misses the cache loads the user from the database and then calls put() with the generation it saw
+    before the query. Every invalidation increases the generation, so a record read before a concurrent write cannot
+    be put back into the cache after the write invalidated it.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE):
+        self.max_size = max_size
+        self.generation = 0  # Increased by every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._users = OrderedDict()  # user_id -> User, least recently used first
+        self._ids = {"username": {}, "email": {}}  # username / email -> user_id
+        self._lock = threading.Lock()
+
+    def get(self, field: str, value) -> Optional[User]:
+        """
+        Returns a copy of the cached user whose field has the given value.
+
+        Args:
+            field: One of LOOKUP_FIELDS.
+            value: The user_id, username or email.
+
+        Returns:
+            The user, None if the user is not in the cache.
+        """
+
+        with self._lock:
+            user_id = value if field == "user_id" else self._ids[field].get(value)
+            user = self._users.get(user_id)
+
+            if user is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._users.move_to_end(user_id)
+
+        # Callers may modify the returned model, the cached one must stay unchanged
+        return user.model_copy()
+
+    def put(self, user: User, generation: int):
+        """
+        Adds a user loaded from the database to the cache.
+
+        Args:
+            user: The complete user record.
+            generation: The generation of the cache before the user was read from the database. If something was
+                        invalidated since, the record may be stale and is not cached.
+        """
+
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self._remove(user.user_id)
+            self._users[user.user_id] = user.model_copy()
+            self._ids["username"][user.username] = user.user_id
+            self._ids["email"][user.email] = user.user_id
+
+            while len(self._users) > self.max_size:
+                self._remove(next(iter(self._users)))
+                self.evictions += 1
+
+    def invalidate(self, user_id: Optional[int] = None, username: Optional[str] = None, email: Optional[str] = None):
+        """
+        Removes the users with the given user_id, username or email from the cache.
+
+        Args:
+            user_id: The ID of a changed user.
+            username: A username which now belongs to another user (or a new user).
+            email: An email which now belongs to another user (or a new user).
+        """
+
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+
+            for cached_id in (user_id, self._ids["username"].get(username), self._ids["email"].get(email)):
+                if cached_id is not None:
+                    self._remove(cached_id)
+
+    def clear(self):
+        """
+        Removes all users from the cache, e.g. after the database was replaced.
+        """
+
+        with self._lock:
+            self.generation += 1
+            self._users.clear()
+            self._ids = {"username": {}, "email": {}}
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        Returns:
+            A dictionary with the size, hits, misses, hit rate, evictions and invalidations.
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self._users),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, user_id: int):
+        # Must be called with the lock held
+        user = self._users.pop(user_id, None)
+
+        if user is None:
+            return
+
+        for field in ("username", "email"):
+            if self._ids[field].get(getattr(user, field)) == user_id:
+                del self._ids[field][getattr(user, field)]
+
+
+# The cache used by database.py
+user_cache = UserCache()
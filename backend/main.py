@@ -20,9 +20,20 @@ Aufteilung des Projekts:
 Github Repository: https://github.com/sandro4273/forum
 """
 
+import threading  # For the background jobs (index, recommendation model, rankings, tags)
+from contextlib import asynccontextmanager  # For the startup and shutdown logic of the app
+
 from fastapi import FastAPI  # FastAPI is the main framework used for the backend API
 from fastapi.middleware.cors import CORSMiddleware  # CORS is needed to allow requests from the frontend
 from backend.api.api import api_router  # API router which connects all the endpoints
+from backend.db_service.migrations import apply_migrations  # Brings the database schema up to date
+from backend.db_service import term_index  # Adds new and edited posts to the recommendation index
+from backend.db_service import interest_profiles  # Time decay and downvote penalty of the recommendations
+from backend.db_service import collaborative_filtering  # Model of the collaborative filtering recommendations
+from backend.db_service import rankings  # Precomputed hot and controversial feeds
+from backend.db_service.tag_queue import tag_worker  # Extracts the tags of new posts
+from backend.db_service import nlp_resources  # Warmup of the language processing (spaCy, YAKE, NLTK)
+from backend.api.endpoints.auth import config  # Settings from config.json
 
 # In case of CORS error, add your local host to the list of origins
 origins = [
@@ -32,8 +43,49 @@ origins = [
     "http://127.0.0.1:8000"
 ]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Runs once when the server starts (before the yield) and once when it shuts down (after the yield).
+    """
+
+    # Apply all pending schema migrations before the first request is served
+    apply_migrations()
+
+    # Optional time decay and downvote penalty of the interest profiles (recommendations)
+    interest_profiles.configure(
+        half_life_days=config.get("RECOMMENDATION_HALF_LIFE_DAYS"),
+        penalty=config.get("RECOMMENDATION_DOWNVOTE_PENALTY", 0.0)
+    )
+
+    stop_jobs = threading.Event()
+
+    # Load the language processing in the background, so the server starts at once, and retry it if it fails.
+    # /health/ready reports ready afterwards. Only the tag worker and the index job use it, requests never wait for it.
+    threading.Thread(target=nlp_resources.run_warmup_job, args=(stop_jobs,), name="nlp-warmup", daemon=True).start()
+
+    # Index new and edited posts in the document-term index (term_index_dirty_posts). Until then, these posts are not
+    # recommended.
+    threading.Thread(target=term_index.run_index_job, args=(stop_jobs,), name="term-index", daemon=True).start()
+
+    # Build the collaborative filtering model and keep it up to date with the votes (SortType.COLLABORATIVE)
+    threading.Thread(target=collaborative_filtering.run_rebuild_job, args=(stop_jobs,),
+                     name="collaborative-filtering-rebuild", daemon=True).start()
+
+    # Recalculate the hot and controversial scores of posts with new votes (SortType.HOT, SortType.CONTROVERSIAL)
+    threading.Thread(target=rankings.run_ranking_job, args=(stop_jobs,), name="post-rankings", daemon=True).start()
+
+    # Extract the tags of new posts from the tag queue
+    threading.Thread(target=tag_worker.run, args=(stop_jobs,), name="tag-worker", daemon=True).start()
+
+    yield
+
+    stop_jobs.set()
+
+
 # Initialize FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure the CORS middleware
 app.add_middleware(CORSMiddleware,
@@ -0,0 +1,174 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Offline-Auswertung des kollaborativen Filterns (SortType.COLLABORATIVE). Synthetische Benutzer gehören zu Gruppen mit
+gemeinsamen Interessen und bewerten vor allem die Posts ihrer Gruppe. Die Bewertungen werden in zeitlicher Reihenfolge
+abgespielt: Mit den ersten TRAIN_SHARE wird das Modell gebaut, die späteren positiven Bewertungen jedes Benutzers sind
+die Posts, die eine gute Empfehlung hätte finden sollen. Gemessen werden precision@k im Vergleich zu den beliebtesten
+Posts, die Dauer des vollständigen und des inkrementellen Aufbaus und die Latenz der Empfehlungen.
+
+Ausführen: python -m benchmarks.collaborative_filtering [--users 2000] [--posts 10000] [--votes-per-user 40] [--k 10]
+"""
+
+import argparse  # For the command line arguments
+import random  # For generating the users and votes
+import time  # For the time of the votes
+from collections import Counter  # For the popularity baseline
+
+from benchmarks.common import temporary_database, insert_synthetic_posts, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # The recommendations to evaluate
+from backend.db_service import collaborative_filtering  # Builds the model
+from backend.db_service.connection import Database, Transaction  # For inserting users and votes
+from backend.db_service.models import SortType  # Sorting type of the feed
+from backend.db_service.recommendation_cache import recommendation_cache  # Cleared to measure uncached feeds
+
+CLUSTERS = 20  # Groups of users with the same interests
+IN_CLUSTER_SHARE = 0.8  # Share of a user's votes on posts of the own group
+OUTSIDE_DOWNVOTE_SHARE = 0.5  # Share of the votes outside the own group which are downvotes
+TRAIN_SHARE = 0.8  # Share of the votes, in chronological order, from which the model is built
+INCREMENTAL_BATCHES = 5  # Batches of new votes after which the model is updated incrementally
+INCREMENTAL_VOTES = 200  # Votes per batch
+LATENCY_USERS = 200  # Users whose recommendations are timed
+
+
+def insert_users(count: int) -> list[int]:
+    """
+    Inserts synthetic users and returns their ids.
+    """
+
+    rows = [(f"cf_user_{i}", f"cf_user_{i}@example.com", "-") for i in range(count)]
+
+    with Transaction() as cur:
+        cur.executemany("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", rows)
+        cur.execute("SELECT user_id FROM users WHERE username LIKE 'cf\\_user\\_%' ESCAPE '\\'")
+        return [result["user_id"] for result in cur.fetchall()]
+
+
+def generate_votes(user_ids: list[int], post_ids: list[int], votes_per_user: int,
+                   seed: int = 0) -> list[tuple[int, int, int]]:
+    """
+    Generates votes of users who mostly vote on the posts of their group. Within a group, some posts are much more
+    popular than others. The votes of all users are interleaved, as if they had been cast over time.
+
+    Returns:
+        A list of (user_id, post_id, vote) in chronological order.
+    """
+
+    rng = random.Random(seed)
+    clusters = [post_ids[cluster::CLUSTERS] for cluster in range(CLUSTERS)]
+    weights = [[1 / rank for rank in range(1, len(posts) + 1)] for posts in clusters]
+
+    votes = []
+    for user_id in user_ids:
+        cluster = rng.randrange(CLUSTERS)
+        voted = {}
+
+        while len(voted) < votes_per_user:
+            if rng.random() < IN_CLUSTER_SHARE:
+                voted.setdefault(rng.choices(clusters[cluster], weights[cluster])[0], 1)
+            else:
+                vote = -1 if rng.random() < OUTSIDE_DOWNVOTE_SHARE else 1
+                voted.setdefault(rng.choice(post_ids), vote)
+
+        votes.extend((user_id, post_id, vote) for post_id, vote in voted.items())
+
+    rng.shuffle(votes)
+
+    return votes
+
+
+def insert_votes(votes: list[tuple[int, int, int]]):
+    now = time.time()
+
+    with Transaction() as cur:
+        cur.executemany("INSERT INTO posts_votes (user_id, post_id, vote, voted_at) VALUES (?, ?, ?, ?)",
+                        [vote + (now,) for vote in votes])
+
+
+def precision_at_k(recommendations: dict[int, list[int]], relevant: dict[int, set[int]], k: int) -> float:
+    """
+    Returns the mean share of the first k recommendations which the user upvoted later.
+    """
+
+    precisions = [len(set(recommendations[user_id][:k]) & posts) / k for user_id, posts in relevant.items()]
+
+    return sum(precisions) / len(precisions) if precisions else 0.0
+
+
+def run(users: int, posts: int, votes_per_user: int, k: int):
+    with temporary_database():
+        insert_synthetic_posts(posts)
+
+        with Database() as cur:
+            cur.execute("SELECT post_id FROM posts ORDER BY post_id")
+            post_ids = [result["post_id"] for result in cur.fetchall()]
+
+        user_ids = insert_users(users)
+        votes = generate_votes(user_ids, post_ids, votes_per_user)
+        split = int(len(votes) * TRAIN_SHARE)
+        train, test = votes[:split], votes[split:]
+
+        insert_votes(train)
+        print(f"{users} users, {posts} posts, {len(train)} training votes, {len(test)} test votes")
+
+        start = time.perf_counter()
+        stats = collaborative_filtering.update_model(full=True)
+        print(f"  full build:        {time.perf_counter() - start:8.2f} s ({stats['posts']} posts with votes)")
+
+        # The posts which each user upvoted after the training period
+        relevant = {}
+        for user_id, post_id, vote in test:
+            if vote > 0:
+                relevant.setdefault(user_id, set()).add(post_id)
+
+        voted = {}
+        for user_id, post_id, _ in train:
+            voted.setdefault(user_id, set()).add(post_id)
+
+        collaborative = {user_id: db.get_collaborative_posts(None, user_id) for user_id in relevant}
+
+        upvotes = Counter(post_id for _, post_id, vote in train if vote > 0)
+        popular = [post_id for post_id, _ in upvotes.most_common()]
+        baseline = {
+            user_id: [post_id for post_id in popular[:k + len(voted.get(user_id, ()))]
+                      if post_id not in voted.get(user_id, ())]
+            for user_id in relevant
+        }
+
+        print(f"  precision@{k}:      collaborative {precision_at_k(collaborative, relevant, k):.3f} | "
+              f"most popular {precision_at_k(baseline, relevant, k):.3f} ({len(relevant)} users)")
+
+        sample = random.Random(1).sample(sorted(relevant), min(LATENCY_USERS, len(relevant)))
+        ranking = []
+        for user_id in sample:
+            ranking += measure(lambda: db.get_collaborative_posts(None, user_id), 1)
+        print(f"  ranking:           {summarize(ranking)}")
+
+        first_page = []
+        for user_id in sample:
+            recommendation_cache.clear()
+            first_page += measure(lambda: db.get_posts(None, 10, 0, SortType.COLLABORATIVE, user_id), 1)
+        print(f"  first feed page:   {summarize(first_page)}")
+
+        # New votes arrive and the background job updates the model
+        for batch in range(INCREMENTAL_BATCHES):
+            insert_votes(test[batch * INCREMENTAL_VOTES:(batch + 1) * INCREMENTAL_VOTES])
+            stats = collaborative_filtering.update_model()
+            print(f"  {stats['mode']} update: {stats['seconds']:8.2f} s ({stats['recalculated']} of "
+                  f"{stats['posts']} posts recalculated after {INCREMENTAL_VOTES} votes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000, help="Number of synthetic users")
+    parser.add_argument("--posts", type=int, default=10000, help="Number of synthetic posts")
+    parser.add_argument("--votes-per-user", type=int, default=40, help="Number of votes of each user")
+    parser.add_argument("--k", type=int, default=10, help="Number of recommendations which are evaluated")
+    args = parser.parse_args()
+
+    run(args.users, args.posts, args.votes_per_user, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Dieses Modul enthält Hilfsfunktionen für die Benchmarks. Die Benchmarks arbeiten immer auf einer Kopie der Datenbank,
+damit die eigentliche forum.db nicht verändert wird.
+"""
+
+import os  # For file path operations
+import random  # For generating synthetic posts
+import shutil  # For copying the database file
+import tempfile  # For temporary directories
+import time  # For measuring durations
+import statistics  # For computing latency percentiles
+from contextlib import contextmanager  # For context managers
+
+from backend.db_service.connection import DB_PATH, pool, Transaction  # Database access
+from backend.db_service.migrations import apply_migrations  # For bringing the copy up to date
+from backend.db_service.user_cache import user_cache  # Must not serve users of another database
+from backend.db_service.recommendation_cache import recommendation_cache  # Must not serve posts of another database
+from backend.db_service.database import tag_id_cache  # Must not serve tag ids of another database
+from backend.db_service.tag_management import tag_matcher  # Must not match the tags of another database
+
+
+@contextmanager
+def temporary_database(source_path: str = DB_PATH):
+    """
+    Copies a database into a temporary directory, points the connection pool to the copy and migrates it.
+
+    Args:
+        source_path: The database to copy. Defaults to forum.db.
+
+    Yields:
+        The path of the temporary database.
+    """
+
+    original_path = pool.db_path
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "forum.db")
+
+        shutil.copyfile(source_path, db_path)
+
+        pool.reset(db_path)
+        user_cache.clear()
+        recommendation_cache.clear()
+        tag_id_cache.clear()
+        tag_matcher.clear()
+        try:
+            apply_migrations()
+            yield db_path
+        finally:
+            pool.reset(original_path)
+            user_cache.clear()
+            recommendation_cache.clear()
+            tag_id_cache.clear()
+            tag_matcher.clear()
+
+
+def synthetic_vocabulary(size: int = 2000, seed: int = 0) -> list[str]:
+    """
+    Generates pronounceable pseudo-words which are used as vocabulary of the synthetic posts.
+
+    Args:
+        size: The number of words.
+        seed: The seed of the random generator.
+
+    Returns:
+        A list of unique lowercase words.
+    """
+
+    rng = random.Random(seed)
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    words = set()
+
+    while len(words) < size:
+        syllables = rng.randint(2, 4)
+        words.add("".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(syllables)))
+
+    return sorted(words)
+
+
+def insert_synthetic_posts(count: int, author_id: int = 1, words_per_post: int = 40, seed: int = 0,
+                           batch_size: int = 10000) -> list[str]:
+    """
+    Inserts synthetic posts into the database of the connection pool. Word frequencies follow a Zipf-like distribution
+    so that some words are common and most are rare, similar to real text.
+
+    Args:
+        count: The number of posts to insert.
+        author_id: The author of the posts.
+        words_per_post: The number of words in the content of each post.
+        seed: The seed of the random generator.
+        batch_size: The number of posts inserted per transaction.
+
+    Returns:
+        The vocabulary of the posts, ordered from the most to the least frequent word.
+    """
+
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(seed=seed)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+    sql = "INSERT INTO posts (author_id, title, content) VALUES (?, ?, ?)"
+
+    for start in range(0, count, batch_size):
+        rows = []
+        for _ in range(min(batch_size, count - start)):
+            words = rng.choices(vocabulary, weights, k=words_per_post + 4)
+            rows.append((author_id, " ".join(words[:4]).capitalize(), "<p>" + " ".join(words[4:]) + "</p>"))
+
+        with Transaction() as cur:
+            cur.executemany(sql, rows)
+
+    return vocabulary
+
+
+def measure(func, repetitions: int) -> list[float]:
+    """
+    Calls a function several times and measures the duration of each call.
+
+    Args:
+        func: The function to call (without arguments).
+        repetitions: How often the function is called.
+
+    Returns:
+        The durations of the calls in milliseconds.
+    """
+
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return durations
+
+
+def summarize(durations: list[float]) -> str:
+    """
+    Formats the mean, p50 and p99 of a list of durations.
+
+    Args:
+        durations: The durations in milliseconds.
+
+    Returns:
+        A short summary (string).
+    """
+
+    ordered = sorted(durations)
+    p50 = ordered[len(ordered) // 2]
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    return f"mean {statistics.mean(ordered):8.3f} ms | p50 {p50:8.3f} ms | p99 {p99:8.3f} ms"
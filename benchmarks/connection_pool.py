@@ -0,0 +1,98 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Micro-Benchmark für den Verbindungspool. Vergleicht die frühere Variante (eine neue Verbindung pro Datenbankfunktion)
+mit dem Pool (eine dauerhafte Verbindung pro Thread) anhand der geöffneten Verbindungen pro Anfrage und der Latenz.
+
+Ausführen: python -m benchmarks.connection_pool
+"""
+
+import sqlite3  # SQLite for the database
+from unittest import mock  # For swapping the context managers of the database module
+
+from benchmarks.common import temporary_database, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # The database functions to benchmark
+from backend.db_service.connection import pool  # The connection pool
+from backend.db_service.models import SortType  # Sorting types of the feed
+
+REPETITIONS = 200
+
+
+class LegacyDatabase:
+    """
+    The former context manager: opens a new connection for every call and closes it afterwards.
+    """
+    connections_opened = 0
+
+    def __enter__(self):
+        LegacyDatabase.connections_opened += 1
+        self.conn = sqlite3.connect(pool.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.cur = self.conn.cursor()
+        return self.cur
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.conn.commit()
+        self.conn.close()
+
+
+def feed_request(user_id):
+    """
+    The work of one /posts/ request followed by the author lookups the frontend makes for the page.
+    """
+
+    posts, _ = db.get_posts(None, 10, 0, SortType.POPULAR, user_id)
+    for post in posts:
+        db.get_public_user_by_id(post.author_id)
+
+
+def post_page_request(post_id, user_id):
+    """
+    The requests the post page makes: post, tags, votes, own vote, comments and the comment authors.
+    """
+
+    post = db.get_post_by_id(post_id)
+    db.get_public_user_by_id(post.author_id)
+    db.get_tags_of_post(post_id)
+    db.get_votes_of_post(post_id)
+    db.get_vote_of_user(post_id, user_id)
+    for comment in db.get_comments_of_post(post_id):
+        db.get_public_user_by_id(comment.author_id)
+
+
+def run_scenario(name, func):
+    """
+    Runs a scenario with the legacy context manager and with the pool and prints the results.
+    """
+
+    # Legacy: every database function opens its own connection
+    with mock.patch.object(db, "Database", LegacyDatabase), mock.patch.object(db, "Transaction", LegacyDatabase):
+        LegacyDatabase.connections_opened = 0
+        legacy = measure(func, REPETITIONS)
+        legacy_connections = LegacyDatabase.connections_opened / REPETITIONS
+
+    # Pool: one connection for the benchmark thread
+    pool.reset()
+    opened_before = pool.connections_opened
+    pooled = measure(func, REPETITIONS)
+    pooled_connections = (pool.connections_opened - opened_before) / REPETITIONS
+
+    print(f"{name}")
+    print(f"  before: {legacy_connections:6.2f} connections/request | {summarize(legacy)}")
+    print(f"  after:  {pooled_connections:6.2f} connections/request | {summarize(pooled)}")
+
+
+def main():
+    with temporary_database():
+        # Pick a post with comments and an existing user for realistic requests
+        post_id = max(range(1, 50), key=lambda i: len(db.get_comments_of_post(i)))
+        user_id = db.get_post_by_id(post_id).author_id
+
+        run_scenario("GET /posts/ (popular, 10 posts + authors)", lambda: feed_request(user_id))
+        run_scenario(f"Post page (post {post_id})", lambda: post_page_request(post_id, user_id))
+        run_scenario(f"GET /posts/id/{post_id}/full/", lambda: db.get_post_page(post_id, user_id))
+
+
+if __name__ == "__main__":
+    main()
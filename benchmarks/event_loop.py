@@ -0,0 +1,100 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Nebenläufigkeits-Benchmark für den asynchronen Datenbankzugriff. Misst die Latenz einer günstigen Anfrage
+(GET /posts/id/{id}/), während gleichzeitig teure Anfragen (GET /posts/ mit SortType.RECOMMENDED) laufen. Verglichen
+wird die Ausführung der Abfragen direkt im Event-Loop mit der Ausführung im Datenbank-Thread-Pool.
+
+Ausführen: python -m benchmarks.event_loop
+"""
+
+import asyncio  # For running the requests concurrently
+import time  # For measuring durations
+from unittest import mock  # For running the queries in the event loop
+
+import httpx  # HTTP client which calls the app directly (without network)
+
+from benchmarks.common import temporary_database, insert_synthetic_posts, summarize  # Benchmark helpers
+from backend.main import app  # The FastAPI app
+from backend.api.endpoints.auth import create_access_token  # For requests as a logged-in user
+from backend.db_service import database as db  # Synchronous database functions
+from backend.db_service import async_database as adb  # The asynchronous database layer
+from backend.db_service.models import SortType  # Sorting types of the feed
+from backend.db_service.term_index import index_missing_posts  # Indexes the synthetic posts
+
+SYNTHETIC_POSTS = 5000  # Makes the recommendation noticeably expensive
+HEAVY_REQUESTS = 5  # Number of recommended feeds requested concurrently
+CHEAP_REQUESTS = 200  # Number of cheap requests
+CHEAP_INTERVAL = 0.005  # Time between the starts of two cheap requests (seconds)
+
+
+async def blocking_run(func, *args, **kwargs):
+    """
+    Runs the database function directly in the event loop, like the endpoints did before.
+    """
+    return func(*args, **kwargs)
+
+
+async def run_load(user_id: int) -> list[float]:
+    """
+    Sends cheap requests on a fixed schedule while the heavy requests are running. The latency of a cheap request is
+    measured from its scheduled start, so time spent waiting for a blocked event loop is included.
+
+    Returns:
+        The latencies of the cheap requests in milliseconds.
+    """
+
+    token = create_access_token(user_id)
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+
+        async def cheap_request(scheduled_start):
+            await client.get("/posts/id/1/")
+            latencies.append((time.perf_counter() - scheduled_start) * 1000)
+
+        async def heavy_requests():
+            headers = {"Authorization": f"Bearer {token}"}
+            await asyncio.gather(*[
+                client.get(f"/posts/?sort={int(SortType.RECOMMENDED)}", headers=headers)
+                for _ in range(HEAVY_REQUESTS)
+            ])
+
+        tasks = [asyncio.create_task(heavy_requests())]
+        start = time.perf_counter()
+
+        for i in range(CHEAP_REQUESTS):
+            scheduled_start = start + i * CHEAP_INTERVAL
+            await asyncio.sleep(max(0.0, scheduled_start - time.perf_counter()))
+            tasks.append(asyncio.create_task(cheap_request(scheduled_start)))
+
+        await asyncio.gather(*tasks)
+
+    return latencies
+
+
+def main():
+    with temporary_database():
+        vocabulary = insert_synthetic_posts(SYNTHETIC_POSTS)
+        index_missing_posts()
+
+        # A user who liked a post with common tags, so that many posts can be recommended
+        user_id = db.get_post_by_id(1).author_id
+        db.update_tags_of_post(1, vocabulary[:20])
+        if db.get_vote_of_user(1, user_id) != 1:
+            db.create_vote_post(user_id, 1, 1)
+
+        with mock.patch.object(adb, "run", blocking_run):
+            blocking = asyncio.run(run_load(user_id))
+
+        pooled = asyncio.run(run_load(user_id))
+
+    print(f"GET /posts/id/1/ while {HEAVY_REQUESTS} recommended feeds over {SYNTHETIC_POSTS} posts are computed")
+    print(f"  queries in event loop: {summarize(blocking)}")
+    print(f"  database thread pool:  {summarize(pooled)}")
+
+
+if __name__ == "__main__":
+    main()
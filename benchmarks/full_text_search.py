@@ -0,0 +1,70 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark der Post-Suche. Vergleicht die frühere Suche mit LIKE '%...%' mit dem FTS5-Volltextindex auf einer
+synthetischen Datenbank: einmal als Filter des Feeds (erste Seite, neueste Posts) und einmal als Suche, die alle Treffer
+nach Relevanz (BM25) sortiert. Häufige Wörter sind für LIKE günstig, weil die erste Seite schnell gefüllt ist; seltene
+Wörter und Wörter ohne Treffer zwingen LIKE dazu, die ganze Tabelle zu lesen.
+
+Ausführen: python -m benchmarks.full_text_search [--posts 500000]
+"""
+
+import argparse  # For the command line arguments
+import time  # For measuring the setup
+
+from benchmarks.common import temporary_database, insert_synthetic_posts, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # The database functions to benchmark
+from backend.db_service.connection import Database  # For running the former query
+from backend.db_service.models import SortType  # Sorting types of the feed
+
+REPETITIONS = 5
+
+# The former search of the feed
+LIKE_SQL = """
+    SELECT posts.* FROM posts
+    WHERE LOWER(TRIM(title)) LIKE ? OR LOWER(TRIM(content)) LIKE ?
+    ORDER BY creation_date DESC
+    LIMIT 10
+"""
+
+
+def like_search(term: str):
+    with Database() as cur:
+        cur.execute(LIKE_SQL, (f"%{term}%", f"%{term}%"))
+        return cur.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500_000, help="Number of synthetic posts")
+    args = parser.parse_args()
+
+    with temporary_database():
+        start = time.perf_counter()
+        vocabulary = insert_synthetic_posts(args.posts)
+        print(f"Inserted {args.posts} posts (with full-text index) in {time.perf_counter() - start:.1f} s\n")
+
+        searches = {
+            "frequent word": vocabulary[0],
+            "medium word": vocabulary[200],
+            "rare word": vocabulary[-1],
+            "prefix": vocabulary[500][:4] + "*",
+            "two words": f"{vocabulary[10]} {vocabulary[300]}",
+            "no match": "xylophon",
+        }
+
+        for name, search in searches.items():
+            like_term = search.rstrip("*").split()[0]
+            like = measure(lambda: like_search(like_term), REPETITIONS)
+            feed = measure(lambda: db.get_posts(search, 10, 0, SortType.NEW, None), REPETITIONS)
+            ranked = measure(lambda: db.search_posts(search, 10, 0), REPETITIONS)
+
+            print(f"{name} ({search})")
+            print(f"  feed, LIKE:          {summarize(like)}")
+            print(f"  feed, FTS5 filter:   {summarize(feed)}")
+            print(f"  search, FTS5 + BM25: {summarize(ranked)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark der vorberechneten Feeds SortType.HOT und SortType.CONTROVERSIAL. Misst, wie schnell der Hintergrundjob die
+Ranglisten nach vielen neuen Bewertungen nachführt, und wie lange eine Seite der Feeds dauert: einmal aus der
+vorberechneten Rangliste und einmal, wie es ohne sie nötig wäre, mit Berechnung der Werte aller Posts pro Anfrage.
+
+Ausführen: python -m benchmarks.hot_feed [--sizes 10000,100000,1000000] [--votes-per-post 5]
+"""
+
+import argparse  # For the command line arguments
+import random  # For the synthetic votes and creation dates
+import time  # For measuring the job
+
+from benchmarks.common import temporary_database, insert_synthetic_posts, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # The feed to benchmark
+from backend.db_service import rankings  # The ranking job and scores
+from backend.db_service.connection import Database, Transaction  # For the synthetic data and the request-time ranking
+from backend.db_service.models import SortType  # Sorting types of the feed
+
+REPETITIONS = 20
+PAGE_SIZE = 10
+DEEP_PAGE = 50  # Page which is read by following the cursors
+MAX_AGE_DAYS = 30  # The synthetic posts are spread over this many days
+VOTERS = 1000
+
+
+def insert_votes(votes_per_post: int, seed: int = 0) -> int:
+    """
+    Spreads the creation dates of the posts and lets synthetic users vote on them. Some posts get many votes, and some
+    of those are divided between upvotes and downvotes. All posts are marked for the ranking job.
+
+    Returns:
+        The number of votes.
+    """
+
+    rng = random.Random(seed)
+
+    with Database() as cur:
+        cur.execute("SELECT post_id FROM posts")
+        post_ids = [result["post_id"] for result in cur.fetchall()]
+
+    dates = [(f"-{rng.uniform(0, MAX_AGE_DAYS * 24):.3f} hours", post_id) for post_id in post_ids]
+
+    votes = set()
+    for post_id in post_ids:
+        count = min(VOTERS, int(rng.paretovariate(1.2) * votes_per_post / 6))
+        upvote_share = rng.choice((0.5, 0.8, 0.95))
+        for user_id in rng.sample(range(1, VOTERS + 1), count):
+            votes.add((user_id, post_id, 1 if rng.random() < upvote_share else -1))
+
+    with Transaction() as cur:
+        cur.executemany("UPDATE posts SET creation_date = datetime('now', ?) WHERE post_id = ?", dates)
+        cur.executemany("INSERT INTO posts_votes (user_id, post_id, vote) VALUES (?, ?, ?)", list(votes))
+
+        # The creation dates never change in the forum, so the job has to be told about them
+        cur.execute("INSERT OR IGNORE INTO ranking_dirty_posts (post_id) SELECT post_id FROM posts")
+
+    return len(votes)
+
+
+def request_time_hot_page() -> list[int]:
+    """
+    The hot feed without the precomputed ranking: the score of every post is calculated for each request.
+    """
+
+    with Database() as cur:
+        cur.execute("""
+            SELECT post_id, upvotes, downvotes, (julianday(creation_date) - 2440587.5) * 86400.0 AS created_at
+            FROM posts
+        """)
+        scores = [
+            (rankings.hot_score(result["upvotes"], result["downvotes"], result["created_at"]), result["post_id"])
+            for result in cur.fetchall()
+        ]
+
+    scores.sort(reverse=True)
+    page_ids = [post_id for _, post_id in scores[:PAGE_SIZE]]
+
+    return [post.post_id for post in db.get_posts_by_ids(page_ids)]
+
+
+def deep_page(sort_type: SortType):
+    cursor = None
+    for _ in range(DEEP_PAGE):
+        _, cursor = db.get_posts(None, PAGE_SIZE, 0, sort_type, None, cursor)
+
+
+def run(size: int, votes_per_post: int):
+    with temporary_database():
+        insert_synthetic_posts(size)
+        votes = insert_votes(votes_per_post)
+
+        start = time.perf_counter()
+        updated = rankings.update_rankings()
+        duration = time.perf_counter() - start
+        print(f"{size} posts, {votes} votes: ranking job recalculated {updated} posts in {duration:.2f} s "
+              f"({updated / duration:.0f} posts/s)")
+
+        # The same first page either way
+        precomputed = [post.post_id for post in db.get_posts(None, PAGE_SIZE, 0, SortType.HOT, None)[0]]
+        print(f"  same first page as request-time ranking: {precomputed == request_time_hot_page()}")
+
+        for sort_type in (SortType.HOT, SortType.CONTROVERSIAL):
+            first = measure(lambda: db.get_posts(None, PAGE_SIZE, 0, sort_type, None), REPETITIONS)
+            print(f"  {sort_type.name.lower():<13} first page:     {summarize(first)}")
+
+        deep = measure(lambda: deep_page(SortType.HOT), 3)
+        print(f"  hot           {DEEP_PAGE} pages:       {summarize([duration / DEEP_PAGE for duration in deep])} "
+              f"per page")
+
+        request_time = measure(request_time_hot_page, 3)
+        print(f"  hot at request time:          {summarize(request_time)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated numbers of synthetic posts")
+    parser.add_argument("--votes-per-post", type=int, default=5, help="Average number of votes per post")
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        run(size, args.votes_per_post)
+
+
+if __name__ == "__main__":
+    main()
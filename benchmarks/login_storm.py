@@ -0,0 +1,103 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Last-Test für das Einloggen. Misst die Latenz des Feeds (GET /posts/), während gleichzeitig viele Logins eintreffen
+(Login-Sturm). Verglichen wird die Prüfung der Passwörter direkt im Event-Loop mit der Prüfung im begrenzten
+bcrypt-Thread-Pool. Zusätzlich wird gezählt, wie viele Logins erfolgreich waren und wie viele mit 503 abgelehnt wurden.
+
+Ausführen: python -m benchmarks.login_storm
+"""
+
+import asyncio  # For running the requests concurrently
+import time  # For measuring durations
+from collections import Counter  # For counting the status codes of the logins
+from unittest import mock  # For verifying the passwords in the event loop
+
+import httpx  # HTTP client which calls the app directly (without network)
+
+from benchmarks.common import temporary_database, summarize  # Benchmark helpers
+from backend.main import app  # The FastAPI app
+from backend.api.endpoints import auth  # The password hasher used by the login
+from backend.db_service import database as db  # For creating the test user
+from backend.db_service.models import SortType  # Sorting types of the feed
+
+EMAIL = "storm@example.com"
+PASSWORD = "Storm-Pass-1"
+
+LOGIN_REQUESTS = 60  # Logins sent at once
+FEED_REQUESTS = 100  # Feed requests during the storm
+FEED_INTERVAL = 0.02  # Time between the starts of two feed requests (seconds)
+
+
+async def verify_in_event_loop(func, *args):
+    """
+    Runs the bcrypt calculation directly in the event loop, like the login did before.
+    """
+    return func(*args)
+
+
+async def run_storm() -> tuple[list[float], Counter, float]:
+    """
+    Sends all logins at once and feed requests on a fixed schedule. The latency of a feed request is measured from its
+    scheduled start, so time spent waiting for a blocked event loop is included.
+
+    Returns:
+        The latencies of the feed requests in milliseconds, the status codes of the logins and the duration of the
+        storm in seconds.
+    """
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    statuses = Counter()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+
+        async def login():
+            response = await client.post("/auth/login/", data={"username": EMAIL, "password": PASSWORD})
+            statuses[response.status_code] += 1
+
+        async def feed_request(scheduled_start):
+            await client.get(f"/posts/?sort={int(SortType.POPULAR)}", headers={"Authorization": "Bearer guest"})
+            latencies.append((time.perf_counter() - scheduled_start) * 1000)
+
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(login()) for _ in range(LOGIN_REQUESTS)]
+
+        for i in range(FEED_REQUESTS):
+            scheduled_start = start + i * FEED_INTERVAL
+            await asyncio.sleep(max(0.0, scheduled_start - time.perf_counter()))
+            tasks.append(asyncio.create_task(feed_request(scheduled_start)))
+
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - start
+
+    return latencies, statuses, duration
+
+
+def report(name: str, latencies: list[float], statuses: Counter, duration: float):
+    codes = ", ".join(f"{count}x {code}" for code, count in sorted(statuses.items()))
+    print(f"  {name}")
+    print(f"    feed:   {summarize(latencies)}")
+    print(f"    logins: {codes} in {duration:.1f} s")
+
+
+def main():
+    hasher = auth.password_hasher
+
+    with temporary_database():
+        db.create_user("storm", EMAIL, hasher.context.hash(PASSWORD))
+
+        with mock.patch.object(hasher, "run", verify_in_event_loop):
+            blocking = asyncio.run(run_storm())
+
+        pooled = asyncio.run(run_storm())
+
+    print(f"GET /posts/ every {FEED_INTERVAL * 1000:.0f} ms while {LOGIN_REQUESTS} logins arrive at once "
+          f"(pool: {hasher.workers} workers, queue limit {hasher.queue_limit})")
+    report("bcrypt in event loop:", *blocking)
+    report("bcrypt thread pool:", *pooled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark des empfohlenen Feeds (GET /posts/ mit SortType.RECOMMENDED) bei wachsender Anzahl Posts. Verglichen wird das
+frühere Vorgehen, das alle Posts lädt und rangiert, mit der zweistufigen Variante, die nur die Kandidaten mit den
+Tags des Benutzers lädt. Die Kosten der zweistufigen Variante sollten von den Interessen des Benutzers abhängen und
+nicht von der Grösse der Tabelle.
+
+Ausführen: python -m benchmarks.recommended_feed [--sizes 10000,100000,1000000] [--full-max 100000]
+"""
+
+import argparse  # For the command line arguments
+import random  # For tagging random posts
+
+from benchmarks.common import temporary_database, insert_synthetic_posts, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # The database functions to benchmark
+from backend.db_service.connection import Database, Transaction  # For the former feed and for tagging posts
+from backend.db_service.models import Post, SortType  # Posts and sorting types of the feed
+from backend.db_service.term_index import index_missing_posts  # Indexes the synthetic posts
+
+REPETITIONS = 5
+PAGE_SIZE = 10
+TAGGED_SHARE = 0.05  # Share of the posts which get tags
+TAGS_PER_POST = 3
+
+
+def tag_posts(vocabulary: list[str], seed: int = 0):
+    """
+    Gives a share of the posts tags from the vocabulary, as the keyword extraction would.
+    """
+
+    rng = random.Random(seed)
+    tag_ids = [db.create_tag(tag) for tag in vocabulary[:200]]
+
+    with Database() as cur:
+        cur.execute("SELECT post_id FROM posts")
+        post_ids = [result["post_id"] for result in cur.fetchall()]
+
+    rows = [
+        (post_id, tag_id)
+        for post_id in rng.sample(post_ids, int(len(post_ids) * TAGGED_SHARE))
+        for tag_id in rng.sample(tag_ids, TAGS_PER_POST)
+    ]
+
+    with Transaction() as cur:
+        cur.executemany("INSERT OR IGNORE INTO post_tags (post_id, tag_id) VALUES (?, ?)", rows)
+
+
+def full_feed(user_id: int) -> list[Post]:
+    """
+    The former recommended feed, which loaded every post and ranked all of them.
+    """
+
+    sql, parameters = db.build_posts_query(None, SortType.RECOMMENDED)
+
+    with Database() as cur:
+        cur.execute(sql, parameters)
+        posts = [Post(**result) for result in cur.fetchall()]
+
+    return db.sort_posts_by_recommendation(posts, user_id, limit=PAGE_SIZE)[:PAGE_SIZE]
+
+
+def run(size: int, full_max: int):
+    with temporary_database():
+        vocabulary = insert_synthetic_posts(size)
+        index_missing_posts()
+        tag_posts(vocabulary)
+
+        # A user who liked a post with some common and some rare tags
+        user_id = db.get_post_by_id(1).author_id
+        db.update_tags_of_post(1, vocabulary[:3] + vocabulary[150:155])
+        if db.get_vote_of_user(1, user_id) != 1:
+            db.create_vote_post(user_id, 1, 1)
+
+        two_stage = measure(lambda: db.get_posts(None, PAGE_SIZE, 0, SortType.RECOMMENDED, user_id), REPETITIONS)
+        print(f"{size} posts")
+        print(f"  candidates + ranking: {summarize(two_stage)}")
+
+        if size > full_max:
+            print("  all posts ranked:     skipped (--full-max)")
+            return
+
+        full = measure(lambda: full_feed(user_id), REPETITIONS)
+        print(f"  all posts ranked:     {summarize(full)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated numbers of synthetic posts")
+    parser.add_argument("--full-max", type=int, default=100_000, help="Largest size at which all posts are ranked")
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        run(size, args.full_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark des Serverstarts. Misst in jeweils einem neuen Python-Prozess, wie lange der Import von backend.main dauert und
+wie viel Speicher (maximale Resident Set Size) der Prozess danach belegt, und anschliessend dasselbe für das Vorwärmen
+der Sprachverarbeitung (nlp_resources.warmup). Ausserdem wird geprüft, welche der schweren Bibliotheken schon beim
+Import geladen werden.
+
+Ausführen: python -m benchmarks.startup [--runs 5] [--module backend.main] [--no-warmup]
+"""
+
+import argparse  # For the command line arguments
+import json  # For the results of the child processes
+import subprocess  # For measuring each start in a new process
+import sys  # For the path of the Python interpreter
+
+from benchmarks.common import summarize  # Benchmark helpers
+
+# Libraries which should only be loaded by the warmup or on first use
+HEAVY_MODULES = ("spacy", "yake", "nltk", "sklearn")
+
+# Runs in the child process. ru_maxrss is in kilobytes on Linux.
+CHILD = """
+import json, resource, sys, time
+
+start = time.perf_counter()
+__import__(MODULE)
+result = {
+    "import_ms": (time.perf_counter() - start) * 1000,
+    "import_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+}
+
+if WARMUP:
+    from backend.db_service import nlp_resources
+    nlp_resources.warmup()
+    result["warmup_ms"] = nlp_resources.readiness["seconds"] * 1000
+    result["warmup_status"] = nlp_resources.readiness["status"]
+    result["warmup_error"] = nlp_resources.readiness["error"]
+    result["warmup_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+print(json.dumps(result))
+"""
+
+
+def start_process(module: str, warmup: bool) -> dict:
+    """
+    Imports a module in a new Python process and returns its measurements.
+    """
+
+    code = f"MODULE = {module!r}\nWARMUP = {warmup!r}\nHEAVY_MODULES = {HEAVY_MODULES!r}\n{CHILD}"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs: int, module: str, warmup: bool):
+    results = [start_process(module, warmup) for _ in range(runs)]
+
+    print(f"import {module}: {summarize([result['import_ms'] for result in results])}")
+    print(f"  max RSS after import: {max(result['import_rss_mb'] for result in results):.1f} MB")
+    print(f"  heavy libraries loaded by the import: {', '.join(results[-1]['loaded']) or 'none'}")
+
+    if not warmup:
+        return
+
+    failed = [result for result in results if result["warmup_status"] != "ready"]
+    if failed:
+        print(f"  warmup failed in {len(failed)} of {runs} runs: {failed[-1]['warmup_error']}")
+
+    print(f"  warmup: {summarize([result['warmup_ms'] for result in results])}")
+    print(f"  max RSS after warmup: {max(result['warmup_rss_mb'] for result in results):.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of new processes which are measured")
+    parser.add_argument("--module", default="backend.main", help="Module which is imported")
+    parser.add_argument("--no-warmup", action="store_true", help="Only measure the import")
+    args = parser.parse_args()
+
+    run(args.runs, args.module, not args.no_warmup)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark der Tag-Extraktion in Dokumenten pro Sekunde. Vergleicht die frühere Extraktion (volle spaCy-Pipeline, zwei
+Durchläufe pro Text: einmal für die Entitäten und einmal für die Lemmas der YAKE-Schlüsselwörter) mit dem einen
+Durchlauf der gekürzten Pipeline, und misst das erneute Speichern unveränderter Posts (Tag-Cache).
+
+Ausführen: python -m benchmarks.tag_extraction [--posts 500] [--batch-size 32]
+"""
+
+import argparse  # For the command line arguments
+import time  # For measuring the throughput
+
+from benchmarks.tag_queue import synthetic_texts  # Synthetic titles and contents
+from backend.db_service import tag_management as tm  # The tag extraction to benchmark
+
+
+def legacy_extract_tags(nlp, posts: list[tuple[str, str]], batch_size: int) -> list[list[str]]:
+    """
+    The former extract_tags: the texts and the joined keywords are parsed separately by the full pipeline.
+    """
+
+    texts = [post_title + ": " + post_content for post_title, post_content in posts]
+    yake_extractor = tm.get_yake_extractor()
+    keyword_lists = [[keyword for keyword, _ in yake_extractor.extract_keywords(text)] for text in texts]
+
+    entity_docs = nlp.pipe(texts, batch_size=batch_size)
+    lemma_docs = nlp.pipe([' '.join(keywords) for keywords in keyword_lists], batch_size=batch_size)
+
+    tags = []
+    for entity_doc, lemma_doc in zip(entity_docs, lemma_docs):
+        keywords = [entity.lemma_ for entity in entity_doc.ents] + [token.lemma_ for token in lemma_doc]
+        keywords = [keyword for keyword in set(keywords) if not any(char.isdigit() for char in keyword)]
+        keywords = [keyword for keyword in keywords if len([c for c in keyword if c.isalpha()]) >= 2]
+        tags.append([keyword for keyword in keywords if not nlp.vocab[keyword].is_stop])
+
+    return tags
+
+
+def throughput(func, posts: list[tuple[str, str]]) -> float:
+    """
+    Returns the documents per second of one call of func.
+    """
+
+    start = time.perf_counter()
+    func()
+    return len(posts) / (time.perf_counter() - start)
+
+
+def run(posts: int, batch_size: int):
+    import spacy  # For the full pipeline of the former extraction
+
+    texts = synthetic_texts(posts)
+    full_nlp = spacy.load(tm.SPACY_MODEL)
+    print(f"full pipeline:    {', '.join(full_nlp.pipe_names)}")
+    print(f"trimmed pipeline: {', '.join(tm.get_nlp().pipe_names)}")
+
+    # Warm both pipelines up, so the first batch does not pay for loading
+    legacy_extract_tags(full_nlp, texts[:batch_size], batch_size)
+    tm.extract_tags(texts[:batch_size], batch_size, fast_path=False)
+    tm.clear_tag_cache()
+
+    legacy = throughput(lambda: legacy_extract_tags(full_nlp, texts, batch_size), texts)
+    print(f"former extraction (two passes):    {legacy:8.1f} docs/s")
+
+    single = throughput(lambda: tm.extract_tags(texts, batch_size, fast_path=False), texts)
+    print(f"single pass, trimmed pipeline:     {single:8.1f} docs/s ({single / legacy:.1f}x)")
+
+    cached = throughput(lambda: tm.extract_tags(texts, batch_size, fast_path=False), texts)
+    print(f"unchanged posts saved again:       {cached:8.1f} docs/s")
+
+    tm.clear_tag_cache()
+    same = sum(set(old) == set(new) for old, new in zip(legacy_extract_tags(full_nlp, texts, batch_size),
+                                                         tm.extract_tags(texts, batch_size, fast_path=False)))
+    print(f"posts with the same tags as before: {same} of {len(texts)} (lemmas now depend on the context)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500, help="Number of synthetic posts")
+    parser.add_argument("--batch-size", type=int, default=tm.NLP_BATCH_SIZE, help="Texts per spaCy batch")
+    args = parser.parse_args()
+
+    run(args.posts, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark der Tag-Warteschlange. Misst die Dauer des Erstellens eines Posts, einmal wie früher mit der Tag-Extraktion in
+der Anfrage und einmal mit einem Auftrag in der Warteschlange, und den Durchsatz des Workers beim Abarbeiten der
+Warteschlange mit verschiedenen Batch-Grössen.
+
+Ausführen: python -m benchmarks.tag_queue [--posts 200] [--batch-sizes 1,8,32]
+"""
+
+import argparse  # For the command line arguments
+import time  # For measuring the worker
+
+from benchmarks.common import temporary_database, synthetic_vocabulary, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # For creating the posts
+from backend.db_service import tag_management as tm  # The former tag extraction in the request
+from backend.db_service.tag_queue import TagWorker, get_queue_stats  # The worker to benchmark
+
+AUTHOR_ID = 1
+WORDS_PER_POST = 80
+
+
+def synthetic_texts(count: int) -> list[tuple[str, str]]:
+    """
+    Returns titles and contents made of the synthetic vocabulary, with a few capitalized words as named entities.
+    """
+
+    vocabulary = synthetic_vocabulary()
+    texts = []
+
+    for i in range(count):
+        words = [vocabulary[(i * 7 + j * 13) % len(vocabulary)] for j in range(WORDS_PER_POST)]
+        words[::10] = [word.capitalize() for word in words[::10]]
+        texts.append((" ".join(words[:4]).capitalize(), " ".join(words[4:]) + "."))
+
+    return texts
+
+
+def run(posts: int, batch_sizes: list[int]):
+    texts = synthetic_texts(posts)
+
+    with temporary_database():
+        def create_with_tags(title, content):
+            post_id = db.create_post(AUTHOR_ID, title, content)
+            db.update_tags_of_post(post_id, tm.assign_tags_to_post(title, content))
+
+        former = [measure(lambda: create_with_tags(title, content), 1)[0] for title, content in texts]
+        print(f"create_post with tags in the request: {summarize(former)}")
+
+    for batch_size in batch_sizes:
+        with temporary_database():
+            queued = [measure(lambda: db.create_post(AUTHOR_ID, title, content), 1)[0] for title, content in texts]
+            if batch_size == batch_sizes[0]:
+                print(f"create_post with queued tags:         {summarize(queued)}")
+
+            worker = TagWorker(batch_size=batch_size)
+            start = time.perf_counter()
+            while worker.process_batch():
+                pass
+            duration = time.perf_counter() - start
+
+            stats = worker.stats()
+            print(f"worker, batch size {batch_size:>3}: {stats['processed']} posts in {duration:.2f} s "
+                  f"({stats['processed'] / duration:.1f} posts/s), waiting jobs left: {get_queue_stats()['waiting']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=200, help="Number of posts which are created")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma-separated batch sizes of the worker")
+    args = parser.parse_args()
+
+    run(args.posts, [int(size) for size in args.batch_sizes.split(",")])
+
+
+if __name__ == "__main__":
+    main()
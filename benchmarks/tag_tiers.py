@@ -0,0 +1,84 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark der zwei Stufen der Tag-Extraktion. Misst, wie lange der Aufbau des Automaten aus der Tabelle tags dauert,
+wie oft die schnelle Stufe (bekannte Tags) für einen Post genügt und wie lange ein Post in jeder Stufe braucht. Gemessen
+wird mit den Posts von forum.db und mit synthetischen Posts, deren Wörter zu einem Teil schon als Tags bekannt sind.
+
+Ausführen: python -m benchmarks.tag_tiers [--posts 500] [--known-shares 0.1,0.5]
+"""
+
+import argparse  # For the command line arguments
+import time  # For measuring the automaton
+
+from benchmarks.common import temporary_database, synthetic_vocabulary  # Benchmark helpers
+from benchmarks.tag_queue import synthetic_texts  # Synthetic titles and contents
+from backend.db_service import database as db  # For creating the known tags
+from backend.db_service import tag_management as tm  # The tiered tag extraction
+from backend.db_service.connection import Database  # For reading the posts of forum.db
+from backend.db_service.tag_matcher import TaggerStats  # Counters of the tiers
+
+
+def report(name: str, posts: list[tuple[str, str]]):
+    """
+    Extracts the tags of the posts without the cache and prints the hit rate and the timings of both tiers.
+    """
+
+    tm.clear_tag_cache()
+    tm.tagger_stats = TaggerStats()
+
+    start = time.perf_counter()
+    tm.extract_tags(posts)
+    duration = time.perf_counter() - start
+
+    stats = tm.tagger_stats.stats()
+    hit_rate = stats["fast_hit_rate"] or 0.0
+    print(f"{name}: {len(posts)} posts in {duration:.2f} s ({len(posts) / duration:.1f} posts/s), "
+          f"fast path hit rate {hit_rate:.1%}")
+
+    for tier in ("fast", "nlp"):
+        timings = stats[f"{tier}_ms"]
+        if timings["p50"] is not None:
+            print(f"  {tier:<4} {stats['posts'][tier]:>5} posts | p50 {timings['p50']:8.3f} ms | "
+                  f"p99 {timings['p99']:8.3f} ms")
+
+
+def build_matcher():
+    start = time.perf_counter()
+    tm.tag_matcher.clear()
+    added = tm.tag_matcher.refresh(force=True)
+    print(f"automaton of {added} tags built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def run(posts: int, known_shares: list[float]):
+    with temporary_database():
+        with Database() as cur:
+            cur.execute("SELECT title, content FROM posts")
+            forum_posts = [(result["title"], result["content"]) for result in cur.fetchall()]
+
+        build_matcher()
+        report("posts of forum.db", forum_posts)
+
+    vocabulary = synthetic_vocabulary()
+    texts = synthetic_texts(posts)
+
+    for share in known_shares:
+        with temporary_database():
+            db.create_tags(vocabulary[:int(len(vocabulary) * share)])
+            build_matcher()
+            report(f"synthetic posts, {share:.0%} of the words known as tags", texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500, help="Number of synthetic posts")
+    parser.add_argument("--known-shares", default="0.01,0.1,0.5", help="Comma-separated shares of the synthetic "
+                                                                      "vocabulary which are known tags")
+    args = parser.parse_args()
+
+    run(args.posts, [float(share) for share in args.known_shares.split(",")])
+
+
+if __name__ == "__main__":
+    main()
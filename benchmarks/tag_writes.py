@@ -0,0 +1,89 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark des Schreibens der Tags eines Posts. Vergleicht das frühere Vorgehen (eine Abfrage und ein INSERT pro Tag, in
+assign_tags_to_post und nochmals in update_tags_of_post) mit dem gesammelten Schreiben aller Tags in einer Transaktion,
+einmal mit neuen und einmal mit bereits bekannten Tags.
+
+Ausführen: python -m benchmarks.tag_writes [--posts 200] [--tags-per-post 10,30]
+"""
+
+import argparse  # For the command line arguments
+
+from benchmarks.common import temporary_database, synthetic_vocabulary, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # The tag functions to benchmark
+from backend.db_service.connection import Database, Transaction  # For the former tag functions
+
+AUTHOR_ID = 1
+
+
+def legacy_create_tag(tag_name) -> int:
+    """
+    The former create_tag: one lookup and possibly one INSERT per tag.
+    """
+
+    with Database() as cur:
+        cur.execute("SELECT tag_id FROM tags WHERE tag_name = ?", (tag_name,))
+        result = cur.fetchone()
+
+        if result:
+            return result[0]
+
+        cur.execute("INSERT INTO tags (tag_name) VALUES (?)", (tag_name,))
+        return cur.lastrowid
+
+
+def legacy_write_tags(post_id: int, tags: list[str]):
+    """
+    The former tag writes of a new post: create_tag for every tag (assign_tags_to_post), then update_tags_of_post.
+    """
+
+    for tag in tags:
+        legacy_create_tag(tag)
+
+    with Transaction() as cur:
+        cur.execute("DELETE FROM post_tags WHERE post_id = ?", (post_id,))
+        for tag in set(tags):
+            cur.execute("INSERT INTO post_tags (post_id, tag_id) VALUES (?, ?)", (post_id, legacy_create_tag(tag)))
+
+
+def bulk_write_tags(post_id: int, tags: list[str]):
+    """
+    The tag writes of a new post now: create_tags (assign_tags_to_post), then update_tags_of_post.
+    """
+
+    db.create_tags(tags)
+    db.update_tags_of_post(post_id, tags)
+
+
+def run(posts: int, tags_per_post: int):
+    vocabulary = synthetic_vocabulary()
+
+    for name, write_tags in (("former", legacy_write_tags), ("bulk", bulk_write_tags)):
+        with temporary_database():
+            post_ids = [db.create_post(AUTHOR_ID, f"Post {i}", "Content") for i in range(posts)]
+            tag_lists = [
+                [f"{name}-{vocabulary[(i * tags_per_post + j) % len(vocabulary)]}-{i}" for j in range(tags_per_post)]
+                for i in range(posts)
+            ]
+
+            new_tags = [measure(lambda: write_tags(post_id, tags), 1)[0] for post_id, tags in zip(post_ids, tag_lists)]
+            known_tags = [measure(lambda: write_tags(post_id, tags), 1)[0] for post_id, tags in zip(post_ids, tag_lists)]
+
+            print(f"{tags_per_post} tags, {name:<6} new tags:   {summarize(new_tags)}")
+            print(f"{tags_per_post} tags, {name:<6} known tags: {summarize(known_tags)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=200, help="Number of posts whose tags are written")
+    parser.add_argument("--tags-per-post", default="10,30", help="Comma-separated numbers of tags per post")
+    args = parser.parse_args()
+
+    for tags_per_post in [int(count) for count in args.tags_per_post.split(",")]:
+        run(args.posts, tags_per_post)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Programmierprojekt Forum, 2024-04-01
+Luca Flühler, Lucien Ruffet, Sandro Kuster
+
+Benchmark des Dokument-Term-Index der Empfehlungen. Misst für verschiedene Anzahlen synthetischer Posts, wie schnell der
+Index aufgebaut wird, was das Erstellen und Indexieren eines Posts kostet und wie lange die Sortierung nach Empfehlung
+dauert: einmal wie früher (alle Posts tokenisieren und den TfidfVectorizer anpassen) und einmal mit dem Index. Die
+frühere Variante wird nur bis --legacy-max Posts gemessen, darüber dauert sie zu lange.
+
+Ausführen: python -m benchmarks.term_index [--sizes 10000,100000,1000000] [--legacy-max 100000]
+"""
+
+import argparse  # For the command line arguments
+import time  # For measuring the index build
+
+import nltk  # For the former preprocessing
+from nltk.corpus import stopwords  # For the former preprocessing
+from sklearn.feature_extraction.text import TfidfVectorizer  # For the former ranking
+
+from benchmarks.common import temporary_database, insert_synthetic_posts, measure, summarize  # Benchmark helpers
+from backend.db_service import database as db  # The database functions to benchmark
+from backend.db_service.connection import Database  # For reading the liked tags
+from backend.db_service.models import Post  # The posts to rank
+from backend.db_service.term_index import update_index  # Builds the index like the background job
+from backend.db_service.nlp_resources import use_local_nltk_data  # The NLTK data of the former preprocessing
+
+REPETITIONS = 3
+INCREMENTAL_POSTS = 200  # Posts created and indexed one by one to measure the cost of indexing a new post
+COMPARED_POSTS = 100  # Length of the rankings which are compared
+
+
+def legacy_sort_posts_by_recommendation(posts: list[Post], user_id: int) -> list[Post]:
+    """
+    The former ranking, which tokenized every post and fitted a TfidfVectorizer on each request.
+    """
+
+    sql = """
+        SELECT tags.tag_name, COUNT(*) AS frequency
+        FROM posts
+        JOIN post_tags ON posts.post_id = post_tags.post_id
+        JOIN posts_votes ON posts.post_id = posts_votes.post_id
+        JOIN tags ON post_tags.tag_id = tags.tag_id
+        WHERE posts_votes.user_id = ? AND posts_votes.vote = 1
+        GROUP BY tags.tag_name;
+    """
+
+    with Database() as cur:
+        cur.execute(sql, (user_id,))
+        results = cur.fetchall()
+
+    if not results:
+        return []
+
+    new_posts = [post for post in posts if db.get_vote_of_user(post.post_id, user_id) not in [-1, 1]]
+    keywords = [keyword for keyword, _ in results]
+    weights = [frequency for _, frequency in results]
+
+    use_local_nltk_data()
+    stop_words = set(stopwords.words('english'))
+    preprocessed_texts = [
+        ' '.join([
+            word.lower()
+            for word in nltk.word_tokenize(post.title + ' - ' + post.content)
+            if word.isalnum() and word.lower() not in stop_words
+        ])
+        for post in new_posts
+    ]
+
+    vectorizer = TfidfVectorizer(vocabulary=keywords)
+    tfidf_matrix = vectorizer.fit_transform(preprocessed_texts)
+
+    posts_scores = []
+    for i, post in enumerate(new_posts):
+        tfidf_scores = tfidf_matrix[i].toarray()[0]
+        score = sum(tfidf_scores[j]*weights[j] for j in range(len(keywords)))
+        posts_scores.append((post, score))
+
+    posts_scores.sort(key=lambda x: x[1], reverse=True)
+
+    return [post for post, score in posts_scores if score > 0.0]
+
+
+def load_posts() -> list[Post]:
+    with Database() as cur:
+        cur.execute("SELECT * FROM posts ORDER BY score DESC")
+        return [Post(**result) for result in cur.fetchall()]
+
+
+def run(size: int, legacy_max: int):
+    with temporary_database():
+        vocabulary = insert_synthetic_posts(size)
+
+        start = time.perf_counter()
+        indexed = update_index()
+        duration = time.perf_counter() - start
+        print(f"{size} posts: indexed {indexed} posts in {duration:.1f} s ({indexed / duration:.0f} posts/s)")
+
+        # A user who liked a post with common and rare words as tags
+        user_id = db.get_post_by_id(1).author_id
+        db.update_tags_of_post(1, vocabulary[:10] + vocabulary[500:510])
+        if db.get_vote_of_user(1, user_id) != 1:
+            db.create_vote_post(user_id, 1, 1)
+
+        words = " ".join(vocabulary[:40])
+        create = measure(lambda: (db.create_post(user_id, "Benchmark post", words), update_index()), INCREMENTAL_POSTS)
+        print(f"  create_post and indexing:   {summarize(create)}")
+
+        posts = load_posts()
+
+        indexed_ranking = []
+        ranked = measure(lambda: indexed_ranking.append(db.sort_posts_by_recommendation(posts, user_id)), REPETITIONS)
+        print(f"  ranking with index:         {summarize(ranked)}")
+
+        first_page = measure(lambda: db.sort_posts_by_recommendation(posts, user_id, limit=10), REPETITIONS)
+        print(f"  first page (top 10):        {summarize(first_page)}")
+
+        if size > legacy_max:
+            print("  former ranking:             skipped (--legacy-max)")
+            return
+
+        legacy_ranking = []
+        legacy = measure(lambda: legacy_ranking.append(legacy_sort_posts_by_recommendation(posts, user_id)), REPETITIONS)
+        print(f"  former ranking:             {summarize(legacy)}")
+
+        # The index calculates the document frequencies over all posts, the former ranking over the posts which the
+        # user has not voted on, so the scores differ slightly
+        top_indexed = {post.post_id for post in indexed_ranking[0][:COMPARED_POSTS]}
+        top_legacy = {post.post_id for post in legacy_ranking[0][:COMPARED_POSTS]}
+        print(f"  same posts in top {COMPARED_POSTS}:       {len(top_indexed & top_legacy)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated numbers of synthetic posts")
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="Largest size at which the former ranking runs")
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        run(size, args.legacy_max)
+
+
+if __name__ == "__main__":
+    main()
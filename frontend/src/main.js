@@ -10,17 +10,18 @@
 /**
  * Loads posts from the backend and displays them
  * @param {string} searchInput - The search input
- * @param {number} offset - The offset for the posts
+ * @param {string|null} cursor - The cursor of the previous page (null for the first page)
  * @param {number} sort_type - The sort type for the posts
  * @returns {Promise<void>}
  */
-async function fetchAndDisplayPosts(searchInput = "", offset=0, sort_type=0){
+async function fetchAndDisplayPosts(searchInput = "", cursor=null, sort_type=0){
     let postList = document.getElementById("postList");
 
     let endpoint = `${BACKENDURL}posts/?`;
-    if (searchInput) endpoint += `search=${searchInput}&`;
+    if (searchInput) endpoint += `search=${encodeURIComponent(searchInput)}&`;
+    if (cursor) endpoint += `cursor=${encodeURIComponent(cursor)}&`;
 
-    endpoint += `offset=${offset}&sort=${sort_type}`;
+    endpoint += `sort=${sort_type}`;
 
     const authToken = localStorage.getItem("AuthToken");
     const postsResponse = await fetch(endpoint, {
@@ -33,9 +34,10 @@ async function fetchAndDisplayPosts(searchInput = "", offset=0, sort_type=0){
 
     const postsData = await postsResponse.json();
     const posts = postsData["posts"];
+    const nextCursor = postsData["next_cursor"];
 
-    // Clear the post list if the offset is 0 (meaning a new search was made or the sort type changed)
-    if (offset === 0) postList.innerHTML = "";
+    // Clear the post list if there is no cursor (meaning a new search was made or the sort type changed)
+    if (!cursor) postList.innerHTML = "";
 
     await updatePostList(posts);
 
@@ -44,12 +46,12 @@ async function fetchAndDisplayPosts(searchInput = "", offset=0, sort_type=0){
         document.querySelector("#postList button").remove();
     }
 
-    // If 10 posts are displayed, display a button to load more
-    if (posts.length === 10) {
+    // If there are more posts, display a button to load the next page
+    if (nextCursor) {
         const loadMoreButton = document.createElement('button');
         loadMoreButton.textContent = "Load more";
         loadMoreButton.className = "loadmorebutton"
-        loadMoreButton.addEventListener("click", () => fetchAndDisplayPosts(searchInput, offset + 10, sort_type));
+        loadMoreButton.addEventListener("click", () => fetchAndDisplayPosts(searchInput, nextCursor, sort_type));
         postList.append(loadMoreButton);
     }
 }
@@ -65,6 +67,9 @@ async function updatePostList(posts){
         return;
     }
 
+    // Load the authors of all posts with one request
+    await loadUserDetails(posts.map(post => post["author_id"]));
+
     for (const post of posts) {
         const author_id = post["author_id"];
 
@@ -96,12 +101,14 @@ async function sortingChanged(event){
         "recommended": 0,
         "new": 1,
         "popular": 2,
-        "controversial": 3
+        "controversial": 3,
+        "collaborative": 4,
+        "hot": 5
     };
 
     const sort_type = sortTypeToInt[event.target.value];
     const searchInput = document.getElementById("searchBar").value;
-    await fetchAndDisplayPosts(searchInput, 0, sort_type);
+    await fetchAndDisplayPosts(searchInput, null, sort_type);
 }
 
 /**
@@ -33,9 +33,8 @@ async function loadMessages(chat_id) {
     for (let i = 0; i < messages.length; i++) {
         const message = messages[i];
 
-        // get username of sender
-        const sentById = message["sent_by"];
-        const username = await getUsername(sentById);
+        // username of sender (included in the message by the backend)
+        const username = message["sent_by_username"];
 
         // Create a container for the comment
         const messageContainer = document.createElement('div');
@@ -12,10 +12,12 @@ let editPostVisible = false;
 /**
  * Configure the UI elements for the post page.
  * @param currentUserId - The ID of the current user
+ * @param currentUserRole - The role of the current user
  * @param post - The post object
+ * @param author - The author of the post (username and role)
  * @returns {Promise<void>}
  */
-async function configureUIElements(currentUserId, post){
+async function configureUIElements(currentUserId, currentUserRole, post, author){
     // If a user is logged in, display the comment form and create Rich Text Editor for comments
     const commentForm = document.getElementById('commentForm');
 
@@ -45,8 +47,7 @@ async function configureUIElements(currentUserId, post){
     // Create Post Management Buttons
     const container = document.getElementById('postManagementButtonsContainer');
 
-    const currentUserRole = await getRole(currentUserId);
-    const authorRole = await getRole(post["author_id"]);
+    const authorRole = author ? author["role"] : null;
 
     const postManagementButtons = getContentManagementButtons(currentUserRole, authorRole, currentUserId === post["author_id"]);
     container.appendChild(postManagementButtons);
@@ -64,17 +65,17 @@ async function configureUIElements(currentUserId, post){
 /**
  * Display the post
  * @param post - The post object
+ * @param author - The author of the post (username and role)
  * @returns {Promise<void>}
  */
-async function displayPost(post){
+async function displayPost(post, author){
     // load title and content
     const postTitle = post["title"];
     const postContent = post["content"];
 
     // load author and role
-    const authorId = post["author_id"];
-    const authorUsername = await getUsername(authorId);
-    const authorRole = await getRole(authorId);
+    const authorUsername = author ? author["username"] : null;
+    const authorRole = author ? author["role"] : null;
     const roleColor = getRoleColor(authorRole);
     
     // insert post into HTML
@@ -87,13 +88,10 @@ async function displayPost(post){
 
 /**
  * Display the tags of a post
- * @param postId - The ID of the post
+ * @param tags - The tags of the post
  * @returns {Promise<void>}
  */
-async function displayTags(postId){
-    // Get tags of the post
-    const tags = await getTags(postId);
-    
+async function displayTags(tags){
     // Get the place to insert the tags
     const tagList = document.querySelector("#tags");
 
@@ -119,24 +117,21 @@ async function displayTags(postId){
 
 /**
  * Display the votes of a post
- * @param postId
+ * @param score - The score of the post (upvotes - downvotes)
+ * @param vote - The vote of the current user (1, -1 or 0)
  * @param currentUserId
  * @returns {Promise<void>}
  */
-async function displayVotes(postId, currentUserId){
+async function displayVotes(score, vote, currentUserId){
     const voteCount = document.querySelector("#voteCount");
     const upvoteButton = document.querySelector("#upvoteButton");
     const downvoteButton = document.querySelector("#downvoteButton");
 
-    // Load votes
-    const response = await fetch(BACKENDURL + "posts/id/" + postId + "/votes/");
-
     // Display vote count
-    voteCount.textContent = await response.json() || 0;
+    voteCount.textContent = score || 0;
 
     // Display the vote of the current user
     if(currentUserId){
-        const vote = await getVoteOfCurrentUser(postId);
         if(vote){
             if(vote === 1){
                 upvoteButton.style.backgroundColor = "green";
@@ -168,29 +163,49 @@ function getPostIdFromUrl() {
 }
 
 /**
- * Display the comments of a post
- * @param post_id - The ID of the post
+ * Display a page of comments of a post
+ * @param postPage - The post page with the comments and their authors
  * @param currentUserId - The ID of the current user
+ * @param currentUserRole - The role of the current user
  * @returns {Promise<void>}
  */
-async function displayComments(post_id, currentUserId){
-    // load comments
-    const commentsArray = await getComments(post_id);
+async function displayComments(postPage, currentUserId, currentUserRole){
+    const commentsArray = postPage["comments"];
+    const authors = postPage["authors"];
     const commentsList = document.querySelector("#commentList");
     
     // Create Comment divs for each comment
     for(let i = 0; i < commentsArray.length; i++){
         const comment = commentsArray[i];
+        const author = authors[comment["author_id"]];
+
         // Create comment div
-        const commentDiv = await createCommentDiv(comment);
+        const commentDiv = await createCommentDiv(comment, author);
 
         // Insert buttons for user and content management
-        await insertButtons(commentDiv, currentUserId, comment["author_id"]);
+        await insertButtons(commentDiv, currentUserId, currentUserRole, comment["author_id"], author ? author["role"] : null);
 
         // Insert comment into HTML
         commentsList.appendChild(commentDiv);
     }
 
+    // If there was a load more button, remove it
+    const loadMoreButton = commentsList.querySelector(".loadmorebutton");
+    loadMoreButton && loadMoreButton.remove();
+
+    // If there are more comments, display a button to load the next page
+    const nextCursor = postPage["next_comments_cursor"];
+    if (nextCursor) {
+        const button = document.createElement('button');
+        button.textContent = "Load more";
+        button.className = "loadmorebutton";
+        button.addEventListener("click", async () => {
+            const nextPage = await getPostPage(postPage["post"]["post_id"], nextCursor);
+            if (nextPage) await displayComments(nextPage, currentUserId, currentUserRole);
+        });
+        commentsList.append(button);
+    }
+
     // Render MathJax
     renderMathJax(commentsList)
 }
@@ -247,9 +262,12 @@ async function initialize(){
     // Display the current user
     await displayAuthStatus();
 
-    // Load post data
+    // Load the post, its tags, votes, comments and authors in one request
     const postId = getPostIdFromUrl();
-    const post = await getPost(postId);
+    const postPage = await getPostPage(postId);
+    const post = postPage["post"];
+    const author = postPage["authors"][post["author_id"]];
+    const currentUserRole = postPage["current_user_role"] || "guest";
 
     // Load user data
     const userDetails = await getCurrentUserDetails(["user_id", "username"]);
@@ -258,11 +276,11 @@ async function initialize(){
     console.log("Logged in as: " + currentUsername)
 
     // Load page elements
-    await configureUIElements(currentUserId, post);
-    await displayPost(post);
-    await displayTags(postId);
-    await displayVotes(postId, currentUserId);
-    await displayComments(postId, currentUserId);
+    await configureUIElements(currentUserId, currentUserRole, post, author);
+    await displayPost(post, author);
+    await displayTags(postPage["tags"]);
+    await displayVotes(post["score"], postPage["vote"], currentUserId);
+    await displayComments(postPage, currentUserId, currentUserRole);
 }
   
 // Entry point - Execute initialize() when the DOM is fully loaded
@@ -52,9 +52,10 @@ async function getComments(post_id){
 /**
  * Create a complete div element for a comment with all necessary elements
  * @param {Object} comment
+ * @param {Object} author - The author of the comment (username and role)
  * @returns {HTMLDivElement}
  */
-async function createCommentDiv(comment){
+async function createCommentDiv(comment, author){
     // Main div element for the comment
     const commentDiv = document.createElement('div');
 
@@ -69,14 +70,14 @@ async function createCommentDiv(comment){
     creationDateSpan.style.color = "gray";
 
     // Span element for the author
-    const authorName = await getUsername(comment["author_id"]);
+    const authorName = author ? author["username"] : null;
 
     const authorSpan = document.createElement('span');
     authorSpan.classList.add("commentAuthor");
     authorSpan.textContent = " - " + authorName;
 
     // Span element for the role
-    const authorRole = await getRole(comment["author_id"]);
+    const authorRole = author ? author["role"] : null;
 
     const roleSpan = document.createElement('span');
     roleSpan.classList.add("authorRole");
@@ -112,13 +113,12 @@ async function createCommentDiv(comment){
  * Insert content and user management buttons into a comment div
  * @param {HTMLDivElement} commentDiv
  * @param {number} currentUserId
+ * @param {string} currentRole - The role of the current user
  * @param {number} authorId
+ * @param {string} authorRole - The role of the author
  * @returns {void}
  */
-async function insertButtons(commentDiv, currentUserId, authorId){
-    // Get the roles of the current user and the author
-    const currentRole = await getRole(currentUserId);
-    const authorRole = await getRole(authorId);
+async function insertButtons(commentDiv, currentUserId, currentRole, authorId, authorRole){
     const isAuthor = currentUserId === authorId;
 
     // Create Content Management Buttons
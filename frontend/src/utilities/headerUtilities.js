@@ -84,9 +84,32 @@ async function getUserDetails(user_id) {
 }
 
 /**
- * Logs out the user by removing the token from the local storage
+ * Loads the details of several users into the cache with a single request. Users already in the cache are skipped.
+ * @param {number[]} userIds - The IDs of the users
+ * @returns {Promise<void>}
+ */
+async function loadUserDetails(userIds) {
+    const missingIds = [...new Set(userIds)].filter(user_id => !(user_id in USER_CACHE));
+    const users = await getUsers(missingIds, ["username", "role"]);
+
+    for (const [user_id, user] of Object.entries(users)) {
+        const userRole = user["role"];
+        USER_CACHE[user_id] = { username: user["username"], userRole, roleColor: getRoleColor(userRole) };
+    }
+}
+
+/**
+ * Logs out the user by revoking the token in the backend and removing it from the local storage
  */
 async function logout(){
+    const authToken = localStorage.getItem("AuthToken");
+    await fetch(`${BACKENDURL}auth/logout/`, {
+        method: "POST",
+        headers: {
+            "Authorization": `Bearer ${authToken}`
+        }
+    });
+
     localStorage.removeItem("AuthToken");
     window.location.reload(); // Reload the page to update the header
 }
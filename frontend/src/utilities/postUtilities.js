@@ -18,6 +18,28 @@ async function getPost(postId){
     return response.ok ? data["post"] : null;
 }
 
+/**
+ * Returns everything needed to display a post page from the backend: the post, its tags, the vote of the current user,
+ * a page of comments and the authors of the post and the comments.
+ * @param {number} postId - The id of the post to retrieve.
+ * @param {string|null} commentsCursor - The cursor of the previous page of comments (null for the first page).
+ * @returns {object} The post page or null if the post does not exist.
+ */
+async function getPostPage(postId, commentsCursor = null){
+    let endpoint = BACKENDURL + `posts/id/${postId}/full/`;
+    if (commentsCursor) endpoint += `?comments_cursor=${encodeURIComponent(commentsCursor)}`;
+
+    const authToken = localStorage.getItem("AuthToken");
+    const response = await fetch(endpoint, {
+        method: "GET",
+        headers: {
+            "Authorization": `Bearer ${authToken}`
+        }
+    });
+
+    return response.ok ? await response.json() : null;
+}
+
 /**
  * Submit the edited post to the backend
  * @param {number} postId - The id of the post to edit
@@ -19,6 +19,23 @@ async function getUsername(userId){
     return response.ok ? data["user"]["username"] : null;
 }
 
+/**
+ * Get the public information of several users with a single request
+ * @param {number[]} userIds - The IDs of the users
+ * @param {string[]} fields - List of user fields to retrieve (e.g., 'username', 'role')
+ * @returns {Promise<object>} - Object mapping the user IDs to the users. Users that do not exist are missing.
+ */
+async function getUsers(userIds, fields = []){
+    if (userIds.length === 0) return {};
+
+    let endpoint = BACKENDURL + `users/batch/?ids=${userIds.join(',')}`;
+    if (fields.length > 0) endpoint += `&fields=${fields.join(',')}`;
+
+    const response = await fetch(endpoint);
+    const data = await response.json();
+    return response.ok ? data["users"] : {};
+}
+
 /**
  * Get details of the currently logged-in user.
  * @param {string[]} fields - List of user fields to retrieve (e.g., 'user_id', 'username', 'email')